@@ -0,0 +1,14 @@
+-- Full-text search index over product name, category and latest offer details.
+-- rowid = product.id. Rows hold normalized text (see crawler/src/utils/search_index.py);
+-- convert_deals_to_sql.py emits the DELETE/INSERT statements for new or changed products.
+CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+    name,
+    category,
+    details,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+-- No backfill here: rows must hold the normalized text queries are matched
+-- against (apostrophes, '&' and units like "12ct" are rewritten, which SQL can't do).
+-- Index products that already exist with the converter, once per processed file:
+--   python src/processors/convert_deals_to_sql.py --file <deals.ndjson> --fts-only
@@ -0,0 +1,5 @@
+-- Small thumbnail next to the full-size image_url: the smallest srcset variant of
+-- the tile image at least 320px wide, or a ?width=320 CDN URL (see
+-- crawler/src/utils/images.py). Existing rows are filled by
+-- crawler/src/processors/normalize_images.py --sql-out.
+ALTER TABLE product ADD COLUMN thumbnail_url TEXT;
@@ -8,8 +8,13 @@ import { rateLimit } from '../middleware/rateLimit';
 
 export type Env = {
   DB: D1Database;
+  // Bearer token for /api/ingest/bulk (wrangler secret put INGEST_API_KEY); unset disables it
+  INGEST_API_KEY?: string;
 };
 
+// Deals per bulk request; the crawler sends smaller chunks (ingest_deals.py --bulk-size)
+const MAX_BULK_DEALS = 1000;
+
 const app = new Hono<{ Bindings: Env }>();
 
 // Middleware
@@ -115,4 +120,38 @@ app.post('/api/ingest', async (c: Context) => {
 });
 */
 
+// Bulk ingest for the crawler: one db.batch() of multi-row upserts per request
+app.post('/api/ingest/bulk', async (c: Context) => {
+  const apiKey = c.env.INGEST_API_KEY;
+  if (!apiKey) {
+    throw new HTTPException(404, { message: 'Not Found' });
+  }
+  if (c.req.header('Authorization') !== `Bearer ${apiKey}`) {
+    throw new HTTPException(401, { message: 'Invalid or missing ingest API key' });
+  }
+
+  const body = await c.req.json();
+  if (!Array.isArray(body)) {
+    throw new HTTPException(400, { message: 'Request body must be an array of deals' });
+  }
+  if (body.length > MAX_BULK_DEALS) {
+    throw new HTTPException(413, { message: `At most ${MAX_BULK_DEALS} deals per request` });
+  }
+
+  const db = new Database(c.env.DB);
+  try {
+    const result = await db.ingestDealsBulk(body);
+    return c.json({
+      status: 'success',
+      message: result.message,
+      details: result.details,
+    });
+  } catch (error) {
+    if (error instanceof Error) {
+      throw new HTTPException(500, { message: `Failed to ingest deals: ${error.message}` });
+    }
+    throw new HTTPException(500, { message: 'An unexpected error occurred' });
+  }
+});
+
 export default app;
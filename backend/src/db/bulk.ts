@@ -0,0 +1,196 @@
+import type { IngestDeal } from '../types/schema';
+import { ftsRow } from './fts';
+
+// D1 binds at most 100 parameters per statement
+export const D1_MAX_PARAMS = 100;
+
+export interface BulkStatement {
+  sql: string;
+  params: unknown[];
+}
+
+function rowsPerStatement(paramsPerRow: number): number {
+  return Math.floor(D1_MAX_PARAMS / paramsPerRow);
+}
+
+function placeholders(paramsPerRow: number, rows: number): string {
+  const row = `(${Array(paramsPerRow).fill('?').join(', ')})`;
+  return Array(rows).fill(row).join(', ');
+}
+
+// One statement per chunk of rows, each within the parameter limit
+function chunked(
+  rows: unknown[][],
+  paramsPerRow: number,
+  sql: (values: string) => string
+): BulkStatement[] {
+  const size = rowsPerStatement(paramsPerRow);
+  const statements: BulkStatement[] = [];
+  for (let i = 0; i < rows.length; i += size) {
+    const chunk = rows.slice(i, i + size);
+    statements.push({ sql: sql(placeholders(paramsPerRow, chunk.length)), params: chunk.flat() });
+  }
+  return statements;
+}
+
+// Later deals win, like the sequential upserts of ingestDeals
+function lastByKey<T>(items: T[], key: (item: T) => string): T[] {
+  const byKey = new Map<string, T>();
+  for (const item of items) {
+    const k = key(item);
+    byKey.delete(k);
+    byKey.set(k, item);
+  }
+  return [...byKey.values()];
+}
+
+const periodKey = ({ product, offer_period: offer }: IngestDeal) =>
+  [product.sku, offer.starts, offer.ends, offer.region].join('|');
+
+export function productUpserts(deals: IngestDeal[]): BulkStatement[] {
+  const rows = lastByKey(deals, deal => deal.product.sku).map(({ product }) => [
+    product.sku,
+    product.name,
+    product.category || null,
+    product.brand || null,
+    product.image_url || null,
+    product.thumbnail_url || null,
+  ]);
+  return chunked(
+    rows,
+    6,
+    values => `INSERT INTO product (sku, name, category, brand, image_url, thumbnail_url)
+      VALUES ${values}
+      ON CONFLICT(sku) DO UPDATE SET
+        name = excluded.name,
+        category = COALESCE(excluded.category, product.category),
+        brand = COALESCE(excluded.brand, product.brand),
+        image_url = COALESCE(excluded.image_url, product.image_url),
+        thumbnail_url = COALESCE(excluded.thumbnail_url, product.thumbnail_url),
+        updated_at = CURRENT_TIMESTAMP`
+  );
+}
+
+// Re-index every product of the batch in product_fts (rowid = product.id), the
+// statements convert_deals_to_sql.py emits for the products it converts
+export function ftsUpserts(deals: IngestDeal[]): BulkStatement[] {
+  const latest = lastByKey(deals, deal => deal.product.sku);
+  const deletes = chunked(
+    latest.map(deal => [deal.product.sku]),
+    1,
+    values => `DELETE FROM product_fts WHERE rowid IN (
+        SELECT product.id FROM (VALUES ${values}) AS v
+        JOIN product ON product.sku = v.column1
+      )`
+  );
+  const inserts = chunked(
+    latest.map(deal => [deal.product.sku, ...ftsRow(deal)]),
+    4,
+    values => `INSERT INTO product_fts (rowid, name, category, details)
+      SELECT product.id, v.column2, v.column3, v.column4 FROM (VALUES ${values}) AS v
+      JOIN product ON product.sku = v.column1`
+  );
+  return [...deletes, ...inserts];
+}
+
+// Product ids are resolved in SQL by joining the VALUES list on product.sku
+// ("WHERE true" lets SQLite parse ON CONFLICT after a SELECT)
+export function aliasUpserts(deals: IngestDeal[]): BulkStatement[] {
+  const pairs = deals.flatMap(({ product }) =>
+    (product.alt_skus ?? []).map(alt => [product.sku, alt])
+  );
+  const rows = lastByKey(pairs, pair => pair[1]);
+  return chunked(
+    rows,
+    2,
+    values => `INSERT INTO alias (product_id, alt_sku)
+      SELECT product.id, v.column2 FROM (VALUES ${values}) AS v
+      JOIN product ON product.sku = v.column1
+      WHERE true
+      ON CONFLICT(alt_sku) DO UPDATE SET product_id = excluded.product_id`
+  );
+}
+
+export function offerPeriodUpserts(deals: IngestDeal[]): BulkStatement[] {
+  const rows = lastByKey(deals, periodKey).map(({ product, offer_period: offer }) => [
+    product.sku,
+    offer.region,
+    offer.sale_type,
+    offer.discount_low,
+    offer.discount_high,
+    offer.currency,
+    offer.limit_qty || null,
+    offer.details || null,
+    offer.starts,
+    offer.ends,
+    offer.channel || null,
+  ]);
+  return chunked(
+    rows,
+    11,
+    values => `INSERT INTO offer_period (
+        product_id, region, sale_type, discount_low, discount_high,
+        currency, limit_qty, details, starts, ends, channel
+      )
+      SELECT product.id, v.column2, v.column3, v.column4, v.column5,
+        v.column6, v.column7, v.column8, v.column9, v.column10, v.column11
+      FROM (VALUES ${values}) AS v
+      JOIN product ON product.sku = v.column1
+      WHERE true
+      ON CONFLICT(product_id, starts, ends, region) DO UPDATE SET
+        sale_type = excluded.sale_type,
+        discount_low = excluded.discount_low,
+        discount_high = excluded.discount_high,
+        currency = excluded.currency,
+        limit_qty = excluded.limit_qty,
+        details = excluded.details,
+        channel = COALESCE(excluded.channel, offer_period.channel),
+        updated_at = CURRENT_TIMESTAMP`
+  );
+}
+
+export function snapshotUpserts(deals: IngestDeal[]): BulkStatement[] {
+  const withSnapshot = deals.filter(deal => deal.snapshot);
+  const rows = lastByKey(withSnapshot, deal => `${periodKey(deal)}|${deal.snapshot!.seen_at}`).map(
+    ({ product, offer_period: offer, snapshot }) => [
+      product.sku,
+      offer.region,
+      offer.starts,
+      offer.ends,
+      snapshot!.seen_at,
+      snapshot!.discount_low,
+      snapshot!.discount_high,
+      snapshot!.details || null,
+    ]
+  );
+  return chunked(
+    rows,
+    8,
+    values => `INSERT INTO offer_snapshot (
+        offer_period_id, seen_at, discount_low, discount_high, details
+      )
+      SELECT offer_period.id, v.column5, v.column6, v.column7, v.column8
+      FROM (VALUES ${values}) AS v
+      JOIN product ON product.sku = v.column1
+      JOIN offer_period ON offer_period.product_id = product.id
+        AND offer_period.region = v.column2
+        AND offer_period.starts = v.column3
+        AND offer_period.ends = v.column4
+      WHERE true
+      ON CONFLICT(offer_period_id, seen_at) DO UPDATE SET
+        discount_low = excluded.discount_low,
+        discount_high = excluded.discount_high,
+        details = excluded.details`
+  );
+}
+
+// Products first, so the later statements can resolve their ids by SKU
+export function bulkIngestStatements(deals: IngestDeal[]): BulkStatement[] {
+  return [
+    ...productUpserts(deals),
+    ...ftsUpserts(deals),
+    ...aliasUpserts(deals),
+    ...offerPeriodUpserts(deals),
+    ...snapshotUpserts(deals),
+  ];
+}
@@ -0,0 +1,47 @@
+/**
+ * Builds product_fts MATCH expressions from user search input, and the indexed
+ * rows of ingested deals.
+ *
+ * Normalization mirrors crawler/src/utils/search_index.py, which normalizes the
+ * indexed text the same way, so "Member's" finds "members" and "12ct" finds "12 ct".
+ */
+import type { IngestDeal } from '../types/schema';
+
+export function normalizeSearchText(text: string): string {
+  return text
+    .normalize('NFKD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+    .replace(/['’`]/g, '')
+    .replace(/&/g, ' and ')
+    .replace(/[^0-9a-z]+/g, ' ')
+    .replace(/(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)/g, ' ')
+    .trim()
+    .replace(/\s+/g, ' ');
+}
+
+/**
+ * Every token must match as a word prefix ("towel" finds "towels", and partial
+ * words keep matching while the user types). Returns null when the input has no
+ * searchable tokens.
+ */
+export function toFtsQuery(query: string): string | null {
+  const normalized = normalizeSearchText(query);
+  if (!normalized) return null;
+  return normalized
+    .split(' ')
+    .map(token => `"${token}"*`)
+    .join(' ');
+}
+
+/**
+ * The product_fts (name, category, details) of an ingested deal, like fts_row()
+ * in crawler/src/utils/search_index.py.
+ */
+export function ftsRow(deal: IngestDeal): [string, string, string] {
+  return [
+    normalizeSearchText(deal.product.name ?? ''),
+    normalizeSearchText(deal.product.category ?? ''),
+    normalizeSearchText(deal.offer_period.details ?? ''),
+  ];
+}
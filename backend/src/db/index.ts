@@ -8,7 +8,11 @@ import {
   CreateOfferPeriod,
   CreateOfferSnapshot,
   CreateAlias,
+  IngestDeal,
+  IngestResult,
 } from '../types/schema';
+import { bulkIngestStatements } from './bulk';
+import { ftsRow, toFtsQuery } from './fts';
 
 // Add type definitions for D1's transaction API
 interface D1Transaction {
@@ -49,7 +53,8 @@ export class Database {
       .prepare('SELECT * FROM product WHERE sku = ?')
       .bind(sku)
       .first<Product>();
-    return result;
+    // Alternate SKUs resolve to their canonical product
+    return result ?? this.getProductByAltSku(sku);
   }
 
   async createProduct(product: CreateProduct): Promise<Product> {
@@ -75,9 +80,13 @@ export class Database {
         category: string | null;
         brand: string | null;
         image_url: string | null;
+        thumbnail_url: string | null;
       }
     >
   > {
+    // Full-text search over product name, category and details (migration 0004)
+    const ftsQuery = toFtsQuery(query);
+    if (!ftsQuery) return [];
     const result = await this.db
       .prepare(
         `
@@ -87,14 +96,16 @@ export class Database {
             product.name,
             product.category,
             product.brand,
-            product.image_url
-          FROM offer_period
-          JOIN product ON offer_period.product_id = product.id
-          WHERE product.name LIKE ?
+            product.image_url,
+            product.thumbnail_url
+          FROM product_fts
+          JOIN product ON product.id = product_fts.rowid
+          JOIN offer_period ON offer_period.product_id = product.id
+          WHERE product_fts MATCH ?
           ORDER BY offer_period.starts DESC
         `
       )
-      .bind(`%${query}%`)
+      .bind(ftsQuery)
       .all<
         OfferPeriod & {
           sku: string;
@@ -102,6 +113,7 @@ export class Database {
           category: string | null;
           brand: string | null;
           image_url: string | null;
+          thumbnail_url: string | null;
         }
       >();
     return result.results;
@@ -119,6 +131,7 @@ export class Database {
         category: string | null;
         brand: string | null;
         image_url: string | null;
+        thumbnail_url: string | null;
       }
     >
   > {
@@ -132,7 +145,8 @@ export class Database {
             product.name,
             product.category,
             product.brand,
-            product.image_url
+            product.image_url,
+            product.thumbnail_url
           FROM offer_period
           JOIN product ON offer_period.product_id = product.id
           WHERE offer_period.region = ? AND offer_period.starts <= ? AND offer_period.ends >= ?
@@ -147,6 +161,7 @@ export class Database {
           category: string | null;
           brand: string | null;
           image_url: string | null;
+          thumbnail_url: string | null;
         }
       >();
     return result.results;
@@ -235,39 +250,7 @@ export class Database {
     return result;
   }
 
-  async ingestDeals(
-    deals: Array<{
-      product: {
-        sku: string;
-        name: string;
-        category?: string;
-        brand?: string | null;
-        image_url?: string | null;
-      };
-      offer_period: {
-        region: string;
-        channel?: string | null;
-        sale_type: 'dollar' | 'percent';
-        discount_low: number;
-        discount_high: number;
-        currency: string;
-        limit_qty?: number | null;
-        details?: string;
-        starts: string;
-        ends: string;
-      };
-      snapshot: {
-        seen_at: string;
-        discount_low: number;
-        discount_high: number;
-        details?: string;
-      };
-    }>
-  ): Promise<{
-    success: boolean;
-    message: string;
-    details?: { count: number; timestamp: string };
-  }> {
+  async ingestDeals(deals: IngestDeal[]): Promise<IngestResult> {
     // Process deals in batches
     const batchSize = 10; // Process 10 deals at a time
     for (let i = 0; i < deals.length; i += batchSize) {
@@ -276,13 +259,14 @@ export class Database {
         // 1. Insert or update product
         const productResult = await this.db
           .prepare(
-            `INSERT INTO product (sku, name, category, brand, image_url)
-              VALUES (?, ?, ?, ?, ?)
+            `INSERT INTO product (sku, name, category, brand, image_url, thumbnail_url)
+              VALUES (?, ?, ?, ?, ?, ?)
               ON CONFLICT(sku) DO UPDATE SET
                 name = excluded.name,
                 category = COALESCE(excluded.category, product.category),
                 brand = COALESCE(excluded.brand, product.brand),
                 image_url = COALESCE(excluded.image_url, product.image_url),
+                thumbnail_url = COALESCE(excluded.thumbnail_url, product.thumbnail_url),
                 updated_at = CURRENT_TIMESTAMP
               RETURNING id`
           )
@@ -291,7 +275,8 @@ export class Database {
             deal.product.name,
             deal.product.category || null,
             deal.product.brand || null,
-            deal.product.image_url || null
+            deal.product.image_url || null,
+            deal.product.thumbnail_url || null
           )
           .first<{ id: number }>();
 
@@ -301,6 +286,17 @@ export class Database {
 
         const productId = productResult.id;
 
+        for (const altSku of deal.product.alt_skus ?? []) {
+          await this.db
+            .prepare(
+              `INSERT INTO alias (product_id, alt_sku)
+              VALUES (?, ?)
+              ON CONFLICT(alt_sku) DO UPDATE SET product_id = excluded.product_id`
+            )
+            .bind(productId, altSku)
+            .run();
+        }
+
         // 2. Insert offer period
         const offerResult = await this.db
           .prepare(
@@ -341,7 +337,16 @@ export class Database {
 
         const offerPeriodId = offerResult.id;
 
-        // 3. Insert snapshot
+        // 3. Re-index the product for search (rowid = product.id)
+        await this.db.batch([
+          this.db.prepare('DELETE FROM product_fts WHERE rowid = ?').bind(productId),
+          this.db
+            .prepare('INSERT INTO product_fts (rowid, name, category, details) VALUES (?, ?, ?, ?)')
+            .bind(productId, ...ftsRow(deal)),
+        ]);
+
+        // 4. Insert snapshot (only sent when the offer changed)
+        if (!deal.snapshot) return;
         await this.db
           .prepare(
             `INSERT INTO offer_snapshot (
@@ -376,4 +381,25 @@ export class Database {
       },
     };
   }
+
+  // Set-based ingestDeals for /api/ingest/bulk: multi-row upserts that resolve
+  // product ids by SKU in SQL, sent as one db.batch() (one round-trip, one transaction)
+  async ingestDealsBulk(deals: IngestDeal[]): Promise<IngestResult> {
+    const statements = bulkIngestStatements(deals);
+    if (statements.length > 0) {
+      await this.db.batch(
+        statements.map(({ sql, params }) => this.db.prepare(sql).bind(...params))
+      );
+    }
+
+    return {
+      success: true,
+      message: `Successfully ingested ${deals.length} deals`,
+      details: {
+        count: deals.length,
+        timestamp: new Date().toISOString(),
+        statements: statements.length,
+      },
+    };
+  }
 }
@@ -5,6 +5,7 @@ export interface Product {
   category: string | null;
   brand: string | null;
   image_url: string | null;
+  thumbnail_url: string | null;
   created_at: string;
   updated_at: string;
 }
@@ -52,3 +53,42 @@ export type CreateOfferSnapshot = Omit<OfferSnapshot, 'created_at'>;
 
 // Type for creating a new alias
 export type CreateAlias = Omit<Alias, 'created_at'>;
+
+// One deal as sent by the crawler's ingest client (crawler/src/processors/ingest_deals.py)
+export interface IngestDeal {
+  product: {
+    sku: string;
+    name: string;
+    category?: string;
+    brand?: string | null;
+    image_url?: string | null;
+    thumbnail_url?: string | null;
+    // Other SKUs listed for the same product; stored as aliases of `sku`
+    alt_skus?: string[];
+  };
+  offer_period: {
+    region: string;
+    channel?: string | null;
+    sale_type: 'dollar' | 'percent';
+    discount_low: number;
+    discount_high: number;
+    currency: string;
+    limit_qty?: number | null;
+    details?: string;
+    starts: string;
+    ends: string;
+  };
+  // null when the crawler saw no change since the last snapshot it sent
+  snapshot?: {
+    seen_at: string;
+    discount_low: number;
+    discount_high: number;
+    details?: string;
+  } | null;
+}
+
+export interface IngestResult {
+  success: boolean;
+  message: string;
+  details?: { count: number; timestamp: string; statements?: number };
+}
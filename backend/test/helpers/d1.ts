@@ -0,0 +1,46 @@
+import { readFileSync } from 'node:fs';
+import { Miniflare } from 'miniflare';
+import type { D1Database } from '@cloudflare/workers-types';
+
+// Schema migrations in the order apply_migrations.sh runs them
+const MIGRATIONS = [
+  '0001_schema.sql',
+  '0003_add_images_and_channel.sql',
+  '0004_product_fts.sql',
+  '0005_product_thumbnail.sql',
+];
+
+const instances: Miniflare[] = [];
+
+// D1 runs one statement per prepare(), so a migration is split on ';' after its
+// comments are removed
+function statements(sql: string): string[] {
+  return sql
+    .replace(/--.*$/gm, '')
+    .split(';')
+    .map(statement => statement.trim())
+    .filter(Boolean);
+}
+
+/**
+ * A fresh local D1 database (Miniflare, the simulator wrangler dev runs) with
+ * the schema migrations applied. Call disposeTestDatabases() when done.
+ */
+export async function createTestDatabase(): Promise<D1Database> {
+  const mf = new Miniflare({
+    modules: true,
+    script: 'export default { fetch: () => new Response(null, { status: 404 }) };',
+    d1Databases: ['DB'],
+  });
+  instances.push(mf);
+  const db = (await mf.getD1Database('DB')) as unknown as D1Database;
+  for (const migration of MIGRATIONS) {
+    const sql = readFileSync(new URL(`../../migrations/${migration}`, import.meta.url), 'utf-8');
+    await db.batch(statements(sql).map(statement => db.prepare(statement)));
+  }
+  return db;
+}
+
+export async function disposeTestDatabases(): Promise<void> {
+  await Promise.all(instances.splice(0).map(mf => mf.dispose()));
+}
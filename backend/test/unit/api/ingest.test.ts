@@ -0,0 +1,62 @@
+import { describe, it, expect, vi, beforeEach } from 'vitest';
+import { createTestContext } from '../../helpers/context';
+import app from '../../../src/api/router';
+import { Database } from '../../../src/db';
+
+describe('Bulk ingest API', () => {
+  let env: Record<string, unknown>;
+  let mockIngestDealsBulk: ReturnType<typeof vi.fn>;
+
+  beforeEach(async () => {
+    const ctx = await createTestContext();
+    env = { ...ctx.env, INGEST_API_KEY: 'secret' };
+    mockIngestDealsBulk = vi.fn();
+    vi.spyOn(Database.prototype, 'ingestDealsBulk').mockImplementation(async deals =>
+      mockIngestDealsBulk(deals)
+    );
+  });
+
+  function post(
+    body: unknown,
+    headers: Record<string, string> = { Authorization: 'Bearer secret' }
+  ) {
+    return new Request('http://localhost/api/ingest/bulk', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', ...headers },
+      body: JSON.stringify(body),
+    });
+  }
+
+  it('should ingest an array of deals', async () => {
+    mockIngestDealsBulk.mockResolvedValue({
+      success: true,
+      message: 'Successfully ingested 0 deals',
+      details: { count: 0, timestamp: '2025-05-14T00:00:00Z', statements: 0 },
+    });
+
+    const response = await app.fetch(post([]), env);
+    expect(response.status).toBe(200);
+    expect(await response.json()).toEqual({
+      status: 'success',
+      message: 'Successfully ingested 0 deals',
+      details: { count: 0, timestamp: '2025-05-14T00:00:00Z', statements: 0 },
+    });
+    expect(mockIngestDealsBulk).toHaveBeenCalledWith([]);
+  });
+
+  it('should reject requests without the API key', async () => {
+    const response = await app.fetch(post([], {}), env);
+    expect(response.status).toBe(401);
+    expect(mockIngestDealsBulk).not.toHaveBeenCalled();
+  });
+
+  it('should be disabled when no API key is configured', async () => {
+    const response = await app.fetch(post([]), { ...env, INGEST_API_KEY: undefined });
+    expect(response.status).toBe(404);
+  });
+
+  it('should return 400 when the body is not an array', async () => {
+    const response = await app.fetch(post({ deals: [] }), env);
+    expect(response.status).toBe(400);
+  });
+});
@@ -0,0 +1,94 @@
+import { describe, it, expect } from 'vitest';
+import {
+  D1_MAX_PARAMS,
+  aliasUpserts,
+  bulkIngestStatements,
+  ftsUpserts,
+  offerPeriodUpserts,
+  productUpserts,
+  snapshotUpserts,
+} from '../../../src/db/bulk';
+import type { IngestDeal } from '../../../src/types/schema';
+
+function deal(sku: string, overrides: Partial<IngestDeal> = {}): IngestDeal {
+  return {
+    product: { sku, name: `Product ${sku}`, category: 'Other', image_url: null },
+    offer_period: {
+      region: 'US',
+      channel: 'Warehouse-Only',
+      sale_type: 'dollar',
+      discount_low: 4,
+      discount_high: 4,
+      currency: 'USD',
+      limit_qty: null,
+      details: `Item ${sku}`,
+      starts: '2025-05-14',
+      ends: '2025-06-08',
+    },
+    snapshot: {
+      seen_at: '2025-05-14T08:00:00Z',
+      discount_low: 4,
+      discount_high: 4,
+      details: `Item ${sku}`,
+    },
+    ...overrides,
+  };
+}
+
+const deals = Array.from({ length: 250 }, (_, i) => deal(String(1000000 + i)));
+
+describe('Bulk ingest statements', () => {
+  it('should keep every statement within the D1 parameter limit', () => {
+    const statements = bulkIngestStatements(deals);
+    for (const { sql, params } of statements) {
+      expect(params.length).toBeLessThanOrEqual(D1_MAX_PARAMS);
+      expect(sql.split('?').length - 1).toBe(params.length);
+    }
+  });
+
+  it('should write many rows per statement', () => {
+    expect(productUpserts(deals)).toHaveLength(Math.ceil(250 / 16));
+    expect(offerPeriodUpserts(deals)).toHaveLength(Math.ceil(250 / 9));
+    expect(snapshotUpserts(deals)).toHaveLength(Math.ceil(250 / 12));
+  });
+
+  it('should order products before the rows that resolve their ids', () => {
+    const [first, ...rest] = bulkIngestStatements([
+      deal('1', { product: { sku: '1', name: 'A', alt_skus: ['2'] } }),
+    ]);
+    expect(first.sql).toMatch(/^INSERT INTO product/);
+    expect(rest.map(s => s.sql.match(/(?:INSERT INTO|DELETE FROM) (\w+)/)![1])).toEqual([
+      'product_fts',
+      'product_fts',
+      'alias',
+      'offer_period',
+      'offer_snapshot',
+    ]);
+  });
+
+  it('should re-index each product in product_fts once, with normalized text', () => {
+    const [deletes, inserts] = ftsUpserts([
+      deal('1'),
+      deal('1', { product: { sku: '1', name: 'Crème Brûlée 12ct', category: 'Grocery' } }),
+    ]);
+    expect(deletes.sql).toMatch(/^DELETE FROM product_fts/);
+    expect(deletes.params).toEqual(['1']);
+    expect(inserts.params).toEqual(['1', 'creme brulee 12 ct', 'grocery', 'item 1']);
+    expect(ftsUpserts(deals)).toHaveLength(Math.ceil(250 / 100) + Math.ceil(250 / 25));
+  });
+
+  it('should keep the last copy of a repeated product or offer', () => {
+    const [products] = productUpserts([
+      deal('1'),
+      deal('1', { product: { sku: '1', name: 'Renamed' } }),
+    ]);
+    expect(products.params).toEqual(['1', 'Renamed', null, null, null, null]);
+    const [periods] = offerPeriodUpserts([deal('1'), deal('1')]);
+    expect(periods.params).toHaveLength(11);
+  });
+
+  it('should skip deals without a snapshot and products without aliases', () => {
+    expect(snapshotUpserts([deal('1', { snapshot: null })])).toEqual([]);
+    expect(aliasUpserts([deal('1')])).toEqual([]);
+  });
+});
@@ -0,0 +1,23 @@
+import { describe, it, expect } from 'vitest';
+import { normalizeSearchText, toFtsQuery } from '../../../src/db/fts';
+
+describe('FTS query building', () => {
+  it('should normalize case, accents, apostrophes and unit suffixes', () => {
+    expect(normalizeSearchText("Member's Mark Crème Brûlée 12ct")).toBe(
+      'members mark creme brulee 12 ct'
+    );
+    expect(normalizeSearchText('Paper Towels & Napkins')).toBe('paper towels and napkins');
+  });
+
+  it('should turn every token into a quoted prefix match', () => {
+    expect(toFtsQuery('Bounty paper tow')).toBe('"bounty"* "paper"* "tow"*');
+  });
+
+  it('should neutralize FTS syntax in user input', () => {
+    expect(toFtsQuery('olive OR "oil" NEAR(x)')).toBe('"olive"* "or"* "oil"* "near"* "x"*');
+  });
+
+  it('should return null when nothing is searchable', () => {
+    expect(toFtsQuery('  %%  ')).toBeNull();
+  });
+});
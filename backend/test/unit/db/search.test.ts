@@ -0,0 +1,57 @@
+// @vitest-environment node
+import { afterAll, describe, it, expect } from 'vitest';
+import { Database } from '../../../src/db';
+import type { IngestDeal } from '../../../src/types/schema';
+import { createTestDatabase, disposeTestDatabases } from '../../helpers/d1';
+
+function deal(sku: string, name: string, details = `Item ${sku}, Limit 2.`): IngestDeal {
+  return {
+    product: { sku, name, category: 'Home & Kitchen', image_url: null },
+    offer_period: {
+      region: 'US',
+      channel: 'Warehouse-Only',
+      sale_type: 'dollar',
+      discount_low: 4,
+      discount_high: 4,
+      currency: 'USD',
+      limit_qty: 2,
+      details,
+      starts: '2025-05-14',
+      ends: '2025-06-08',
+    },
+    snapshot: { seen_at: '2025-05-14T08:00:00Z', discount_low: 4, discount_high: 4, details },
+  };
+}
+
+const ingestPaths = [
+  ['ingestDeals', (db: Database, deals: IngestDeal[]) => db.ingestDeals(deals)],
+  ['ingestDealsBulk', (db: Database, deals: IngestDeal[]) => db.ingestDealsBulk(deals)],
+] as const;
+
+afterAll(disposeTestDatabases);
+
+describe.each(ingestPaths)('Search after %s', (_, ingest) => {
+  it('should find ingested products by name, category and details', async () => {
+    const db = new Database(await createTestDatabase());
+    await ingest(db, [
+      deal('1111161', 'Dixie Ultra Plates'),
+      deal('1700001', 'Ninja Air Fryer', '5 qt. Item 1700001'),
+    ]);
+
+    expect((await db.searchOffers('dixie plate')).map(o => o.sku)).toEqual(['1111161']);
+    expect((await db.searchOffers('kitchen')).map(o => o.sku).sort()).toEqual([
+      '1111161',
+      '1700001',
+    ]);
+    expect((await db.searchOffers('5qt')).map(o => o.sku)).toEqual(['1700001']);
+  });
+
+  it('should re-index a product that is ingested again', async () => {
+    const db = new Database(await createTestDatabase());
+    await ingest(db, [deal('1111161', 'Dixie Ultra Plates')]);
+    await ingest(db, [deal('1111161', 'Chinet Classic Plates')]);
+
+    expect(await db.searchOffers('dixie')).toEqual([]);
+    expect((await db.searchOffers('chinet')).map(o => o.sku)).toEqual(['1111161']);
+  });
+});
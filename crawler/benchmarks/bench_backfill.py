@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+bench_backfill.py
+-----------------
+Run wayback_backfill.py against wayback_standin.py on synthetic fixture pages
+(--periods consecutive 3-week offers pages, one capture a day each) with
+--latency-ms per response:
+
+  serial     --workers 1, empty cache
+  parallel   --workers N, empty cache
+  flaky      --workers N, empty cache, the first request for every 2nd URL a 503
+  rerun      parallel again into the same directory (every period is known)
+  cached     serial again into a new directory, from serial's cache
+
+All runs use --rate 0 (the limiter is not what is measured) and must save the
+same files with the same bytes as the fixtures; rerun and cached must not send
+a single request.
+
+Usage:
+  python benchmarks/bench_backfill.py [--periods 12] [--workers 4] [--latency-ms 100]
+"""
+import argparse
+import contextlib
+import datetime as dt
+import io
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tests"))
+from crawlers import wayback_backfill
+from wayback_standin import StandinServer
+from utils.naming import raw_html_filename
+
+FIRST_PERIOD = dt.date(2024, 1, 3)
+PERIOD_DAYS = 21
+
+
+def make_fixtures(fixture_dir: Path, periods: int) -> dict[str, bytes]:
+    fixtures = {}
+    for p in range(periods):
+        starts = FIRST_PERIOD + dt.timedelta(days=p * PERIOD_DAYS)
+        ends = starts + dt.timedelta(days=PERIOD_DAYS - 1)
+        banner = f"Valid {starts:%-m/%-d/%y} - {ends:%-m/%-d/%y}"
+        tiles = "".join(f'<div data-testid="AdBuilder"><span>Item {1000000 + p * 1000 + i}</span></div>'
+                        for i in range(500))
+        html = f"<html><head><script>var Valid = true;</script></head><body><h2>{banner}</h2>{tiles}</body></html>"
+        name = raw_html_filename("savings", {"starts": starts.isoformat(), "ends": ends.isoformat()})
+        fixtures[name] = html.encode("utf-8")
+        (fixture_dir / name).write_bytes(fixtures[name])
+    return fixtures
+
+
+def run_backfill(server: StandinServer, out_dir: Path, cache_dir: Path, end: dt.date,
+                 workers: int) -> tuple[float, int, str | None]:
+    """Wall seconds, requests the server saw and the output if the backfill failed."""
+    before = server.requests_served
+    argv = ["--from", FIRST_PERIOD.isoformat(), "--to", end.isoformat(), "--archive-url", server.url,
+            "--out-dir", str(out_dir), "--cache-dir", str(cache_dir), "--workers", str(workers),
+            "--rate", "0", "--min-gap-days", "1"]
+    output = io.StringIO()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            wayback_backfill.main(argv)
+        error = None
+    except SystemExit:
+        error = output.getvalue()
+    return time.perf_counter() - started, server.requests_served - before, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Wayback backfill against the local stand-in')
+    parser.add_argument('--periods', type=int, default=12, help='Fixture offers pages (default: 12)')
+    parser.add_argument('--workers', type=int, default=4, help='Workers of the parallel runs (default: 4)')
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='Stand-in response delay (default: 100)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "fixtures").mkdir()
+        fixtures = make_fixtures(tmp / "fixtures", args.periods)
+        end = FIRST_PERIOD + dt.timedelta(days=args.periods * PERIOD_DAYS - 1)
+        server = StandinServer(tmp / "fixtures", 0, args.latency_ms, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # (run, workers, output and cache directory, flaky)
+        runs = [("serial", 1, "serial", 0), ("parallel", args.workers, "parallel", 0),
+                ("flaky", args.workers, "flaky", 2), ("rerun", args.workers, "parallel", 0),
+                ("cached", 1, "serial", 0)]
+        failures = []
+        print(f"{args.periods} pages, {args.periods * PERIOD_DAYS} captures, {args.latency_ms:g} ms latency")
+        print(f"{'run':<10}{'workers':>8}{'requests':>10}{'seconds':>9}")
+        for name, workers, state, flaky in runs:
+            server.reset(flaky)
+            out_dir = tmp / "out" / (state if name == "rerun" else name)
+            seconds, requests, error = run_backfill(server, out_dir, tmp / "cache" / state, end, workers)
+            print(f"{name:<10}{workers:>8}{requests:>10}{seconds:>9.2f}")
+            if error:
+                failures.append(f"{name}: backfill failed\n{error}")
+            saved = {path.name: path.read_bytes() for path in out_dir.iterdir()}
+            if saved != fixtures:
+                failures.append(f"{name}: saved {sorted(saved)}, expected {sorted(fixtures)}")
+            if name in ("rerun", "cached") and requests:
+                failures.append(f"{name}: {requests} requests")
+        server.shutdown()
+        server.server_close()
+
+    if failures:
+        print("\nFailed:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+bench_bulk_ingest.py
+--------------------
+Compare the Worker's two ingest paths on a local sqlite3 database built from
+the backend migrations:
+
+  per-deal  Database.ingestDeals: product, alias, offer_period and snapshot
+            upserts per deal, each awaited on its own (10 deals at a time)
+  bulk      Database.ingestDealsBulk (backend/src/db/bulk.ts): multi-row
+            upserts of at most 100 parameters resolving ids by SKU, sent as
+            one db.batch() per request of --bulk-size deals
+
+The SQL is the backend's, executed from Python. D1 is remote from the Worker,
+so every awaited statement (per-deal) or batch (bulk) is one round-trip; the
+reported time adds --rtt-ms per round-trip to the measured SQLite time. Each
+size is ingested twice (a new crawl of the same offers the next day) and both
+paths must end with the same rows.
+
+Usage:
+  python benchmarks/bench_bulk_ingest.py [--sizes 100 1000 5000] [--bulk-size 500] [--rtt-ms 5]
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from processors.ingest_deals import DEFAULT_BULK_SIZE, transform_deal
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent.parent / "backend" / "migrations"
+MIGRATIONS = ["0001_schema.sql", "0003_add_images_and_channel.sql", "0005_product_thumbnail.sql"]
+
+D1_MAX_PARAMS = 100
+PER_DEAL_CONCURRENCY = 10  # batchSize of Database.ingestDeals
+
+PRODUCT_SQL = """INSERT INTO product (sku, name, category, brand, image_url, thumbnail_url)
+    VALUES {values}
+    ON CONFLICT(sku) DO UPDATE SET
+      name = excluded.name,
+      category = COALESCE(excluded.category, product.category),
+      brand = COALESCE(excluded.brand, product.brand),
+      image_url = COALESCE(excluded.image_url, product.image_url),
+      thumbnail_url = COALESCE(excluded.thumbnail_url, product.thumbnail_url),
+      updated_at = CURRENT_TIMESTAMP"""
+ALIAS_SQL = """INSERT INTO alias (product_id, alt_sku)
+    SELECT product.id, v.column2 FROM (VALUES {values}) AS v
+    JOIN product ON product.sku = v.column1
+    WHERE true
+    ON CONFLICT(alt_sku) DO UPDATE SET product_id = excluded.product_id"""
+OFFER_SQL = """INSERT INTO offer_period (
+      product_id, region, sale_type, discount_low, discount_high,
+      currency, limit_qty, details, starts, ends, channel
+    )
+    SELECT product.id, v.column2, v.column3, v.column4, v.column5,
+      v.column6, v.column7, v.column8, v.column9, v.column10, v.column11
+    FROM (VALUES {values}) AS v
+    JOIN product ON product.sku = v.column1
+    WHERE true
+    ON CONFLICT(product_id, starts, ends, region) DO UPDATE SET
+      sale_type = excluded.sale_type,
+      discount_low = excluded.discount_low,
+      discount_high = excluded.discount_high,
+      currency = excluded.currency,
+      limit_qty = excluded.limit_qty,
+      details = excluded.details,
+      channel = COALESCE(excluded.channel, offer_period.channel),
+      updated_at = CURRENT_TIMESTAMP"""
+SNAPSHOT_SQL = """INSERT INTO offer_snapshot (offer_period_id, seen_at, discount_low, discount_high, details)
+    SELECT offer_period.id, v.column5, v.column6, v.column7, v.column8
+    FROM (VALUES {values}) AS v
+    JOIN product ON product.sku = v.column1
+    JOIN offer_period ON offer_period.product_id = product.id
+      AND offer_period.region = v.column2
+      AND offer_period.starts = v.column3
+      AND offer_period.ends = v.column4
+    WHERE true
+    ON CONFLICT(offer_period_id, seen_at) DO UPDATE SET
+      discount_low = excluded.discount_low,
+      discount_high = excluded.discount_high,
+      details = excluded.details"""
+
+# Per-deal statements of Database.ingestDeals
+PER_DEAL_PRODUCT_SQL = PRODUCT_SQL.format(values="(?, ?, ?, ?, ?, ?)") + " RETURNING id"
+PER_DEAL_ALIAS_SQL = """INSERT INTO alias (product_id, alt_sku)
+    VALUES (?, ?)
+    ON CONFLICT(alt_sku) DO UPDATE SET product_id = excluded.product_id"""
+PER_DEAL_OFFER_SQL = """INSERT INTO offer_period (
+      product_id, region, sale_type, discount_low, discount_high,
+      currency, limit_qty, details, starts, ends, channel
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(product_id, starts, ends, region) DO UPDATE SET
+      sale_type = excluded.sale_type,
+      discount_low = excluded.discount_low,
+      discount_high = excluded.discount_high,
+      currency = excluded.currency,
+      limit_qty = excluded.limit_qty,
+      details = excluded.details,
+      channel = COALESCE(excluded.channel, offer_period.channel),
+      updated_at = CURRENT_TIMESTAMP
+    RETURNING id"""
+PER_DEAL_SNAPSHOT_SQL = """INSERT INTO offer_snapshot (
+      offer_period_id, seen_at, discount_low, discount_high, details
+    )
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(offer_period_id, seen_at) DO UPDATE SET
+      discount_low = excluded.discount_low,
+      discount_high = excluded.discount_high,
+      details = excluded.details"""
+
+# Final state compared between the paths (ids differ with insertion order, SKUs do not)
+STATE_QUERIES = [
+    "SELECT sku, name, category, brand, image_url, thumbnail_url FROM product ORDER BY sku",
+    "SELECT alias.alt_sku, product.sku FROM alias JOIN product ON product.id = alias.product_id ORDER BY alt_sku",
+    """SELECT product.sku, region, sale_type, discount_low, discount_high, currency, limit_qty, details,
+              starts, ends, channel
+       FROM offer_period JOIN product ON product.id = offer_period.product_id ORDER BY product.sku, starts""",
+    """SELECT product.sku, offer_period.starts, seen_at, offer_snapshot.discount_low, offer_snapshot.details
+       FROM offer_snapshot
+       JOIN offer_period ON offer_period.id = offer_snapshot.offer_period_id
+       JOIN product ON product.id = offer_period.product_id
+       ORDER BY product.sku, seen_at""",
+]
+
+
+def make_deals(n: int, seen_at: str, rng: random.Random) -> list[dict]:
+    """n crawled deals in the shape the extractors write, one in ten with alternate SKUs."""
+    deals = []
+    for i in range(n):
+        sku = str(1000000 + i)
+        discount = float(rng.choice([2, 3, 4, 5, 10, 20]))
+        deals.append({
+            "sku": sku,
+            "alt_skus": [str(2000000 + i), str(3000000 + i)] if i % 10 == 0 else [],
+            "name": f"Product {sku}, {rng.choice(['12 ct', '2-pack', '48 oz'])}",
+            "image_url": f"https://bfasset.costco-static.com/{sku}.jpg",
+            "image_srcset": None,
+            "category": "Other",
+            "discount": discount,
+            "discount_type": "dollar",
+            "details": f"Item {sku}, Limit {rng.randint(1, 5)}.",
+            "seen_at": seen_at,
+            "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"},
+            "channel": rng.choice(["Warehouse-Only", "In-Warehouse + Online"]),
+        })
+    return [transform_deal(deal) for deal in deals]
+
+
+def build_db() -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:", isolation_level=None)
+    for migration in MIGRATIONS:
+        db.executescript((MIGRATIONS_DIR / migration).read_text("utf-8"))
+    return db
+
+
+def ingest_per_deal(db: sqlite3.Connection, deals: list[dict]) -> tuple[int, int]:
+    """Database.ingestDeals; returns (statements, round-trips)."""
+    statements = round_trips = 0
+    for i in range(0, len(deals), PER_DEAL_CONCURRENCY):
+        batch = deals[i:i + PER_DEAL_CONCURRENCY]
+        # Deals of a batch run concurrently, each awaiting its statements in turn
+        round_trips += max(3 + len(d["product"]["alt_skus"]) - (d["snapshot"] is None) for d in batch)
+        for deal in batch:
+            product, offer, snapshot = deal["product"], deal["offer_period"], deal["snapshot"]
+            (product_id,) = db.execute(PER_DEAL_PRODUCT_SQL, (
+                product["sku"], product["name"], product["category"] or None, product["brand"] or None,
+                product["image_url"] or None, product["thumbnail_url"] or None)).fetchone()
+            for alt_sku in product["alt_skus"]:
+                db.execute(PER_DEAL_ALIAS_SQL, (product_id, alt_sku))
+            (offer_id,) = db.execute(PER_DEAL_OFFER_SQL, (
+                product_id, offer["region"], offer["sale_type"], offer["discount_low"], offer["discount_high"],
+                offer["currency"], offer["limit_qty"] or None, offer["details"] or None, offer["starts"],
+                offer["ends"], offer["channel"] or None)).fetchone()
+            statements += 2 + len(product["alt_skus"])
+            if snapshot:
+                db.execute(PER_DEAL_SNAPSHOT_SQL, (
+                    offer_id, snapshot["seen_at"], snapshot["discount_low"], snapshot["discount_high"],
+                    snapshot["details"] or None))
+                statements += 1
+    return statements, round_trips
+
+
+def last_by_key(items: list, key) -> list:
+    by_key = {}
+    for item in items:
+        by_key.pop(key(item), None)
+        by_key[key(item)] = item
+    return list(by_key.values())
+
+
+def chunked(rows: list[list], params_per_row: int, sql: str) -> list[tuple[str, list]]:
+    size = D1_MAX_PARAMS // params_per_row
+    row = "(" + ", ".join("?" * params_per_row) + ")"
+    return [(sql.format(values=", ".join([row] * len(rows[i:i + size]))), [p for r in rows[i:i + size] for p in r])
+            for i in range(0, len(rows), size)]
+
+
+def bulk_statements(deals: list[dict]) -> list[tuple[str, list]]:
+    """bulkIngestStatements of backend/src/db/bulk.ts."""
+    def period_key(deal):
+        offer = deal["offer_period"]
+        return (deal["product"]["sku"], offer["starts"], offer["ends"], offer["region"])
+
+    products = [[d["product"]["sku"], d["product"]["name"], d["product"]["category"] or None,
+                 d["product"]["brand"] or None, d["product"]["image_url"] or None,
+                 d["product"]["thumbnail_url"] or None]
+                for d in last_by_key(deals, lambda d: d["product"]["sku"])]
+    aliases = last_by_key([[d["product"]["sku"], alt] for d in deals for alt in d["product"]["alt_skus"]],
+                          lambda pair: pair[1])
+    offers = [[d["product"]["sku"], o["region"], o["sale_type"], o["discount_low"], o["discount_high"],
+               o["currency"], o["limit_qty"] or None, o["details"] or None, o["starts"], o["ends"],
+               o["channel"] or None]
+              for d in last_by_key(deals, period_key) for o in [d["offer_period"]]]
+    snapshots = [[d["product"]["sku"], o["region"], o["starts"], o["ends"], s["seen_at"], s["discount_low"],
+                  s["discount_high"], s["details"] or None]
+                 for d in last_by_key([d for d in deals if d["snapshot"]],
+                                      lambda d: (*period_key(d), d["snapshot"]["seen_at"]))
+                 for o, s in [(d["offer_period"], d["snapshot"])]]
+    return (chunked(products, 6, PRODUCT_SQL) + chunked(aliases, 2, ALIAS_SQL)
+            + chunked(offers, 11, OFFER_SQL) + chunked(snapshots, 8, SNAPSHOT_SQL))
+
+
+def ingest_bulk(db: sqlite3.Connection, deals: list[dict], bulk_size: int) -> tuple[int, int]:
+    """Database.ingestDealsBulk per request of bulk_size deals; returns (statements, round-trips)."""
+    statements = round_trips = 0
+    for i in range(0, len(deals), bulk_size):
+        batch = bulk_statements(deals[i:i + bulk_size])
+        # db.batch() runs its statements in one transaction
+        db.execute("BEGIN")
+        for sql, params in batch:
+            db.execute(sql, params)
+        db.execute("COMMIT")
+        statements += len(batch)
+        round_trips += 1
+    return statements, round_trips
+
+
+def state(db: sqlite3.Connection) -> list[list[tuple]]:
+    return [db.execute(query).fetchall() for query in STATE_QUERIES]
+
+
+def run(ingest, crawls: list[list[dict]]) -> tuple[float, int, int, list[list[tuple]]]:
+    db = build_db()
+    elapsed = statements = round_trips = 0
+    for deals in crawls:
+        started = time.perf_counter()
+        s, r = ingest(db, deals)
+        elapsed += time.perf_counter() - started
+        statements += s
+        round_trips += r
+    return elapsed, statements, round_trips, state(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-deal vs. bulk set-based ingest on SQLite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help='Deals per crawl')
+    parser.add_argument('--bulk-size', type=int, default=DEFAULT_BULK_SIZE,
+                        help=f'Deals per bulk request (default: {DEFAULT_BULK_SIZE})')
+    parser.add_argument('--rtt-ms', type=float, default=5.0,
+                        help='Simulated Worker -> D1 round-trip per statement or batch (default: 5)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'deals':>7}  {'path':<9}{'statements':>11}{'round-trips':>12}{'sqlite ms':>11}{'total ms':>11}")
+    for n in args.sizes:
+        # Two crawls of the same offers; the second one updates every row
+        crawls = [make_deals(n, "2025-05-14T08:00:00Z", rng), make_deals(n, "2025-05-15T08:00:00Z", rng)]
+        results = {
+            "per-deal": run(ingest_per_deal, crawls),
+            "bulk": run(lambda db, deals: ingest_bulk(db, deals, args.bulk_size), crawls),
+        }
+        for path, (elapsed, statements, round_trips, _) in results.items():
+            total = elapsed * 1000 + round_trips * args.rtt_ms
+            print(f"{n:>7}  {path:<9}{statements:>11}{round_trips:>12}{elapsed * 1000:>11.1f}{total:>11.1f}")
+        if results["per-deal"][3] != results["bulk"][3]:
+            print(f"Mismatch: the paths left different rows for {n} deals")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
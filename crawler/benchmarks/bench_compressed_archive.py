@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+bench_compressed_archive.py
+---------------------------
+Compare disk footprint and extract time of raw snapshots stored as plain
+`.html`, `.html.gz` and `.html.zst` (zst only if zstandard is installed).
+
+For every snapshot the benchmark writes temporary compressed copies, then times
+read + parse + extract_deals for each variant (best of --repeat runs).
+
+Usage:
+  python benchmarks/bench_compressed_archive.py [snapshots ...] [--repeat 3]
+  (defaults to every .html / .html.gz / .html.zst in data/raw)
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from crawlers import extractor_for
+from utils.html_io import SNAPSHOT_SUFFIXES, read_html, read_snapshot_bytes, snapshot_stem, write_snapshot_bytes
+
+RAW_DIR = Path(__file__).parent.parent / "data" / "raw"
+
+
+def available_formats() -> list[str]:
+    formats = ["html", "gz"]
+    try:
+        import zstandard  # noqa: F401
+        formats.append("zst")
+    except ImportError:
+        print("zstandard not installed, skipping .zst")
+    return formats
+
+
+def time_extract(path: Path, repeat: int) -> float:
+    extractor = extractor_for(path.name)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        soup = BeautifulSoup(read_html(path, errors="replace"), "lxml")
+        extractor.extract_deals(soup)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compressed raw snapshots')
+    parser.add_argument('snapshots', nargs='*', help='Snapshots to benchmark (default: all of data/raw)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant, best is reported (default: 3)')
+    args = parser.parse_args()
+
+    snapshots = [Path(p) for p in args.snapshots] or sorted(
+        p for p in RAW_DIR.iterdir() if p.name.endswith(SNAPSHOT_SUFFIXES)
+    )
+    if not snapshots:
+        sys.exit(f"No snapshots found in {RAW_DIR}")
+
+    formats = available_formats()
+    totals = {fmt: {"bytes": 0, "seconds": 0.0} for fmt in formats}
+    print(f"{'snapshot':<32}" + "".join(f"{fmt + ' KB':>10}{fmt + ' s':>9}" for fmt in formats))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for snapshot in snapshots:
+            data = read_snapshot_bytes(snapshot)
+            stem = snapshot_stem(snapshot)
+            row = f"{stem:<32}"
+            for fmt in formats:
+                suffix = ".html" if fmt == "html" else f".html.{fmt}"
+                variant = write_snapshot_bytes(Path(tmp) / f"{stem}{suffix}", data)
+                size = variant.stat().st_size
+                seconds = time_extract(variant, args.repeat)
+                totals[fmt]["bytes"] += size
+                totals[fmt]["seconds"] += seconds
+                row += f"{size / 1024:>10.0f}{seconds:>9.3f}"
+            print(row)
+
+    print("\nTotal")
+    plain = totals["html"]
+    for fmt in formats:
+        t = totals[fmt]
+        print(f"  {fmt:<5} {t['bytes'] / 1024 / 1024:8.2f} MB ({plain['bytes'] / max(t['bytes'], 1):5.1f}x smaller)"
+              f"  extract {t['seconds']:7.3f}s ({t['seconds'] / max(plain['seconds'], 1e-9):4.2f}x plain)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+bench_deal_archive.py
+---------------------
+Compare history queries on the columnar deal archive with scanning the
+processed NDJSON files, on a synthetic corpus.
+
+Usage:
+  python benchmarks/bench_deal_archive.py [--files 300] [--deals 400] [--skus 20000]
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from utils.deal_archive import DealArchive, archive_files
+
+CATEGORIES = ["Home & Kitchen", "Electronics", "Grocery", "Health & Beauty", "Baby", "Pet Supplies", "Other"]
+
+
+def write_corpus(processed_dir: Path, n_files: int, deals_per_file: int, n_skus: int, rng: random.Random) -> None:
+    first = date(2019, 1, 1)
+    for i in range(n_files):
+        starts = first + timedelta(days=7 * i)
+        ends = starts + timedelta(days=20)
+        period = {"starts": starts.isoformat(), "ends": ends.isoformat()}
+        with open(processed_dir / f"savings_{starts:%Y%m%d}-{ends:%Y%m%d}.ndjson", "w") as f:
+            for sku in rng.sample(range(1000000, 1000000 + n_skus), deals_per_file):
+                dollar = rng.random() < 0.8
+                f.write(json.dumps({
+                    "sku": str(sku), "name": f"Product {sku}", "category": CATEGORIES[sku % len(CATEGORIES)],
+                    "discount": round(rng.uniform(1, 60), 2) if dollar else rng.choice([10, 15, 20, 25]),
+                    "discount_type": "dollar" if dollar else "percent", "valid_period": period,
+                    "details": f"Item {sku}, Limit 2", "channel": "Both", "seen_at": f"{starts}T08:00:00Z",
+                }) + "\n")
+
+
+def scan(files):
+    for path in files:
+        with open(path, "r") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def scan_sku_history(files, sku):
+    return sorted((d for d in scan(files) if d["sku"] == sku), key=lambda d: d["valid_period"]["starts"])
+
+
+def scan_active_on(files, day):
+    return [d for d in scan(files) if d["valid_period"]["starts"] <= day <= d["valid_period"]["ends"]]
+
+
+def scan_category_monthly(files):
+    sums = defaultdict(lambda: [0.0, 0])
+    for d in scan(files):
+        entry = sums[(d["category"], d["discount_type"], d["valid_period"]["starts"][:7])]
+        entry[0] += float(d["discount"])
+        entry[1] += 1
+    return {k: total / n for k, (total, n) in sums.items()}
+
+
+def timed(fn, *args, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the columnar deal archive against NDJSON scans')
+    parser.add_argument('--files', type=int, default=300, help='NDJSON files (one per period)')
+    parser.add_argument('--deals', type=int, default=400, help='Deals per file')
+    parser.add_argument('--skus', type=int, default=20000, help='Distinct SKUs')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        processed_dir, archive_dir = Path(tmp) / "processed", Path(tmp) / "archive"
+        processed_dir.mkdir()
+        write_corpus(processed_dir, args.files, args.deals, args.skus, rng)
+        files = archive_files(processed_dir)
+
+        started = time.perf_counter()
+        archive = DealArchive.empty()
+        archive.update(files)
+        archive.save(archive_dir)
+        build_s = time.perf_counter() - started
+        load_ms, archive = timed(DealArchive.load, archive_dir)
+        print(f"{args.files} files x {args.deals} deals: archive built in {build_s:.2f}s, loaded in {load_ms:.1f}ms")
+
+        sku = str(1000000 + args.skus // 2)
+        day = (date(2019, 1, 1) + timedelta(days=7 * args.files // 2)).isoformat()
+        queries = [
+            (f"sku_history({sku})", (scan_sku_history, files, sku), (archive.sku_history, sku)),
+            (f"active_on({day})", (scan_active_on, files, day), (archive.active_on, day)),
+            ("category_monthly_avg()", (scan_category_monthly, files), (archive.category_monthly_avg,)),
+        ]
+        print(f"{'query':<32} {'NDJSON ms':>10} {'archive ms':>11} {'speedup':>8} {'rows':>6}")
+        for name, (scan_fn, *scan_args), (query_fn, *query_args) in queries:
+            scan_ms, expected = timed(scan_fn, *scan_args, repeat=1)
+            query_ms, result = timed(query_fn, *query_args)
+            print(f"{name:<32} {scan_ms:>10.1f} {query_ms:>11.2f} {scan_ms / max(query_ms, 1e-6):>7.0f}x {len(result):>6}")
+            if len(result) != len(expected):
+                print(f"  mismatch: NDJSON scan returned {len(expected)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+bench_fts_search.py
+-------------------
+Compare the backend's old `product.name LIKE '%q%'` search with the product_fts
+MATCH query on a local sqlite3 database built from the backend migrations and a
+synthetic catalog.
+
+Usage:
+  python benchmarks/bench_fts_search.py [--sizes 1000 10000 50000] [--periods 6] [--queries 200]
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from utils.search_index import fts_row, normalize_search_text
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent.parent / "backend" / "migrations"
+MIGRATIONS = ["0001_schema.sql", "0003_add_images_and_channel.sql", "0004_product_fts.sql"]
+
+BRANDS = ["Kirkland Signature", "Bounty", "Charmin", "Tide", "Dyson", "Samsung", "Member's Mark", "Nature Made",
+          "Huggies", "Starbucks", "Ninja", "Vitamix", "Duracell", "Cascade", "Crest", "Sony", "Apple", "LG"]
+NOUNS = ["Paper Towels", "Bath Tissue", "Laundry Detergent", "Cordless Vacuum", "4K TV", "Olive Oil", "Coffee Beans",
+         "Fish Oil", "Diapers", "Blender", "Batteries", "Dishwasher Pods", "Toothpaste", "Headphones", "Air Fryer",
+         "Almonds", "Protein Bars", "Sparkling Water", "Crème Brûlée", "Dog Food", "Patio Set", "Mattress"]
+SIZES = ["12 Rolls", "2-pack", "160 ct", "48 oz", "1.5L", "6 lbs", "Family Size", "Variety Pack", "100-count"]
+CATEGORIES = ["Home & Kitchen", "Electronics", "Grocery", "Health & Beauty", "Baby", "Pet Supplies", "Other"]
+
+SEARCH_SQL_LIKE = """
+    SELECT offer_period.*, product.sku, product.name, product.category, product.brand, product.image_url
+    FROM offer_period
+    JOIN product ON offer_period.product_id = product.id
+    WHERE product.name LIKE ?
+    ORDER BY offer_period.starts DESC
+"""
+SEARCH_SQL_FTS = """
+    SELECT offer_period.*, product.sku, product.name, product.category, product.brand, product.image_url
+    FROM product_fts
+    JOIN product ON product.id = product_fts.rowid
+    JOIN offer_period ON offer_period.product_id = product.id
+    WHERE product_fts MATCH ?
+    ORDER BY offer_period.starts DESC
+"""
+
+
+def to_fts_query(query: str) -> str:
+    """Same as toFtsQuery in backend/src/db/fts.ts"""
+    return " ".join(f'"{token}"*' for token in normalize_search_text(query).split())
+
+
+def build_db(n_products: int, periods: int, rng: random.Random) -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:")
+    for migration in MIGRATIONS:
+        db.executescript((MIGRATIONS_DIR / migration).read_text("utf-8"))
+
+    products, offers, fts_rows = [], [], []
+    for product_id in range(1, n_products + 1):
+        name = f"{rng.choice(BRANDS)} {rng.choice(NOUNS)}, {rng.choice(SIZES)}"
+        category = rng.choice(CATEGORIES)
+        details = f"{rng.choice(SIZES)}. Item {1000000 + product_id}, Limit {rng.randint(1, 5)}"
+        products.append((product_id, str(1000000 + product_id), name, category))
+        row = fts_row({"name": name, "category": category, "details": details})
+        fts_rows.append((product_id, row["name"], row["category"], row["details"]))
+        for p in range(periods):
+            starts = f"20{20 + p // 12:02d}-{p % 12 + 1:02d}-01"
+            ends = f"20{20 + p // 12:02d}-{p % 12 + 1:02d}-25"
+            offers.append((product_id, "dollar", 3.0, 3.0, details, starts, ends))
+
+    db.executemany("INSERT INTO product (id, sku, name, category) VALUES (?, ?, ?, ?)", products)
+    db.executemany("INSERT INTO offer_period (product_id, sale_type, discount_low, discount_high, details, starts, ends)"
+                   " VALUES (?, ?, ?, ?, ?, ?, ?)", offers)
+    # Same rows convert_deals_to_sql.py emits (the migration's backfill ran on an empty catalog)
+    db.executemany("INSERT INTO product_fts (rowid, name, category, details) VALUES (?, ?, ?, ?)", fts_rows)
+    db.commit()
+    return db
+
+
+def time_queries(db: sqlite3.Connection, sql: str, params: list[str]) -> tuple[float, float, int]:
+    """(median ms, p95 ms, total rows) over the given query parameters."""
+    timings, rows = [], 0
+    for param in params:
+        started = time.perf_counter()
+        rows += len(db.execute(sql, (param,)).fetchall())
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LIKE vs FTS5 product search')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Catalog sizes (products)')
+    parser.add_argument('--periods', type=int, default=6, help='Offer periods per product (default: 6)')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per size (default: 200)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = [w for phrase in BRANDS + NOUNS for w in phrase.split()]
+    queries = [" ".join(rng.sample(words, rng.choice([1, 1, 2]))) for _ in range(args.queries)]
+
+    print(f"{'products':>9} {'LIKE med ms':>12} {'LIKE p95':>9} {'FTS med ms':>11} {'FTS p95':>8} {'speedup':>8}")
+    for size in args.sizes:
+        db = build_db(size, args.periods, rng)
+        like = time_queries(db, SEARCH_SQL_LIKE, [f"%{q}%" for q in queries])
+        fts = time_queries(db, SEARCH_SQL_FTS, [to_fts_query(q) for q in queries])
+        print(f"{size:>9} {like[0]:>12.2f} {like[1]:>9.2f} {fts[0]:>11.2f} {fts[1]:>8.2f} {like[0] / max(fts[0], 1e-6):>7.1f}x"
+              f"   (rows: LIKE {like[2]}, FTS {fts[2]})")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+bench_parallel_tiles.py
+-----------------------
+Speedup of parsing an offers page's tiles in worker processes over the
+single-process extraction, by tile count.
+
+Pages are synthetic 2025 layouts (AdBuilder tiles with the wrapper divs of the
+real markup), so no snapshot is needed. Each size is extracted in-process and
+with --workers processes (best of --repeat runs); both must yield the same deals.
+
+Usage:
+  python benchmarks/bench_parallel_tiles.py [--tiles 200,1000,5000,20000] [--workers 4] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from crawlers import extract_costco_offers_local_v2025 as extractor
+
+NAMES = ["Kirkland Signature Paper Towels, 12 Rolls", "Dixie Ultra 10 1/16\" Plates", "Tide Pods Laundry Detergent",
+         "Samsung 65\" Class QLED 4K TV", "Purina Pro Plan Dog Food, 35 lbs", "Ninja Air Fryer XL"]
+CHANNELS = ["Warehouse-Only", "In-Warehouse &amp; Online", "Online-Only"]
+# Styled wrappers like the real markup carries around every tile's content
+PADDING = "".join(f'<div class="MuiBox-root css-{k}x" style="display:flex;padding:4px"><span class="sr-only">'
+                  f'&nbsp;</span></div>' for k in range(12))
+
+
+def make_tile(i: int) -> str:
+    sku = 1700000 + i
+    if i % 7 == 0:
+        price = (f'<div data-testid="prices_and_percentages_prices"><div data-testid="Text">{i % 30 + 5}</div>'
+                 f'<div data-testid="Text">%</div><div data-testid="Text">OFF</div></div>')
+    else:
+        price = (f'<div data-testid="prices_and_percentages_prices"><div data-testid="Text">$</div>'
+                 f'<div data-testid="Text">{i % 40 + 1}</div><div data-testid="Text">OFF</div></div>')
+    details = f"{i % 50 + 1} ct. Item {sku}, {sku + 500000}. Limit 5." if i % 20 else f"{i % 50 + 1} ct. Limit 2."
+    return (f'<div data-testid="AdBuilder" class="MuiGrid-item"><div class="tile">{PADDING}'
+            f'<a href="https://web.archive.org/web/20250514000000/https://www.costco.com/p.product.{4000000 + i}.html">'
+            f'<img src="https://bfasset.costco-static.com/ad/{i}_{sku}.png" alt="offer {i}"></a>'
+            f'<div data-testid="strip"><div data-testid="Text">{CHANNELS[i % 3]}</div></div>{price}'
+            f'<div data-testid="below_the_ad_text_content"><div class="text">{PADDING}'
+            f'<div data-testid="Text">{NAMES[i % len(NAMES)]} #{i}</div><div data-testid="Text">{details}</div>'
+            f'</div></div></div></div>')
+
+
+def make_page(tiles: int) -> str:
+    return ('<html><head><title>Costco Offers</title></head><body><header><div>Valid 5/14/25 - 6/8/25</div>'
+            '</header><main>' + "".join(make_tile(i) for i in range(tiles)) + '</main></body></html>')
+
+
+def time_extract(html_text: str, workers: int, min_tiles: int, repeat: int) -> tuple[float, list[dict]]:
+    best, deals = float("inf"), []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        deals, _ = extractor.extract_page(html_text, workers=workers, min_tiles=min_tiles)
+        best = min(best, time.perf_counter() - started)
+    return best, deals
+
+
+def comparable(deals: list[dict]) -> list[dict]:
+    return [{k: v for k, v in deal.items() if k != "seen_at"} for deal in deals]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel tile parsing by tile count')
+    parser.add_argument('--tiles', default='200,1000,5000,20000', help='Comma-separated tile counts')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes of the parallel runs (default: one per CPU)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant, best is reported (default: 3)')
+    args = parser.parse_args()
+
+    workers = max(args.workers, 2)
+    print(f"{'tiles':>7}{'page MB':>9}{'serial s':>10}{f'{workers} procs s':>11}{'speedup':>9}")
+    for tiles in [int(n) for n in args.tiles.split(",")]:
+        html_text = make_page(tiles)
+        serial_s, serial = time_extract(html_text, 1, 0, args.repeat)
+        parallel_s, parallel = time_extract(html_text, workers, 0, args.repeat)
+        if comparable(serial) != comparable(parallel):
+            sys.exit(f"Parallel extraction of {tiles} tiles differs from the serial one")
+        print(f"{tiles:>7}{len(html_text) / 1e6:>9.1f}{serial_s:>10.3f}{parallel_s:>11.3f}"
+              f"{serial_s / parallel_s:>8.2f}x")
+    print(f"\nPages below {extractor.parallel_tiles.PARALLEL_MIN_TILES} tiles stay single-process by default "
+          f"({os.cpu_count()} CPUs here).")
+
+
+if __name__ == "__main__":
+    main()
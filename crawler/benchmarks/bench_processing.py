@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+bench_processing.py
+-------------------
+Time fill_missing_skus, convert_deals_to_sql and ingest_deals on synthetic
+processed corpora of growing size, to see how each stage scales with the number
+of periods in the archive.
+
+The corpus has what real archives have: products that recur across periods
+(popular ones more often), tiles listing several SKUs, deals without SKU, name
+variants ("…, 12 Rolls", different casing) and duplicate tiles. Each (stage,
+scale) run happens in a fresh process, so its peak RSS is its own; ingest posts
+to a local stub server that answers like the backend. Per-stage timings from
+utils.instrument are included in the results.
+
+  fill_missing_skus   fill the newest period against every other one
+  convert             convert every period in order, with snapshot/FTS/alias state
+  ingest              ingest every period in order through the stub API
+
+Usage:
+  python benchmarks/bench_processing.py [--periods 12,48,192] [--deals 300] [--products 4000]
+  python benchmarks/bench_processing.py --out bench.json
+  python benchmarks/bench_processing.py --baseline bench.json [--tolerance 0.25]   # exit 1 on regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+STAGES = ("fill_missing_skus", "convert", "ingest")
+CATEGORIES = ["Home & Kitchen", "Electronics", "Grocery", "Health & Beauty", "Baby", "Pet Supplies", "Other"]
+BRANDS = ["Kirkland Signature", "Bounty", "Charmin", "Tide", "Duracell", "Samsung", "Dyson", "Nature Made",
+          "Huggies", "Ninja", "Vitamix", "Keurig", "Cascade", "Purina", "Blue Diamond", "Member's Mark"]
+NOUNS = ["Paper Towels", "Bath Tissue", "Laundry Detergent", "AA Batteries", "OLED TV", "Cordless Vacuum",
+         "Fish Oil", "Diapers", "Air Fryer", "Blender", "Coffee Pods", "Dishwasher Pods", "Dog Food",
+         "Almonds", "Olive Oil", "Protein Bars", "Trash Bags", "Sparkling Water", "Mixed Nuts", "Vitamin D3"]
+SIZES = ["12 Rolls", "30 Rolls", "146 Loads", "48-count", '65"', "2-pack", "180 Softgels", "Size 4, 180 ct",
+         "6 qt", "64 oz", "100-count", "90-count", "40 lbs", "3 lbs", "2 L", "24 ct", "200-count", "35 pk"]
+
+
+def make_catalog(n_products: int, rng: random.Random) -> list[dict]:
+    catalog = []
+    for i in range(n_products):
+        sku = str(1000000 + i * 7)
+        name = f"{rng.choice(BRANDS)} {rng.choice(NOUNS)}, {rng.choice(SIZES)}"
+        catalog.append({
+            "sku": sku,
+            # One tile in ten lists a second item number
+            "alt_skus": [str(5000000 + i)] if rng.random() < 0.1 else [],
+            "name": name,
+            "category": rng.choice(CATEGORIES),
+        })
+    return catalog
+
+
+def name_variant(name: str, rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.4:
+        return name.rsplit(",", 1)[0]
+    if roll < 0.7:
+        return name.upper()
+    return f"{name}, {rng.choice(SIZES)}"
+
+
+def write_corpus(processed_dir: Path, n_periods: int, deals_per_period: int, catalog: list[dict],
+                 rng: random.Random) -> int:
+    """Write one NDJSON file per period; returns the total number of deal lines."""
+    popular = catalog[:max(1, len(catalog) // 5)]
+    first, total = date(2019, 1, 7), 0
+    for p in range(n_periods):
+        starts = first + timedelta(days=14 * p)
+        ends = starts + timedelta(days=24)
+        period = {"starts": starts.isoformat(), "ends": ends.isoformat()}
+        # Popular products come back most periods, the long tail now and then
+        picked = {id(x): x for x in rng.sample(popular, min(len(popular), deals_per_period * 6 // 10))}
+        while len(picked) < min(deals_per_period, len(catalog)):
+            product = rng.choice(catalog)
+            picked[id(product)] = product
+        lines = []
+        for product in picked.values():
+            dollar = rng.random() < 0.8
+            deal = {
+                "link": f"https://www.costco.com/p.product.{product['sku']}.html",
+                "sku": product["sku"],
+                "alt_skus": product["alt_skus"],
+                "name": name_variant(product["name"], rng) if rng.random() < 0.15 else product["name"],
+                "image_url": f"https://images.costco-static.com/{product['sku']}-894__1.jpg",
+                "category": product["category"],
+                "discount": round(rng.uniform(1, 60), 2) if dollar else float(rng.choice([10, 15, 20, 25])),
+                "discount_type": "dollar" if dollar else "percent",
+                "details": f"{product['name'].rsplit(',', 1)[-1].strip()}. Item {product['sku']}, Limit 2.",
+                "seen_at": f"{starts}T08:00:00Z",
+                "valid_period": period,
+                "channel": rng.choice(["Both", "In-Warehouse", "Online"]),
+            }
+            if rng.random() < 0.05:
+                deal["sku"], deal["alt_skus"] = None, []
+                deal["details"] = deal["details"].split(" Item")[0]
+            lines.append(json.dumps(deal))
+            if rng.random() < 0.03:
+                lines.append(lines[-1])  # the same tile twice on the page
+        with open(processed_dir / f"savings_{starts:%Y%m%d}-{ends:%Y%m%d}.ndjson", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        total += len(lines)
+    return total
+
+
+class StubIngestHandler(BaseHTTPRequestHandler):
+    """Answers POST /api/ingest like the backend, without a database."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        count = len(json.loads(body))
+        payload = json.dumps({"status": "success", "message": "ok", "details": {"count": count}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubIngestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/api/ingest"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def read_ndjson(path: Path) -> list[dict]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench_fill(processed_dir: Path, work_dir: Path) -> None:
+    from processors import fill_missing_skus
+    from utils import instrument
+    from utils.aliases import AliasMap
+
+    target = sorted(processed_dir.glob("*.ndjson"))[-1]
+    with instrument.stage("read"):
+        reference = fill_missing_skus.load_reference_deals(processed_dir, target)
+    fill_missing_skus.process_target_file(target, reference, AliasMap(path=work_dir / "alias_map.json"))
+
+
+def bench_convert(processed_dir: Path, work_dir: Path) -> None:
+    from processors import convert_deals_to_sql as convert
+    from utils.aliases import AliasMap
+    from utils.search_index import SearchIndexState
+    from utils.snapshot_state import SnapshotState
+
+    snapshot_state = SnapshotState(work_dir / "snapshot_state_sql.json")
+    search_index = SearchIndexState(work_dir / "fts_index_state.json")
+    alias_map = AliasMap(path=work_dir / "alias_map.json")
+    for path in sorted(processed_dir.glob("*.ndjson")):
+        available, _ = convert.split_deals(read_ndjson(path))
+        sql = convert.build_sql(available, snapshot_state, search_index, alias_map)
+        (work_dir / f"{path.stem}.sql").write_text(sql, "utf-8")
+        snapshot_state.save()
+        search_index.save()
+        alias_map.save()
+
+
+def bench_ingest(processed_dir: Path, work_dir: Path) -> None:
+    from processors import ingest_deals
+    from utils.aliases import AliasMap
+    from utils.snapshot_state import SnapshotState
+
+    snapshot_state = SnapshotState(work_dir / "snapshot_state_local.json")
+    alias_map = AliasMap(path=work_dir / "alias_map.json")
+    with stub_server() as api_url:
+        for path in sorted(processed_dir.glob("*.ndjson")):
+            valid = [d for d in ingest_deals.read_deals_file(str(path)) if ingest_deals.validate_deal(d)[0]]
+            ingest_deals.ingest_deals(valid, api_url, False, snapshot_state, alias_map)
+            snapshot_state.save()
+            alias_map.save()
+
+
+BENCHES = {"fill_missing_skus": bench_fill, "convert": bench_convert, "ingest": bench_ingest}
+
+
+def run_stage(stage: str, processed_dir: str, work_dir: str, results) -> None:
+    """Child process: run one stage under a trace and report seconds, peak RSS and stage timings."""
+    import logging
+    from utils import instrument
+
+    logging.disable(logging.INFO)  # fill_missing_skus logs every filled SKU
+    trace_file = Path(work_dir) / f"trace_{stage}.json"
+    args = argparse.Namespace(trace=True, trace_file=str(trace_file), profile=False)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        with instrument.session(f"bench_{stage}", args):
+            BENCHES[stage](Path(processed_dir), Path(work_dir))
+    seconds = time.perf_counter() - started
+    trace = json.loads(trace_file.read_text())
+    results.put({
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {name: entry["seconds"] for name, entry in trace["stages"].items()},
+    })
+
+
+def run_isolated(stage: str, processed_dir: Path, work_dir: Path) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=run_stage, args=(stage, str(processed_dir), str(work_dir), results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"{stage} failed with exit code {process.exitcode}")
+    return results.get()
+
+
+def compare(rows: list[dict], baseline_file: str, tolerance: float) -> list[str]:
+    with open(baseline_file, "r") as f:
+        baseline = {(r["stage"], r["periods"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for row in rows:
+        before = baseline.get((row["stage"], row["periods"]))
+        if before and row["deals_per_s"] < before["deals_per_s"] * (1 - tolerance):
+            regressions.append(f"{row['stage']} at {row['periods']} periods: "
+                               f"{row['deals_per_s']:.0f} deals/s vs {before['deals_per_s']:.0f} in the baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the processing stages on synthetic corpora of growing size')
+    parser.add_argument('--periods', default='12,48,192', help='Comma-separated corpus sizes in periods (NDJSON files)')
+    parser.add_argument('--deals', type=int, default=300, help='Deals per period')
+    parser.add_argument('--products', type=int, default=4000, help='Distinct products in the catalog')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f'Comma-separated subset of {",".join(STAGES)}')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help='Write the results as JSON (usable as a --baseline later)')
+    parser.add_argument('--baseline', help='Results JSON of an earlier run to compare throughput with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed throughput drop against the baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    scales = [int(p) for p in args.periods.split(',')]
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    catalog = make_catalog(args.products, rng)
+    rows = []
+    print(f"{'stage':<18} {'periods':>7} {'deals':>8} {'seconds':>8} {'deals/s':>9} {'peak MB':>8}  top stages")
+    for periods in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            processed_dir = Path(tmp) / "processed"
+            processed_dir.mkdir()
+            n_deals = write_corpus(processed_dir, periods, args.deals, catalog, random.Random(args.seed + periods))
+            for stage in stages:
+                work_dir = Path(tmp) / stage
+                work_dir.mkdir()
+                result = run_isolated(stage, processed_dir, work_dir)
+                row = {"stage": stage, "periods": periods, "deals": n_deals, **result,
+                       "deals_per_s": round(n_deals / max(result["seconds"], 1e-9), 1)}
+                rows.append(row)
+                top = ", ".join(f"{name} {s:.2f}s" for name, s in
+                                sorted(result["stages"].items(), key=lambda item: -item[1])[:3])
+                print(f"{stage:<18} {periods:>7} {n_deals:>8} {result['seconds']:>8.2f} "
+                      f"{row['deals_per_s']:>9.0f} {result['peak_rss_mb']:>8.1f}  {top}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"deals_per_period": args.deals, "products": args.products, "seed": args.seed,
+                       "results": rows}, f, indent=2)
+        print(f"Wrote results to {args.out}")
+    if args.baseline:
+        regressions = compare(rows, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No throughput regression beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
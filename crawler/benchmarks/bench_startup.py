@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+----------------
+Cold start of every `src/cli.py` subcommand: a fresh interpreter per run,
+timed from launch to exit, with `-X importtime` telling how much of it went to
+imports and which top-level packages were the heaviest.
+
+Interpreter startup itself (site, encodings, ...) is measured once with
+`python -X importtime -c pass` and left out of the import time. Each case has
+a budget on its import time and a list of packages it must not import at all
+(e.g. ingest without requests/bs4 until it sends something); the run exits 1
+when a case breaks either.
+
+Usage:
+  python benchmarks/bench_startup.py [--repeat 5] [--budget-scale 1.5] [--out startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CLI = Path(__file__).resolve().parent.parent / "src" / "cli.py"
+
+# (name, cli arguments, import budget in ms, packages that must not be imported)
+CASES = [
+    ("cli --help", ["--help"], 20, ["bs4", "lxml", "requests", "dotenv", "numpy", "playwright"]),
+    ("extract --help", ["extract", "--help"], 350, ["requests", "dotenv", "numpy", "playwright"]),
+    ("fill-skus --help", ["fill-skus", "--help"], 120, ["bs4", "lxml", "requests", "numpy", "playwright"]),
+    ("convert --help", ["convert", "--help"], 120, ["bs4", "lxml", "requests", "dotenv", "numpy", "playwright"]),
+    ("ingest --help", ["ingest", "--help"], 120, ["bs4", "lxml", "requests", "dotenv", "numpy", "playwright"]),
+    ("backfill --help", ["backfill", "--help"], 120, ["bs4", "lxml", "requests", "dotenv", "numpy", "playwright"]),
+    ("match --help", ["match", "--help"], 120, ["bs4", "lxml", "requests", "dotenv", "numpy", "playwright"]),
+    ("ingest --validate-only", ["ingest", "--validate-only", "--file", "{deals}"], 120,
+     ["bs4", "lxml", "requests", "dotenv", "numpy", "playwright"]),
+]
+
+SAMPLE_DEAL = {
+    "link": "https://www.costco.com/p.product.100352100.html", "sku": "1111161", "alt_skus": [],
+    "name": "Dixie Ultra 10 1/16\" Plates", "image_url": None, "category": "Home & Kitchen", "discount": 4.0,
+    "discount_type": "dollar", "details": "186 ct. Item 1111161, Limit 2.", "seen_at": "2025-05-14T08:00:00Z",
+    "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"}, "channel": "Warehouse-Only",
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Cumulative microseconds of every top-level import (nested ones are indented)."""
+    top = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            top[name.strip()] = int(cumulative)
+    return top
+
+
+def run_python(args: list[str]) -> tuple[float, dict[str, int], int]:
+    # No .pyc writes, so every run starts the same way
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True, env=env)
+    return time.perf_counter() - started, parse_importtime(proc.stderr), proc.returncode
+
+
+def interpreter_startup_modules() -> set[str]:
+    return set(run_python(["-c", "pass"])[1])
+
+
+def run_once(cli_args: list[str]) -> tuple[float, dict[str, int], int]:
+    return run_python([str(CLI), *cli_args])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cold start of the crawler CLI subcommands')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case, the median is reported (default: 5)')
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='Multiply every import budget, e.g. for slow CI machines (default: 1.0)')
+    parser.add_argument('--out', help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    startup_modules = interpreter_startup_modules()
+
+    results, failures = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        deals = Path(tmp) / "deals.ndjson"
+        deals.write_text(json.dumps(SAMPLE_DEAL) + "\n")
+        print(f"{'case':<24}{'wall ms':>9}{'import ms':>11}{'budget':>8}  heaviest imports")
+        for name, cli_args, budget_ms, forbidden in CASES:
+            cli_args = [a.format(deals=deals) for a in cli_args]
+            walls, import_ms, imported, status = [], [], set(), 0
+            for _ in range(args.repeat):
+                wall, top, status = run_once(cli_args)
+                own = {module: us for module, us in top.items() if module not in startup_modules}
+                walls.append(wall * 1000)
+                import_ms.append(sum(own.values()) / 1000)
+                imported |= set(own)
+            heaviest = sorted(own.items(), key=lambda item: -item[1])[:3]
+            budget = budget_ms * args.budget_scale
+            wall_med, import_med = statistics.median(walls), statistics.median(import_ms)
+            bad = sorted({m.split(".")[0] for m in imported} & set(forbidden))
+            print(f"{name:<24}{wall_med:>9.1f}{import_med:>11.1f}{budget:>8.0f}  "
+                  + ", ".join(f"{m} {us / 1000:.0f}ms" for m, us in heaviest))
+            if status != 0:
+                failures.append(f"{name}: exited with {status}")
+            if import_med > budget:
+                failures.append(f"{name}: imports took {import_med:.1f} ms, budget {budget:.0f} ms")
+            if bad:
+                failures.append(f"{name}: imported {', '.join(bad)}")
+            results.append({"case": name, "wall_ms": round(wall_med, 1), "import_ms": round(import_med, 1),
+                            "budget_ms": budget, "heaviest": dict(heaviest), "forbidden_imported": bad,
+                            "exit_status": status})
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"python": sys.version.split()[0], "results": results}, indent=2))
+        print(f"\nWrote {args.out}")
+    if failures:
+        print("\nOver budget:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
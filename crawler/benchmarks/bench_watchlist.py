@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+bench_watchlist.py
+------------------
+Match a synthetic batch of deals against a synthetic watchlist, with the
+compiled Watchlist (token Aho-Corasick + SKU dict, utils/watchlist.py) and
+with the obvious loop of every watch term over every deal, like
+determine_category does with its keywords. Both must find the same matches.
+
+The watchlist has --terms keywords (one to three words, drawn from the same
+vocabulary as the deal names so that many of them hit) spread over entries
+of five keywords, plus one watched SKU per ten entries.
+
+Usage:
+  python benchmarks/bench_watchlist.py [--terms 10000] [--deals 5000] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from utils.search_index import normalize_search_text
+from utils.watchlist import Watchlist, WatchEntry, deal_text
+
+BRANDS = ["Kirkland Signature", "Bounty", "Charmin", "Tide", "Dyson", "Samsung", "Nature Made", "Huggies",
+          "Starbucks", "Ninja", "Vitamix", "Duracell", "Cascade", "Crest", "Sony", "Apple", "LG", "Purina"]
+NOUNS = ["Paper Towels", "Bath Tissue", "Laundry Detergent", "Cordless Vacuum", "4K TV", "Olive Oil", "Coffee Beans",
+         "Fish Oil", "Diapers", "Blender", "Batteries", "Dishwasher Pods", "Toothpaste", "Headphones", "Air Fryer",
+         "Almonds", "Protein Bars", "Sparkling Water", "Crème Brûlée", "Dog Food", "Patio Set", "Mattress"]
+SIZES = ["12 Rolls", "2-pack", "160 ct", "48 oz", "1.5L", "6 lbs", "Family Size", "Variety Pack", "100-count"]
+KEYWORDS_PER_ENTRY = 5
+
+
+def make_deals(n: int, rng: random.Random) -> list[dict]:
+    deals = []
+    for i in range(n):
+        sku = str(1000000 + i)
+        deals.append({
+            "sku": sku, "alt_skus": [str(2000000 + i)] if i % 10 == 0 else [],
+            "name": f"{rng.choice(BRANDS)} {rng.choice(NOUNS)}, {rng.choice(SIZES)}",
+            "details": f"{rng.choice(SIZES)}. Item {sku}, Limit {rng.randint(1, 5)}.",
+            "discount": float(rng.randint(1, 30)), "discount_type": "dollar",
+            "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"}, "channel": "Warehouse-Only",
+        })
+    return deals
+
+
+def make_watchlist(terms: int, n_deals: int, rng: random.Random) -> list[WatchEntry]:
+    vocabulary = sorted({word for phrase in BRANDS + NOUNS + SIZES for word in normalize_search_text(phrase).split()})
+    # Mostly words no deal has, like a real watchlist full of things that are not on sale
+    vocabulary += [f"term{k}" for k in range(terms)]
+    entries = []
+    for e in range(-(-terms // KEYWORDS_PER_ENTRY)):
+        keywords = [" ".join(rng.choice(vocabulary) for _ in range(rng.choice((1, 2, 2, 3))))
+                    for _ in range(min(KEYWORDS_PER_ENTRY, terms - e * KEYWORDS_PER_ENTRY))]
+        skus = [str(1000000 + rng.randrange(n_deals * 2))] if e % 10 == 0 else []
+        entries.append(WatchEntry(id=f"w{e}", user=f"user{e // 3}", keywords=keywords, skus=skus))
+    return entries
+
+
+def match_naive(entries: list[WatchEntry], deals: list[dict]) -> dict[str, list[tuple[str, list[str]]]]:
+    """Every term of every entry tested against every deal (whole words on the normalized text)."""
+    normalized = [[normalize_search_text(k) for k in entry.keywords] for entry in entries]
+    grouped = {}
+    for deal in deals:
+        text = f" {deal_text(deal)} "
+        deal_skus = [deal["sku"], *deal["alt_skus"]]
+        for entry, keywords in zip(entries, normalized):
+            matched = [k for k in dict.fromkeys(keywords) if k and f" {k} " in text]
+            matched += [f"sku {sku}" for sku in deal_skus if sku in entry.skus]
+            if matched:
+                grouped.setdefault(entry.id, []).append((deal["sku"], matched))
+    return grouped
+
+
+def comparable(matches: dict) -> dict[str, list[tuple[str, list[str]]]]:
+    """Either output as {entry id: [(sku, sorted matched terms)]}."""
+    return {entry_id: [(m["sku"], sorted(m["matched"])) if isinstance(m, dict) else (m[0], sorted(m[1]))
+                       for m in deals]
+            for entry_id, deals in matches.items()}
+
+
+def best_of(repeat: int, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the compiled watchlist against a naive term loop')
+    parser.add_argument('--terms', type=int, default=10000, help='Watch keywords (default: 10000)')
+    parser.add_argument('--deals', type=int, default=5000, help='Deals in the batch (default: 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of the compiled matcher, best is reported (default: 3)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    deals = make_deals(args.deals, rng)
+    entries = make_watchlist(args.terms, args.deals, rng)
+
+    compile_s, watchlist = best_of(args.repeat, lambda: Watchlist(entries))
+    match_s, matches = best_of(args.repeat, lambda: watchlist.match(deals))
+    naive_s, naive = best_of(1, lambda: match_naive(entries, deals))
+
+    matched_deals = sum(len(d) for d in matches.values())
+    print(f"{len(entries)} entries, {args.terms} keywords ({len(watchlist.keywords)} distinct), "
+          f"{len(watchlist.skus)} SKUs; {args.deals} deals")
+    print(f"{'matcher':<12}{'compile s':>10}{'match s':>10}{'deals/s':>12}")
+    print(f"{'compiled':<12}{compile_s:>10.3f}{match_s:>10.3f}{args.deals / match_s:>12.0f}")
+    print(f"{'naive loop':<12}{'-':>10}{naive_s:>10.3f}{args.deals / naive_s:>12.0f}")
+    print(f"{len(matches)} entries matched, {matched_deals} (entry, deal) matches; "
+          f"{naive_s / match_s:.0f}x faster than the loop")
+
+    if comparable(matches) != comparable(naive):
+        print("Mismatch: the compiled watchlist and the naive loop found different matches")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,14 @@ CONFIG_FILE="$REPO_ROOT/backend/wrangler.dev.toml"
 
 echo "Applying migrations to database: $DB_NAME"
 
-echo "Schema: $MIGRATIONS_DIR"
+echo "Schema: $SCHEMA_MIGRATIONS_DIR"
 echo "Config: $CONFIG_FILE"
 
 # Apply schema
-wrangler d1 execute $DB_NAME --file "$MIGRATIONS_DIR/0001_schema.sql" --local --config "$CONFIG_FILE"
-wrangler d1 execute $DB_NAME --file "$MIGRATIONS_DIR/0003_add_images_and_channel.sql" --local --config "$CONFIG_FILE"
+wrangler d1 execute $DB_NAME --file "$SCHEMA_MIGRATIONS_DIR/0001_schema.sql" --local --config "$CONFIG_FILE"
+wrangler d1 execute $DB_NAME --file "$SCHEMA_MIGRATIONS_DIR/0003_add_images_and_channel.sql" --local --config "$CONFIG_FILE"
+wrangler d1 execute $DB_NAME --file "$SCHEMA_MIGRATIONS_DIR/0004_product_fts.sql" --local --config "$CONFIG_FILE"
+wrangler d1 execute $DB_NAME --file "$SCHEMA_MIGRATIONS_DIR/0005_product_thumbnail.sql" --local --config "$CONFIG_FILE"
 
 echo "Schema migrations applied successfully."
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+cli.py
+------
+One entry point for the crawler scripts:
+
+  python src/cli.py extract   data/raw/savings_051425_060825.html [--workers 4]
+  python src/cli.py fill-skus data/processed/savings_20250514-20250608.ndjson
+  python src/cli.py convert   --file data/processed/savings_20250514-20250608.ndjson
+  python src/cli.py ingest    --file data/processed/savings_20250514-20250608.ndjson [--d1 | --validate-only]
+  python src/cli.py crawl     --targets targets.txt
+  python src/cli.py backfill  --from 2024-01-01 --to 2024-12-31 [--workers 4]
+  python src/cli.py match     --watchlist watchlist.ndjson data/processed/savings_20250514-20250608.ndjson
+
+Everything after the subcommand goes to that script's own parser, so
+`cli.py ingest --help` is `ingest_deals.py --help`. A subcommand's module (and
+with it bs4/lxml, requests, playwright, ...) is only imported when that
+subcommand runs; `cli.py --help` imports none of them. `extract` picks the
+2024 or 2025 extractor from the snapshot's date like run_pipeline.sh, or from
+--layout.
+
+benchmarks/bench_startup.py measures the cold start of every subcommand.
+"""
+import importlib
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# subcommand -> (module with a main(argv), one-line help); extract's module depends on the snapshot
+COMMANDS = {
+    "extract": (None, "Extract deals from a saved offers page (.html, .html.gz, .html.zst)"),
+    "fill-skus": ("processors.fill_missing_skus", "Fill missing SKUs of a deals NDJSON from the other processed files"),
+    "convert": ("processors.convert_deals_to_sql", "Validate deals and write the SQL for D1"),
+    "ingest": ("processors.ingest_deals", "Validate deals and send them to the ingest API"),
+    "crawl": ("crawlers.live_crawler_to_html", "Render live offers pages with a headless browser and save them"),
+    "backfill": ("crawlers.wayback_backfill", "Download historical offers pages from the Wayback Machine"),
+    "match": ("processors.match_watchlist", "Match deals NDJSON files against a watchlist of keywords and SKUs"),
+}
+LAYOUTS = ("v2024", "v2025")
+
+
+def usage() -> str:
+    lines = ["usage: cli.py <command> [args ...]", "", "commands:"]
+    lines += [f"  {name:<10} {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "Run `cli.py <command> --help` for the options of a command."]
+    return "\n".join(lines)
+
+
+def extractor_module(argv: List[str]) -> tuple[str, List[str]]:
+    """The extractor for `extract` (--layout, else the snapshot's date) and argv without --layout."""
+    if "--layout" in argv:
+        i = argv.index("--layout")
+        layout = argv[i + 1] if i + 1 < len(argv) else None
+        if layout not in LAYOUTS:
+            sys.exit(f"cli.py extract: --layout must be one of {', '.join(LAYOUTS)}")
+        return f"crawlers.extract_costco_offers_local_{layout}", argv[:i] + argv[i + 2:]
+    snapshot = next((arg for arg in argv if not arg.startswith("-")), None)
+    if snapshot is None:
+        return "crawlers.extract_costco_offers_local_v2025", argv
+    from crawlers import extractor_for
+    return extractor_for(Path(snapshot).name).__name__, argv
+
+
+def main(argv: List[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        sys.exit(f"cli.py: unknown command '{command}'\n\n{usage()}")
+    module_name = COMMANDS[command][0]
+    if module_name is None:
+        module_name, rest = extractor_module(rest)
+    # Scripts report their own name in --help and error messages
+    sys.argv = [f"cli.py {command}", *rest]
+    importlib.import_module(module_name).main(rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,26 @@
 """
 Crawler implementations for Costco Deals Finder.
-""" 
\ No newline at end of file
+"""
+import datetime as dt
+import importlib
+import re
+
+# Pages captured before this date use the 2024 (eco-coupons) layout
+V2025_LAYOUT_SINCE = dt.date(2024, 10, 20)
+
+
+def extractor_for(filename: str):
+    """
+    Return the extractor module for a raw snapshot, chosen from the
+    savings_MMDDYY_… date in its name (defaults to v2025), like run_pipeline.sh.
+    """
+    m = re.search(r"_(\d{2})(\d{2})(\d{2})", filename)
+    version = "v2025"
+    if m:
+        month, day, year = (int(g) for g in m.groups())
+        try:
+            if dt.date(2000 + year, month, day) < V2025_LAYOUT_SINCE:
+                version = "v2024"
+        except ValueError:
+            pass
+    return importlib.import_module(f"crawlers.extract_costco_offers_local_{version}")
@@ -12,23 +12,28 @@ extract_costco_offers_local_v2024.py
 
 Usage
   python extract_costco_offers_local_v2024.py savings_100924_110324.html
+  python extract_costco_offers_local_v2024.py savings_100924_110324.html.zst   # .gz works too
+
+The extraction itself is importable (see extract_deals).
 """
 from bs4 import BeautifulSoup, Tag
 from pathlib import Path
-import re, json, sys, datetime as dt
+from typing import Iterator
+import argparse, re, sys, datetime as dt
 
-if len(sys.argv) not in (2, 4):
-    sys.exit("usage: extract_costco_offers_local_v2024.py <saved_html> [<start_YYYY-MM-DD> <end_YYYY-MM-DD>]")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.aliases import parse_item_skus
+from utils import instrument, parallel_tiles
+from utils.html_io import read_html, snapshot_stem
+from utils.images import full_image_url, normalize_srcset
+from utils.ndjson_index import write_ndjson
 
-html_file = Path(sys.argv[1]).expanduser()
-# Read as UTF-8, replacing invalid bytes with the replacement character
-html_text = html_file.read_text("utf-8", errors="replace")
-soup = BeautifulSoup(html_text, "lxml")
+PROCESSED_DIR = Path(__file__).parent.parent.parent / "data" / "processed"
 
 # ────────────────────────────────────────────────────────────────────────────
 # Helpers
-ITEM_RE = re.compile(r"Item\s+([\d, ]+)")
-NOW_ISO = dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+# Comma-separated item numbers; stops before a trailing count or size ("Item 1234567, 7654321 1000 ct")
+ITEM_RE = re.compile(r"Item\s+(\d+(?:\s*,\s*\d+)*)")
 
 def clean_archive_url(url: str) -> str:
     """Removes web.archive.org prefix from a URL if present."""
@@ -209,31 +214,32 @@ def extract_offer_channel_v2024(tile: Tag) -> str:
         return "Unknown"
 
 def extract_image_url_v2024(tile: Tag) -> str | None:
-    """Extract the product image URL from the tile."""
+    """Extract the product image URL from the tile (src, else the widest srcset entry)."""
     img_tag = tile.find("img")
-    return clean_archive_url(img_tag["src"]) if img_tag and img_tag.has_attr("src") else None
-
-# ────────────────────────────────────────────────────────────────────────────
-deals = []
+    if not img_tag:
+        return None
+    src = clean_archive_url(img_tag["src"]) if img_tag.has_attr("src") else None
+    return full_image_url(src, img_tag.get("srcset"))
 
-# Extract valid period from command line or HTML
-if len(sys.argv) == 4:
-    valid_period = {"starts": sys.argv[2], "ends": sys.argv[3]}
-else:
-    valid_period = extract_valid_period(soup)
+def extract_image_srcset_v2024(tile: Tag) -> str | None:
+    """All width variants of the product image, as a normalized srcset."""
+    img_tag = tile.find("img")
+    return normalize_srcset(img_tag.get("srcset")) if img_tag else None
 
-tiles = soup.find_all("li", class_="eco-coupons")
-for tile in tiles:
+# ────────────────────────────────────────────────────────────────────────────
+def parse_tile(tile: Tag, valid_period: dict, seen_at: str) -> dict | None:
+    """Turn one eco-coupons tile into a deal dict, or None if it isn't an offer."""
     a_tag = tile.find("a", href=True)
     if not a_tag:
-        continue
+        return None
     link = clean_archive_url(a_tag["href"])
 
     image_url = extract_image_url_v2024(tile)
+    image_srcset = extract_image_srcset_v2024(tile)
     
     parsed_discount = parse_discount_v2024(tile)
     if not parsed_discount:
-        continue
+        return None
     discount, discount_type = parsed_discount
 
     name_div = tile.find("div", class_="eco-sl1")
@@ -245,52 +251,135 @@ for tile in tiles:
         details_parts.append(sl2_div.get_text(strip=True))
 
     items_div = tile.find("div", class_="eco-items")
-    sku = None
+    skus = []
     if items_div:
         items_text = items_div.get_text(strip=True)
         details_parts.append(items_text)
-        # Extract first SKU found
+        # Extract every SKU listed; the first is the primary one
         m_item = ITEM_RE.search(items_text)
         if m_item:
-            sku = m_item.group(1).split(',')[0].strip()
+            skus = parse_item_skus(m_item.group(1))
+    sku = skus[0] if skus else None
 
     details = ". ".join(filter(None, details_parts))
 
-    category = determine_category(name, details)
-    offer_channel = extract_offer_channel_v2024(tile)
+    with instrument.stage("classify"):
+        category = determine_category(name, details)
+        offer_channel = extract_offer_channel_v2024(tile)
 
-    deals.append({
+    return {
         "link": link,
         "sku": sku,
+        "alt_skus": skus[1:],
         "name": name,
         "image_url": image_url,
+        "image_srcset": image_srcset,
         "category": category,
         "discount": discount,
         "discount_type": discount_type,
         "details": details,
-        "seen_at": NOW_ISO,
+        "seen_at": seen_at,
         "valid_period": valid_period,
         "channel": offer_channel,
-    })
+    }
 
-# ────────────────────────────────────────────────────────────────────────────
-# Write deals to file with valid period in filename
-output_path = Path(__file__).parent.parent.parent / "data" / "processed"
-output_path.mkdir(parents=True, exist_ok=True)
-input_prefix = html_file.stem.split("_")[0] if "_" in html_file.stem else "deals"
-if valid_period["starts"] and valid_period["ends"]:
-    start_date = valid_period["starts"].replace("-", "")
-    end_date = valid_period["ends"].replace("-", "")
-    output_file = output_path / f"{input_prefix}_{start_date}-{end_date}.ndjson"
-else:
-    output_file = output_path / f"{input_prefix}_unknown_period_v2024.ndjson"
-
-with open(output_file, "w") as f:
-    for d in deals:
-        f.write(json.dumps(d) + "\n")
-
-print(f"Wrote {len(deals)} deals to {output_file}") 
-
-# Print number of deals with null SKU
-null_sku_count = sum(1 for d in deals if not d.get("sku"))
-print(f"Number of deals with null SKU: {null_sku_count}") 
\ No newline at end of file
+# Raw-text marker and lxml XPath of a tile, for the parallel path of extract_page
+TILE_MARKER = 'eco-coupons'
+TILE_XPATH  = "//li[contains(concat(' ', normalize-space(@class), ' '), ' eco-coupons ')]"
+
+def find_tiles(soup: BeautifulSoup) -> list:
+    return soup.find_all("li", class_="eco-coupons")
+
+def extract_deals(soup: BeautifulSoup, valid_period: dict | None = None) -> tuple[list[dict], dict]:
+    """
+    Extract all deals from a parsed 2024 offers page.
+    Returns (deals, valid_period); the period is read from the page unless given.
+    """
+    if valid_period is None:
+        valid_period = extract_valid_period(soup)
+    return list(iter_deals(soup, valid_period)), valid_period
+
+def iter_deals(soup: BeautifulSoup, valid_period: dict, seen_at: str | None = None) -> Iterator[dict]:
+    """Yield deals tile by tile, so callers can process them while the rest are parsed."""
+    seen_at = seen_at or dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    with instrument.stage("find_tiles"):
+        tiles = find_tiles(soup)
+    for tile in tiles:
+        with instrument.stage("tile_loop"):
+            deal = parse_tile(tile, valid_period, seen_at)
+        instrument.count("tiles")
+        if deal:
+            instrument.count("deals")
+            if not deal["sku"]:
+                instrument.count("deals_without_sku")
+            yield deal
+
+def output_file_for(input_stem: str, valid_period: dict, output_path: Path = PROCESSED_DIR) -> Path:
+    """processed/<prefix>_YYYYMMDD-YYYYMMDD.ndjson for an input named <prefix>_…"""
+    input_prefix = input_stem.split("_")[0] if "_" in input_stem else "deals"
+    if valid_period["starts"] and valid_period["ends"]:
+        start_date = valid_period["starts"].replace("-", "")
+        end_date = valid_period["ends"].replace("-", "")
+        return output_path / f"{input_prefix}_{start_date}-{end_date}.ndjson"
+    return output_path / f"{input_prefix}_unknown_period_v2024.ndjson"
+
+def write_deals(deals: list[dict], output_file: Path) -> None:
+    """Write the deals NDJSON and its .idx offset sidecar."""
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with instrument.stage("serialize"):
+        write_ndjson(deals, output_file)
+
+def extract_page(html_text: str, valid_period: dict | None = None, workers: int | None = None,
+                 min_tiles: int = parallel_tiles.PARALLEL_MIN_TILES) -> tuple[list[dict], dict]:
+    """
+    Extract all deals from page source. Pages with at least `min_tiles` tiles are
+    parsed by `workers` processes (default: one per CPU); smaller ones in-process.
+    """
+    workers = workers or parallel_tiles.default_workers()
+    if parallel_tiles.worth_parallel(html_text, TILE_MARKER, workers, min_tiles):
+        return parallel_tiles.extract_deals(html_text, TILE_XPATH, find_tiles, parse_tile, extract_valid_period,
+                                            valid_period, workers)
+    with instrument.stage("parse"):
+        soup = BeautifulSoup(html_text, "lxml")
+    return extract_deals(soup, valid_period)
+
+def extract_file(html_file: Path, valid_period: dict | None = None, workers: int | None = None,
+                 min_tiles: int = parallel_tiles.PARALLEL_MIN_TILES) -> tuple[list[dict], Path]:
+    """Extract a saved snapshot and write its NDJSON; returns (deals, output_file)."""
+    # Read as UTF-8, replacing invalid bytes with the replacement character
+    with instrument.stage("read"):
+        html_text = read_html(html_file, errors="replace")
+    deals, valid_period = extract_page(html_text, valid_period, workers, min_tiles)
+    # Write deals to file with valid period in filename
+    output_file = output_file_for(snapshot_stem(html_file), valid_period)
+    write_deals(deals, output_file)
+    return deals, output_file
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Extract deals from a saved 2024 offers page")
+    parser.add_argument("html_file", help="Saved page (.html, .html.gz or .html.zst)")
+    parser.add_argument("period", nargs="*", metavar="YYYY-MM-DD",
+                        help="Start and end of the valid period (default: read from the page)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes parsing the tiles of large pages (default: one per CPU, 1 disables)")
+    parser.add_argument("--parallel-min-tiles", type=int, default=parallel_tiles.PARALLEL_MIN_TILES,
+                        help=f"Pages with fewer tiles are parsed in-process (default: {parallel_tiles.PARALLEL_MIN_TILES})")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if len(args.period) not in (0, 2):
+        parser.error("give both the start and the end of the valid period")
+
+    # Extract valid period from command line or HTML
+    valid_period = {"starts": args.period[0], "ends": args.period[1]} if args.period else None
+    with instrument.session("extract_costco_offers_local_v2024", args):
+        deals, output_file = extract_file(Path(args.html_file).expanduser(), valid_period,
+                                          args.workers, args.parallel_min_tiles)
+
+    print(f"Wrote {len(deals)} deals to {output_file}") 
+
+    # Print number of deals with null SKU
+    null_sku_count = sum(1 for d in deals if not d.get("sku"))
+    print(f"Number of deals with null SKU: {null_sku_count}") 
+
+if __name__ == "__main__":
+    main()
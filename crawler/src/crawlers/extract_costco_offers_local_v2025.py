@@ -12,21 +12,29 @@ extract_tiles_costco.py
 
 Usage
   python extract_tiles_costco.py  savings_051425_060825.html
+  python extract_tiles_costco.py  savings_051425_060825.html.zst   # .gz works too
+
+The extraction itself is importable (see extract_deals) so the live pipeline can
+hand a captured DOM straight to it without a round-trip through disk.
 """
 from bs4 import BeautifulSoup
 from pathlib import Path
-import re, json, sys, datetime as dt
+from typing import Iterator
+import argparse, re, sys, datetime as dt
 
-if len(sys.argv) not in (2, 4):
-    sys.exit("usage: extract_tiles_costco.py  <saved_html> [<start_YYYY-MM-DD> <end_YYYY-MM-DD>]")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.aliases import parse_item_skus
+from utils import instrument, parallel_tiles
+from utils.html_io import read_html, snapshot_stem
+from utils.images import full_image_url, normalize_srcset
+from utils.ndjson_index import write_ndjson
 
-html_file = Path(sys.argv[1]).expanduser()
-soup      = BeautifulSoup(html_file.read_text("utf-8"), "lxml")
+PROCESSED_DIR = Path(__file__).parent.parent.parent / "data" / "processed"
 
 # ────────────────────────────────────────────────────────────────────────────
 # Helpers
-ITEM_RE    = re.compile(r"Item\s+(\d+)")
-NOW_ISO    = dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+# Comma-separated item numbers; stops before a trailing count or size ("Item 1234567, 7654321 1000 ct")
+ITEM_RE    = re.compile(r"Item\s+(\d+(?:\s*,\s*\d+)*)")
 
 def clean_archive_url(url: str) -> str:
     """Removes web.archive.org prefix from a URL if present."""
@@ -96,7 +104,7 @@ def parse_discount(price_block: "Tag") -> tuple[float, str] | None:
     We scan the child Text blocks to see which symbol appears.
     """
     # First try "After $X OFF"
-    append_text_div = tile.find("div", {"data-testid": "Text_prices_and_percentages_append_text"})
+    append_text_div = price_block.find("div", {"data-testid": "Text_prices_and_percentages_append_text"})
     if append_text_div:
         txt = append_text_div.get_text(strip=True)
         m = re.search(r"After\s+\$?(\d+(?:\.\d+)?)\s+OFF", txt, re.IGNORECASE)
@@ -161,56 +169,36 @@ def extract_offer_channel(tile: "Tag") -> str:
         return "Unknown"
 
 def extract_image_url(tile: "Tag") -> str | None:
-    """Extract the product image URL from the tile."""
+    """Extract the full-size product image URL from the tile (src, else the widest srcset entry)."""
     img_tag = tile.find("img")
     if not img_tag:
         return None
+    return full_image_url(img_tag.get("src"), img_tag.get("srcset"))
 
-    # Prioritize src, as it is more reliable on archived pages.
-    if img_tag.has_attr("src"):
-        src_url = img_tag["src"]
-        # Append width=320 to get a smaller image, if not already present.
-        if 'width=' not in src_url:
-            return f"{src_url}"
-        return src_url
-
-    # Fallback to srcset for live pages.
-    if img_tag.has_attr("srcset"):
-        srcset = img_tag["srcset"]
-        # Find the URL for 320w
-        for part in srcset.split(","):
-            part = part.strip()
-            if part.endswith(" 320w"):
-                return part.split(" ")[0]
-
-    return None
+def extract_image_srcset(tile: "Tag") -> str | None:
+    """All width variants of the product image, as a normalized srcset."""
+    img_tag = tile.find("img")
+    return normalize_srcset(img_tag.get("srcset")) if img_tag else None
 
 # ────────────────────────────────────────────────────────────────────────────
-deals = []
-
-# Extract valid period from command line or HTML
-if len(sys.argv) == 4:
-    valid_period = {"starts": sys.argv[2], "ends": sys.argv[3]}
-else:
-    valid_period = extract_valid_period(soup)
-
-tiles = soup.find_all("div", {"data-testid": "AdBuilder"})
-for tile in tiles:
+def parse_tile(tile: "Tag", valid_period: dict, seen_at: str) -> dict | None:
+    """Turn one AdBuilder tile into a deal dict, or None if it isn't an offer."""
     # <a href="…product.100352100.html"> is the wrapper
     a      = tile.find("a", href=True)
     if not a:
-        continue
+        return None
     link   = clean_archive_url(a["href"])
 
-    # Extract image URL
+    # Extract image URL and its width variants
     image_url = extract_image_url(tile)
+    image_srcset = extract_image_srcset(tile)
 
     # discount: <div data-testid="prices_and_percentages_prices">
     price_blk = tile.find("div", {"data-testid": "prices_and_percentages_prices"})
     # parsed = parse_discount(price_blk) if price_blk else None
     parsed = parse_discount(tile) if price_blk else None    # we need to make sure there's a price block in the tile
     if not parsed:
-        continue
+        return None
     discount, discount_type = parsed
 
     txt_zone  = tile.find("div", {"data-testid": "below_the_ad_text_content"})
@@ -224,54 +212,138 @@ for tile in tiles:
             name_lines.append(txt)
 
     if not name_lines:
-        continue                          # no real text → skip tile
+        return None                       # no real text → skip tile
 
     name    = name_lines[0]               # first = product name
     details = name_lines[-1]              # last = size, SKU, etc.
 
-    # Try to extract Costco SKU from "Item 1111161" or from PNG filename
+    # Try to extract Costco SKUs from "Item 1111161, 1111162" or from PNG filename
     m_item  = ITEM_RE.search(details)
     m_png   = re.search(r"_([0-9]{6,})\.png", tile.decode())
-    sku     = m_item.group(1) if m_item else (m_png.group(1) if m_png else None)
+    skus    = parse_item_skus(m_item.group(1)) if m_item else []
+    if not skus and m_png:
+        skus = [m_png.group(1)]
+    sku     = skus[0] if skus else None
 
-    # Determine category based on product name and details
-    category = determine_category(name, details)
+    with instrument.stage("classify"):
+        # Determine category based on product name and details
+        category = determine_category(name, details)
 
-    # Extract offer channel
-    offer_channel = extract_offer_channel(tile)
+        # Extract offer channel
+        offer_channel = extract_offer_channel(tile)
 
-    deals.append({
+    return {
         "link":     link,
         "sku":      sku,
+        "alt_skus": skus[1:],            # other item numbers of the same offer
         "name":     name,
         "image_url": image_url,
+        "image_srcset": image_srcset,  # "<url> 160w, <url> 320w, …" or None
         "category": category,
         "discount": discount,          # numeric
         "discount_type": discount_type,  # 'dollar' or 'percent'
         "details":  details,
-        "seen_at":  NOW_ISO,
+        "seen_at":  seen_at,
         "valid_period": valid_period,
         "channel": offer_channel  # Add the offer channel to the output
-    })
+    }
 
-# ────────────────────────────────────────────────────────────────────────────
-# Write deals to file with valid period in filename
-output_path = Path(__file__).parent.parent.parent / "data" / "processed"
-output_path.mkdir(parents=True, exist_ok=True)
-input_prefix = html_file.stem.split("_")[0] if "_" in html_file.stem else "deals"
-if valid_period["starts"] and valid_period["ends"]:
-    start_date = valid_period["starts"].replace("-", "")
-    end_date = valid_period["ends"].replace("-", "")
-    output_file = output_path / f"{input_prefix}_{start_date}-{end_date}.ndjson"
-else:
-    output_file = output_path / f"{input_prefix}_unknown_period.ndjson"
-
-with open(output_file, "w") as f:
-    for d in deals:
-        f.write(json.dumps(d) + "\n")
-
-print(f"Wrote {len(deals)} deals to {output_file}")
-
-# Print number of deals with null SKU
-null_sku_count = sum(1 for d in deals if not d.get("sku"))
-print(f"Number of deals with null SKU: {null_sku_count}")
\ No newline at end of file
+# Raw-text marker and lxml XPath of a tile, for the parallel path of extract_page
+TILE_MARKER = 'data-testid="AdBuilder"'
+TILE_XPATH  = '//div[@data-testid="AdBuilder"]'
+
+def find_tiles(soup: BeautifulSoup) -> list:
+    return soup.find_all("div", {"data-testid": "AdBuilder"})
+
+def extract_deals(soup: BeautifulSoup, valid_period: dict | None = None) -> tuple[list[dict], dict]:
+    """
+    Extract all deals from a parsed offers page.
+    Returns (deals, valid_period); the period is read from the page unless given.
+    """
+    if valid_period is None:
+        valid_period = extract_valid_period(soup)
+    return list(iter_deals(soup, valid_period)), valid_period
+
+def iter_deals(soup: BeautifulSoup, valid_period: dict, seen_at: str | None = None) -> Iterator[dict]:
+    """Yield deals tile by tile, so callers can process them while the rest are parsed."""
+    seen_at = seen_at or dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    with instrument.stage("find_tiles"):
+        tiles = find_tiles(soup)
+    for tile in tiles:
+        with instrument.stage("tile_loop"):
+            deal = parse_tile(tile, valid_period, seen_at)
+        instrument.count("tiles")
+        if deal:
+            instrument.count("deals")
+            if not deal["sku"]:
+                instrument.count("deals_without_sku")
+            yield deal
+
+def output_file_for(input_stem: str, valid_period: dict, output_path: Path = PROCESSED_DIR) -> Path:
+    """processed/<prefix>_YYYYMMDD-YYYYMMDD.ndjson for an input named <prefix>_…"""
+    input_prefix = input_stem.split("_")[0] if "_" in input_stem else "deals"
+    if valid_period["starts"] and valid_period["ends"]:
+        start_date = valid_period["starts"].replace("-", "")
+        end_date = valid_period["ends"].replace("-", "")
+        return output_path / f"{input_prefix}_{start_date}-{end_date}.ndjson"
+    return output_path / f"{input_prefix}_unknown_period.ndjson"
+
+def write_deals(deals: list[dict], output_file: Path) -> None:
+    """Write the deals NDJSON and its .idx offset sidecar."""
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with instrument.stage("serialize"):
+        write_ndjson(deals, output_file)
+
+def extract_page(html_text: str, valid_period: dict | None = None, workers: int | None = None,
+                 min_tiles: int = parallel_tiles.PARALLEL_MIN_TILES) -> tuple[list[dict], dict]:
+    """
+    Extract all deals from page source. Pages with at least `min_tiles` tiles are
+    parsed by `workers` processes (default: one per CPU); smaller ones in-process.
+    """
+    workers = workers or parallel_tiles.default_workers()
+    if parallel_tiles.worth_parallel(html_text, TILE_MARKER, workers, min_tiles):
+        return parallel_tiles.extract_deals(html_text, TILE_XPATH, find_tiles, parse_tile, extract_valid_period,
+                                            valid_period, workers)
+    with instrument.stage("parse"):
+        soup = BeautifulSoup(html_text, "lxml")
+    return extract_deals(soup, valid_period)
+
+def extract_file(html_file: Path, valid_period: dict | None = None, workers: int | None = None,
+                 min_tiles: int = parallel_tiles.PARALLEL_MIN_TILES) -> tuple[list[dict], Path]:
+    """Extract a saved snapshot and write its NDJSON; returns (deals, output_file)."""
+    with instrument.stage("read"):
+        html_text = read_html(html_file)
+    deals, valid_period = extract_page(html_text, valid_period, workers, min_tiles)
+    # Write deals to file with valid period in filename
+    output_file = output_file_for(snapshot_stem(html_file), valid_period)
+    write_deals(deals, output_file)
+    return deals, output_file
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Extract deals from a saved 2025 offers page")
+    parser.add_argument("html_file", help="Saved page (.html, .html.gz or .html.zst)")
+    parser.add_argument("period", nargs="*", metavar="YYYY-MM-DD",
+                        help="Start and end of the valid period (default: read from the page)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes parsing the tiles of large pages (default: one per CPU, 1 disables)")
+    parser.add_argument("--parallel-min-tiles", type=int, default=parallel_tiles.PARALLEL_MIN_TILES,
+                        help=f"Pages with fewer tiles are parsed in-process (default: {parallel_tiles.PARALLEL_MIN_TILES})")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if len(args.period) not in (0, 2):
+        parser.error("give both the start and the end of the valid period")
+
+    # Extract valid period from command line or HTML
+    valid_period = {"starts": args.period[0], "ends": args.period[1]} if args.period else None
+    with instrument.session("extract_costco_offers_local_v2025", args):
+        deals, output_file = extract_file(Path(args.html_file).expanduser(), valid_period,
+                                          args.workers, args.parallel_min_tiles)
+
+    print(f"Wrote {len(deals)} deals to {output_file}")
+
+    # Print number of deals with null SKU
+    null_sku_count = sum(1 for d in deals if not d.get("sku"))
+    print(f"Number of deals with null SKU: {null_sku_count}")
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,452 @@
-# scrape web with javascript
-from selenium import webdriver
-import time
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+#!/usr/bin/env python3
+"""
+live_crawler_to_html.py
+-----------------------
+Render live Costco offers pages with a headless browser and save their DOM.
+
+Instead of sleeping a fixed amount of time, the crawler waits until a page
+is ready: the number of offer tiles has stayed the same for N animation frames
+and the "Valid <date> - <date>" banner is present. A hard timeout guards slow pages, and
+the load timings of every page are printed (and optionally written as JSON).
+
+Several targets (savings page, hot buys, category/region variants) can be
+crawled in one run. They are processed concurrently over a bounded pool of
+browser contexts that are reused from page to page, and every capture is named
+`<prefix>_MMDDYY_MMDDYY.html` from the valid period shown on the page.
+
+A targets file has one `<prefix> <url>` pair per line (# starts a comment).
+Prefixes must be unique, e.g. one per category/region variant:
+    savings  https://www.costco.com/online-offers.html
+    hotbuys  https://www.costco.com/hot-buys.html
+
+Any URL works, including file:// paths and a local `python -m http.server`
+serving saved fixture pages.
+
+With --block-resources, requests for images, media, fonts and known third-party
+trackers are aborted. The extractors only need the DOM (including `img`
+src/srcset attributes, which stay intact), so this cuts bandwidth and latency.
+Every capture reports the bytes transferred; --compare-blocking crawls each
+target with and without blocking and prints both side by side.
+
+Usage
+  # single page
+  python live_crawler_to_html.py --html_in https://www.costco.com/online-offers.html --html_out savings.html
+  # several pages, 3 at a time, into data/raw/
+  python live_crawler_to_html.py --targets targets.txt --concurrency 3 [--out-dir data/raw]
+  # block heavy resources, and measure what it saves
+  python live_crawler_to_html.py --targets targets.txt --block-resources
+  python live_crawler_to_html.py --targets targets.txt --compare-blocking
+"""
 import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils import instrument
+from utils.html_io import write_html
+from utils.naming import raw_html_filename, valid_period_from_text
+
+RAW_DIR = Path(__file__).parent.parent.parent / "data" / "raw"
+
+# Tile selector of the current (2025) offers page layout, the tiles the v2025 extractor parses
+DEFAULT_TILE_SELECTOR = 'div[data-testid="AdBuilder"]'
+# Bypass Akamai glitch (as the Selenium crawler did)
+CHROMIUM_ARGS = ["--disable-http2"]
+DEFAULT_TIMEOUT_S = 30.0
+DEFAULT_STABLE_FRAMES = 30
+DEFAULT_CONCURRENCY = 3
+
+# Resource types the extractors never look at
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+# Analytics, tag managers, ad and session-replay hosts (matched on the host suffix)
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com",
+    "doubleclick.net", "googlesyndication.com", "facebook.net", "facebook.com",
+    "bat.bing.com", "clarity.ms", "demdex.net", "omtrdc.net", "adobedtm.com",
+    "everesttech.net", "criteo.com", "criteo.net", "pinterest.com", "tiktok.com",
+    "quantummetric.com", "hotjar.com", "branch.io", "bazaarvoice.com",
+)
+
+# First text node containing "Valid", same lookup the v2025 extractor does
+# (BeautifulSoup's stripped_strings skip script and style contents too)
+FIND_VALID_TEXT_JS = """
+  const findValidText = () => {
+    if (!document.body) return null;
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+      if (['SCRIPT', 'STYLE'].includes(node.parentElement?.tagName)) continue;
+      const text = node.textContent.trim();
+      if (text.includes('Valid')) return text;
+    }
+    return null;
+  };
+"""
+
+VALID_BANNER_JS = "() => {" + FIND_VALID_TEXT_JS + "  return findValidText();\n}"
+
+# Evaluated once per animation frame by page.wait_for_function(polling="raf").
+# State lives on window so consecutive frames can compare tile counts. Once the
+# tiles are stable, the page is ready when the banner carries the two m/d/yy
+# dates the valid period (and the file name) is parsed from.
+READY_PREDICATE_JS = """
+([selector, stableFrames]) => {""" + FIND_VALID_TEXT_JS + """
+  const count = document.querySelectorAll(selector).length;
+  const state = window.__cdfReady || (window.__cdfReady = { count: -1, stable: 0 });
+  if (count > 0 && count === state.count) {
+    state.stable += 1;
+  } else {
+    state.count = count;
+    state.stable = 0;
+  }
+  if (count === 0 || state.stable < stableFrames) return false;
+  const banner = findValidText();
+  return !!banner && (banner.match(/\\d{1,2}\\/\\d{1,2}\\/\\d{2}/g) || []).length === 2;
+}
+"""
+
+
+def is_tracker(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in TRACKER_HOSTS)
+
+
+class TransferMeter:
+    """
+    Counts requests and bytes transferred by one page, and optionally aborts
+    heavy resources (images, media, fonts, trackers) through request interception.
+    Call `reset()` before each navigation and `totals()` once the page is ready.
+    """
+
+    def __init__(self, block_resources: bool = False):
+        self.block_resources = block_resources
+        self._pending: set = set()
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+
+    async def attach(self, page) -> "TransferMeter":
+        page.on("requestfinished", self._on_request_finished)
+        if self.block_resources:
+            await page.route("**/*", self._route)
+        return self
+
+    async def _route(self, route) -> None:
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or is_tracker(request.url):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _on_request_finished(self, request) -> None:
+        self.requests += 1
+        task = asyncio.ensure_future(self._add_sizes(request))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _add_sizes(self, request) -> None:
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return  # the page navigated away before the sizes could be read
+        self.bytes += sizes["responseHeadersSize"] + sizes["responseBodySize"]
+
+    async def totals(self) -> dict:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        return {"requests": self.requests, "blocked_requests": self.blocked, "bytes_transferred": self.bytes}
+
+
+async def wait_for_ready(page, tile_selector: str, stable_frames: int, timeout_s: float) -> int:
+    """
+    Block until the tile count is stable for `stable_frames` animation frames and
+    the "Valid" banner shows both dates of the period. Returns the final tile count.
+    Raises playwright's TimeoutError once `timeout_s` has elapsed.
+    """
+    await page.wait_for_function(
+        READY_PREDICATE_JS,
+        arg=[tile_selector, stable_frames],
+        polling="raf",
+        timeout=timeout_s * 1000,
+    )
+    return await page.evaluate("(selector) => document.querySelectorAll(selector).length", tile_selector)
+
+
+async def capture_page(page, url: str, tile_selector: str = DEFAULT_TILE_SELECTOR,
+                       stable_frames: int = DEFAULT_STABLE_FRAMES,
+                       timeout_s: float = DEFAULT_TIMEOUT_S,
+                       meter: TransferMeter | None = None) -> tuple[str, dict]:
+    """
+    Load `url` in `page`, wait until it is ready and return (html, timings).
+    The whole call, navigation included, is bounded by `timeout_s`.
+    When the page has a TransferMeter attached, its totals are added to the timings.
+    """
+    if meter:
+        meter.reset()
+    started = time.perf_counter()
+    with instrument.stage("network"):
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout_s * 1000)
+    dom_loaded = time.perf_counter()
+
+    remaining_s = max(timeout_s - (dom_loaded - started), 0.001)
+    with instrument.stage("wait_ready"):
+        tile_count = await wait_for_ready(page, tile_selector, stable_frames, remaining_s)
+    ready = time.perf_counter()
+
+    with instrument.stage("serialize"):
+        html = await page.content()
+    instrument.count("pages")
+    instrument.count("tiles", tile_count)
+    timings = {
+        "url": url,
+        "dom_content_loaded_s": round(dom_loaded - started, 3),
+        "ready_s": round(ready - started, 3),
+        "tile_count": tile_count,
+        "valid_text": await page.evaluate(VALID_BANNER_JS),
+    }
+    if meter:
+        timings.update(await meter.totals())
+    return html, timings
+
+
+class ContextPool:
+    """
+    A bounded pool of browser contexts, each with one page that is reused for
+    every target it serves. `acquire()` waits while all contexts are busy and
+    yields (page, meter).
+    """
+
+    def __init__(self, browser, size: int, block_resources: bool = False):
+        self.browser = browser
+        self.size = size
+        self.block_resources = block_resources
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._contexts = []
+
+    async def open(self) -> "ContextPool":
+        for _ in range(self.size):
+            context = await self.browser.new_context()
+            self._contexts.append(context)
+            page = await context.new_page()
+            meter = await TransferMeter(self.block_resources).attach(page)
+            self._idle.put_nowait((page, meter))
+        return self
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        slot = await self._idle.get()
+        try:
+            yield slot
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def close(self) -> None:
+        for context in self._contexts:
+            await context.close()
+
+
+def read_targets(path: str) -> list[tuple[str, str]]:
+    """Read `<prefix> <url>` pairs from a targets file."""
+    targets = []
+    with open(path, 'r') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                print(f"[ERROR] {path}:{line_no}: expected '<prefix> <url>', got: {line}")
+                sys.exit(1)
+            if any(prefix == parts[0] for prefix, _ in targets):
+                print(f"[ERROR] {path}:{line_no}: duplicate prefix '{parts[0]}' (captures would overwrite each other)")
+                sys.exit(1)
+            targets.append((parts[0], parts[1]))
+    return targets
+
+
+async def crawl_targets(targets: list[tuple[str, str]], out_dir: Path, concurrency: int,
+                        tile_selector: str, stable_frames: int, timeout_s: float,
+                        headed: bool = False, block_resources: bool = False,
+                        save: bool = True, on_capture=None, raw_suffix: str = ".html") -> list[dict]:
+    """
+    Crawl every (prefix, url) target over a pool of `concurrency` browser contexts
+    and save each capture into `out_dir` (unless `save` is False), compressed when
+    `raw_suffix` is ".html.gz"/".html.zst". Returns one result dict per target, in
+    order; failed targets carry an "error" key.
+
+    `on_capture(prefix, html, result)` is called in a worker thread for every
+    capture, while the remaining pages keep crawling; the dict it returns is
+    merged into the target's result.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=not headed, args=CHROMIUM_ARGS)
+        pool = await ContextPool(browser, min(concurrency, len(targets)), block_resources).open()
+
+        async def crawl_one(prefix: str, url: str) -> dict:
+            async with pool.acquire() as (page, meter):
+                try:
+                    html, timings = await capture_page(page, url, tile_selector, stable_frames, timeout_s, meter)
+                except PlaywrightTimeoutError:
+                    instrument.count("failed_pages")
+                    return {"prefix": prefix, "url": url, "error": f"not ready after {timeout_s:g}s"}
+                except Exception as e:
+                    instrument.count("failed_pages")
+                    return {"prefix": prefix, "url": url, "error": str(e)}
+            valid_period = valid_period_from_text(timings.pop("valid_text"))
+            result = {"prefix": prefix, **timings, "valid_period": valid_period}
+            if save:
+                with instrument.stage("write"):
+                    output_file = write_html(out_dir / raw_html_filename(prefix, valid_period, raw_suffix), html)
+                result["output"] = str(output_file)
+            if on_capture:
+                result.update(await asyncio.to_thread(on_capture, prefix, html, result))
+            return result
+
+        try:
+            return await asyncio.gather(*(crawl_one(prefix, url) for prefix, url in targets))
+        finally:
+            await pool.close()
+            await browser.close()
+
+
+async def crawl_single(args) -> dict:
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=not args.headed, args=CHROMIUM_ARGS)
+        try:
+            page = await browser.new_page()
+            meter = await TransferMeter(args.block_resources).attach(page)
+            html, timings = await capture_page(
+                page, args.html_in, args.tile_selector, args.stable_frames, args.timeout, meter
+            )
+        finally:
+            await browser.close()
+
+    timings.pop("valid_text")
+    print(f"Generating output file {args.html_out}")
+    with instrument.stage("write"):
+        Path(args.html_out).write_text(html, "utf-8")
+    return timings
+
+
+def print_blocking_comparison(unblocked: list[dict], blocked: list[dict]) -> None:
+    """Print bytes transferred and page-ready time per target, without vs. with blocking."""
+    print(f"\n{'target':<16} {'KB (full)':>10} {'KB (blocked)':>13} {'ready s (full)':>15} {'ready s (blocked)':>18}")
+    for full, lean in zip(unblocked, blocked):
+        if "error" in full or "error" in lean:
+            print(f"{full['prefix']:<16} {'failed: ' + (full.get('error') or lean.get('error'))}")
+            continue
+        print(f"{full['prefix']:<16} {full['bytes_transferred'] / 1024:>10.0f} {lean['bytes_transferred'] / 1024:>13.0f} "
+              f"{full['ready_s']:>15.2f} {lean['ready_s']:>18.2f}")
+    ok = [(f, l) for f, l in zip(unblocked, blocked) if "error" not in f and "error" not in l]
+    if ok:
+        full_bytes = sum(f['bytes_transferred'] for f, _ in ok)
+        lean_bytes = sum(l['bytes_transferred'] for _, l in ok)
+        full_ready = sum(f['ready_s'] for f, _ in ok)
+        lean_ready = sum(l['ready_s'] for _, l in ok)
+        print(f"Blocking saved {100 * (1 - lean_bytes / max(full_bytes, 1)):.0f}% of bytes and "
+              f"{100 * (1 - lean_ready / max(full_ready, 1e-9)):.0f}% of page-ready time")
+
+
+def write_timings(timings: list[dict], path: str | None) -> None:
+    if not path:
+        return
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=2)
+    print(f"Wrote timings to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render live offers pages and save their HTML')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--html_in', type=str, help='The HTML link to crawl')
+    source.add_argument('--targets', help="File with one '<prefix> <url>' target per line")
+    parser.add_argument('--html_out', type=str, default='savings.html', help='The HTML file to generate (with --html_in)')
+    parser.add_argument('--out-dir', default=str(RAW_DIR), help=f'Output directory with --targets (default: {RAW_DIR})')
+    parser.add_argument('--compress', choices=['gz', 'zst'], help='With --targets: store captures as .html.gz/.html.zst')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Number of browser contexts crawling at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_S,
+                        help=f'Hard timeout in seconds for loading a page (default: {DEFAULT_TIMEOUT_S:g})')
+    parser.add_argument('--stable-frames', type=int, default=DEFAULT_STABLE_FRAMES,
+                        help=f'Animation frames the tile count must stay unchanged (default: {DEFAULT_STABLE_FRAMES})')
+    parser.add_argument('--tile-selector', default=DEFAULT_TILE_SELECTOR,
+                        help=f'CSS selector of an offer tile (default: {DEFAULT_TILE_SELECTOR})')
+    parser.add_argument('--block-resources', action='store_true',
+                        help='Abort image, media, font and third-party tracker requests')
+    parser.add_argument('--compare-blocking', action='store_true',
+                        help='With --targets: crawl each target without and with blocking and compare (saves the blocked capture)')
+    parser.add_argument('--timings-out', help='Optional JSON file to write the page load timings to')
+    parser.add_argument('--headed', action='store_true', help='Show the browser window (debugging)')
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session("live_crawler_to_html", args):
+        crawl(args)
+
+
+def crawl(args: argparse.Namespace) -> None:
+    if args.html_in:
+        try:
+            timings = asyncio.run(crawl_single(args))
+        except PlaywrightTimeoutError:
+            print(f"[ERROR] Page was not ready after {args.timeout:g}s: {args.html_in}")
+            sys.exit(1)
+        print(f"Page ready in {timings['ready_s']}s "
+              f"(DOMContentLoaded {timings['dom_content_loaded_s']}s, {timings['tile_count']} tiles, "
+              f"{timings['bytes_transferred'] / 1024:.0f} KB in {timings['requests']} requests, "
+              f"{timings['blocked_requests']} blocked)")
+        write_timings([timings], args.timings_out)
+        return
+
+    targets = read_targets(args.targets)
+    if not targets:
+        print(f"No targets found in {args.targets}")
+        sys.exit(1)
+    if args.concurrency < 1:
+        print("--concurrency must be at least 1")
+        sys.exit(1)
+
+    crawl_args = (targets, Path(args.out_dir), args.concurrency,
+                  args.tile_selector, args.stable_frames, args.timeout, args.headed)
+    unblocked = None
+    if args.compare_blocking:
+        unblocked = asyncio.run(crawl_targets(*crawl_args, block_resources=False, save=False))
+
+    started = time.perf_counter()
+    results = asyncio.run(crawl_targets(
+        *crawl_args, block_resources=args.block_resources or args.compare_blocking,
+        raw_suffix=f".html.{args.compress}" if args.compress else ".html",
+    ))
+    elapsed = time.perf_counter() - started
+
+    failed = [r for r in results if "error" in r]
+    for r in results:
+        if "error" in r:
+            print(f"[FAILED] {r['prefix']} {r['url']}: {r['error']}")
+        else:
+            print(f"[OK] {r['prefix']} ready in {r['ready_s']}s ({r['tile_count']} tiles, "
+                  f"{r['bytes_transferred'] / 1024:.0f} KB) -> {r['output']}")
+    print(f"Crawled {len(results) - len(failed)}/{len(results)} targets in {elapsed:.1f}s "
+          f"with {min(args.concurrency, len(targets))} browser contexts")
+    if unblocked is not None:
+        print_blocking_comparison(unblocked, results)
+        write_timings([{"unblocked": f, "blocked": l} for f, l in zip(unblocked, results)], args.timings_out)
+    else:
+        write_timings(results, args.timings_out)
+    if failed:
+        sys.exit(1)
+
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--html_in', type=str, help='The HTML link to crawl')
-parser.add_argument('--html_out', type=str, default='savings.html', help='The HTML file to generate')
-args = parser.parse_args()
-
-# Configure ChromeDriver (Selenium >=4.10 expects Service / Options objects)
-chrome_service = Service('../../scripts/chromedriver-mac-arm64/chromedriver')
-chrome_options = Options()
-chrome_options.add_argument("--disable-features=NetworkServiceInProcess")
-chrome_options.add_argument("--disable-http2")                  # bypass Akamai glitch
-# Uncomment the next line to run head‑less in CI
-# chrome_options.add_argument("--headless=new")
-
-driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
-driver.get(args.html_in)
-time.sleep(8)
-htmlSource = driver.page_source
-# print(htmlSource)
-print(f"Generating output file {args.html_out}")
-f = open(args.html_out, "w")
-f.write(htmlSource)
-f.close()
+if __name__ == "__main__":
+    main()
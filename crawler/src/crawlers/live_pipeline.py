@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+live_pipeline.py
+----------------
+Crawl live offers pages and hand every captured DOM straight to extraction,
+validation and SQL generation (and optionally API ingest) in one process.
+
+Unlike live_crawler_to_html.py + run_pipeline.sh, nothing is written to disk and
+read back in between: the page HTML is parsed in memory, the deals go directly
+into the converter, and the only file a capture needs is the ingest-ready SQL in
+data/sqls/. Archiving the raw HTML (data/raw/) and the processed NDJSON
+(data/processed/, the reference corpus of fill_missing_skus.py) is optional and
+done by a background writer so it never delays the next page.
+
+Snapshots are change-detected with the same state files as
+convert_deals_to_sql.py and ingest_deals.py, so frequent polling only adds
+offer_snapshot rows when an offer actually changes.
+
+Usage
+  python live_pipeline.py --targets targets.txt [--archive-raw [--archive-compression zst]] [--archive-ndjson] [--ingest [--d1]]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from crawlers import extract_costco_offers_local_v2025 as extractor
+from crawlers.live_crawler_to_html import (
+    DEFAULT_CONCURRENCY, DEFAULT_STABLE_FRAMES, DEFAULT_TILE_SELECTOR, DEFAULT_TIMEOUT_S,
+    RAW_DIR, crawl_targets, read_targets,
+)
+from processors import convert_deals_to_sql, ingest_deals
+from utils.aliases import AliasMap
+from utils.html_io import write_html
+from utils.naming import raw_html_filename
+from utils.search_index import SearchIndexState
+from utils.snapshot_state import DEFAULT_HEARTBEAT_HOURS, STATE_DIR, SnapshotState
+
+SQLS_DIR = Path(__file__).parent.parent.parent / "data" / "sqls"
+
+
+class ArchiveWriter:
+    """Writes archive files on a background thread; `close()` waits for pending writes."""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        self._futures = []
+
+    def write_html(self, path: Path, html: str) -> None:
+        self._futures.append(self._executor.submit(write_html, path, html))
+
+    def write_deals(self, deals: list[dict], path: Path) -> None:
+        # Copies, since the converter adds validation_error to the caller's dicts meanwhile
+        deals = [dict(deal) for deal in deals]
+        self._futures.append(self._executor.submit(extractor.write_deals, deals, path))
+
+    def close(self) -> int:
+        """Wait for all writes; returns the number that failed."""
+        self._executor.shutdown(wait=True)
+        failed = 0
+        for future in self._futures:
+            if future.exception():
+                print(f"[ERROR] Archive write failed: {future.exception()}")
+                failed += 1
+        return failed
+
+
+def process_capture(prefix: str, html: str, args, archive: ArchiveWriter,
+                    sql_state: SnapshotState | None, ingest_state: SnapshotState | None,
+                    search_index: SearchIndexState, alias_map: AliasMap) -> dict:
+    """Extract, validate and convert one captured page; optionally ingest it via the API."""
+    started = time.perf_counter()
+    soup = BeautifulSoup(html, "lxml")
+    deals, valid_period = extractor.extract_deals(soup)
+
+    if args.archive_raw:
+        suffix = f".html.{args.archive_compression}" if args.archive_compression else ".html"
+        archive.write_html(Path(args.raw_dir) / raw_html_filename(prefix, valid_period, suffix), html)
+    # Same name the extractor gives a <prefix>_….html snapshot
+    ndjson_file = extractor.output_file_for(f"{prefix}_live", valid_period)
+    if args.archive_ndjson:
+        archive.write_deals(deals, ndjson_file)
+
+    available, unavailable = convert_deals_to_sql.split_deals(deals)
+    sql_file = Path(args.sql_dir) / f"{ndjson_file.stem}.sql"
+    sql_file.parent.mkdir(parents=True, exist_ok=True)
+    sql_file.write_text(convert_deals_to_sql.build_sql(available, sql_state, search_index, alias_map), "utf-8")
+
+    result = {
+        "deals": len(deals),
+        "available": len(available),
+        "unavailable": len(unavailable),
+        "sql": str(sql_file),
+    }
+
+    if args.ingest:
+        to_ingest = [d for d in available if ingest_deals.validate_deal(d)[0]]
+        try:
+            ingest_deals.ingest_deals(to_ingest, ingest_deals.get_api_url(args.d1), args.d1, ingest_state, alias_map)
+            result["ingested"] = len(to_ingest)
+        except SystemExit:
+            # ingest_deals reports the failure itself before exiting
+            result["error"] = "ingest failed"
+
+    result["process_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl live offers pages straight into ingest-ready SQL')
+    parser.add_argument('--targets', required=True, help="File with one '<prefix> <url>' target per line")
+    parser.add_argument('--sql-dir', default=str(SQLS_DIR), help=f'Where to write the SQL files (default: {SQLS_DIR})')
+    parser.add_argument('--archive-raw', action='store_true', help='Also archive the raw HTML in the background')
+    parser.add_argument('--archive-compression', choices=['gz', 'zst'], help='Compress the archived raw HTML')
+    parser.add_argument('--raw-dir', default=str(RAW_DIR), help=f'Raw HTML archive directory (default: {RAW_DIR})')
+    parser.add_argument('--archive-ndjson', action='store_true',
+                        help='Also archive the extracted deals NDJSON in data/processed in the background')
+    parser.add_argument('--ingest', action='store_true', help='Also ingest the deals through the API')
+    parser.add_argument('--d1', action='store_true', help='With --ingest: use the D1 API instead of the local one')
+    parser.add_argument('--heartbeat-hours', type=float, default=DEFAULT_HEARTBEAT_HOURS,
+                        help=f'Emit an unchanged snapshot again after this many hours, 0 = never (default: {DEFAULT_HEARTBEAT_HOURS:g})')
+    parser.add_argument('--all-snapshots', action='store_true', help='Emit a snapshot for every deal (no change detection)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Number of browser contexts crawling at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_S,
+                        help=f'Hard timeout in seconds for loading a page (default: {DEFAULT_TIMEOUT_S:g})')
+    parser.add_argument('--stable-frames', type=int, default=DEFAULT_STABLE_FRAMES,
+                        help=f'Animation frames the tile count must stay unchanged (default: {DEFAULT_STABLE_FRAMES})')
+    parser.add_argument('--block-resources', action='store_true',
+                        help='Abort image, media, font and third-party tracker requests')
+    args = parser.parse_args()
+
+    targets = read_targets(args.targets)
+    if not targets:
+        print(f"No targets found in {args.targets}")
+        sys.exit(1)
+
+    sql_state = ingest_state = None
+    if not args.all_snapshots:
+        sql_state = SnapshotState(STATE_DIR / "snapshot_state_sql.json", args.heartbeat_hours)
+        if args.ingest:
+            target = 'd1' if args.d1 else 'local'
+            ingest_state = SnapshotState(STATE_DIR / f"snapshot_state_{target}.json", args.heartbeat_hours)
+
+    search_index = SearchIndexState()
+    alias_map = AliasMap.load()
+    archive = ArchiveWriter()
+    started = time.perf_counter()
+    results = asyncio.run(crawl_targets(
+        targets, Path(args.raw_dir), args.concurrency, DEFAULT_TILE_SELECTOR,
+        args.stable_frames, args.timeout, block_resources=args.block_resources, save=False,
+        on_capture=lambda prefix, html, _result: process_capture(prefix, html, args, archive, sql_state, ingest_state,
+                                                                  search_index, alias_map),
+    ))
+    elapsed = time.perf_counter() - started
+    archive_failures = archive.close()
+    # Snapshots staged for a written SQL file are kept; those staged for the API
+    # are dropped if any ingest failed, so they are sent again next time.
+    if sql_state:
+        sql_state.save()
+    search_index.save()
+    alias_map.save()
+    if ingest_state and not any(r.get("error") == "ingest failed" for r in results):
+        ingest_state.save()
+
+    failed = [r for r in results if "error" in r]
+    for r in results:
+        if "error" in r:
+            print(f"[FAILED] {r['prefix']} {r['url']}: {r['error']}")
+        else:
+            ingested = f", ingested {r['ingested']}" if "ingested" in r else ""
+            print(f"[OK] {r['prefix']}: {r['deals']} deals ({r['available']} available{ingested}) "
+                  f"ready in {r['ready_s']}s, processed in {r['process_s']}s")
+            print(f"Wrote SQL to {r['sql']}")
+    print(f"Pipeline finished {len(results) - len(failed)}/{len(results)} targets in {elapsed:.1f}s")
+    if failed or archive_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
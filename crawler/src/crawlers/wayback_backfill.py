@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+wayback_backfill.py
+-------------------
+Download historical offers pages from the Wayback Machine into data/raw/.
+
+The CDX API lists the captures of the offers page in a date range (status 200,
+at most one per day). Captures are thinned to one per --min-gap-days and
+fetched concurrently: --workers threads share one requests session with a
+pool of at most that many connections, and a shared limiter starts at most
+--rate requests per second. 429 and 5xx responses are retried with backoff,
+honouring Retry-After.
+
+Pages are fetched in their original form (`/web/<ts>id_/<url>`) and named
+`<prefix>_MMDDYY_MMDDYY.html` from the "Valid ..." banner, like the live
+crawler. The range is split into one run of consecutive captures per worker,
+each walked in date order, and the first capture fetched for a valid period
+wins. Captures dated inside a period that is already in --out-dir, or that this
+run already saved, are not downloaded. Pages without a banner are saved as
+`<prefix>_unknown_<ts>.html`.
+
+Every response is kept in an on-disk cache (data/cache/wayback, see
+utils/http_cache.py), so a re-run is served from disk. Captures never change.
+Listings are refetched after --cdx-max-age-hours.
+
+--archive-url points everything at another server, e.g. tests/wayback_standin.py
+serving fixture snapshots on localhost.
+
+Usage:
+  python wayback_backfill.py --from 2024-01-01 --to 2024-12-31 [--workers 4] [--rate 1]
+  python wayback_backfill.py --from 2024-01-01 --list
+  python wayback_backfill.py --from 2024-01-01 --archive-url http://127.0.0.1:8901 --out-dir /tmp/raw
+"""
+import argparse
+import datetime as dt
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils import instrument
+from utils.html_io import write_snapshot_bytes
+from utils.http_cache import CACHE_DIR, CachedResponse, HttpCache
+from utils.naming import raw_html_filename, valid_period_from_html
+
+RAW_DIR = Path(__file__).parent.parent.parent / "data" / "raw"
+WAYBACK_CACHE_DIR = CACHE_DIR / "wayback"
+
+ARCHIVE_URL = "https://web.archive.org"
+OFFERS_URL = "www.costco.com/online-offers.html"
+USER_AGENT = "costco-deals-finder-backfill/1.0"
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 1.0
+DEFAULT_MIN_GAP_DAYS = 3
+DEFAULT_CDX_MAX_AGE_HOURS = 24.0
+MAX_ATTEMPTS = 4
+# Cap on a Retry-After, so one response cannot stall a worker for hours
+MAX_RETRY_AFTER_S = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# <prefix>_MMDDYY_MMDDYY.html[.gz|.zst] already in the raw archive
+RAW_NAME_RE = re.compile(r"_(\d{6})_(\d{6})\.html")
+
+
+@dataclass(frozen=True, order=True)
+class Capture:
+    timestamp: str  # YYYYMMDDhhmmss
+    original: str
+
+    @property
+    def date(self) -> dt.date:
+        return dt.datetime.strptime(self.timestamp[:8], "%Y%m%d").date()
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Periods:
+    """Valid periods already on disk or saved by this run (thread-safe)."""
+
+    def __init__(self):
+        self._periods: set[tuple[dt.date, dt.date]] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dir(cls, out_dir: Path, prefix: str) -> "Periods":
+        periods = cls()
+        for path in out_dir.glob(f"{prefix}_*.html*"):
+            m = RAW_NAME_RE.search(path.name)
+            if m:
+                try:
+                    periods.add(*(dt.datetime.strptime(d, "%m%d%y").date() for d in m.groups()))
+                except ValueError:
+                    pass
+        return periods
+
+    def add(self, starts: dt.date, ends: dt.date) -> bool:
+        """Register a period; False if it was known."""
+        with self._lock:
+            if (starts, ends) in self._periods:
+                return False
+            self._periods.add((starts, ends))
+            return True
+
+    def covers(self, day: dt.date) -> bool:
+        with self._lock:
+            return any(starts <= day <= ends for starts, ends in self._periods)
+
+
+class WaybackClient:
+    """Cached, rate-limited GETs over a bounded connection pool."""
+
+    def __init__(self, archive_url: str, cache: HttpCache, workers: int, rate: float):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.archive_url = archive_url.rstrip("/")
+        self.cache = cache
+        self.limiter = RateLimiter(rate)
+        self.requests = requests
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        # pool_block: threads wait for a free connection instead of opening more
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def get(self, url: str, max_age_s: float | None = None) -> CachedResponse:
+        cached = self.cache.get(url, max_age_s)
+        if cached is not None:
+            instrument.count("cache_hits")
+            return cached
+        attempt = 0
+        while True:
+            attempt += 1
+            self.limiter.wait()
+            try:
+                with instrument.stage("network"):
+                    response = self.session.get(url, timeout=60)
+                instrument.count("requests")
+            except self.requests.RequestException:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < MAX_ATTEMPTS:
+                instrument.count("retries")
+                retry_after = response.headers.get("Retry-After", "")
+                time.sleep(min(float(retry_after), MAX_RETRY_AFTER_S) if retry_after.isdigit() else 2 ** attempt)
+                continue
+            response.raise_for_status()
+            instrument.count("bytes_downloaded", len(response.content))
+            return self.cache.put(url, response.status_code, response.headers.get("Content-Type"),
+                                  response.content)
+
+    def cdx_url(self, url: str, start: dt.date, end: dt.date) -> str:
+        query = urlencode([
+            ("url", url), ("from", start.strftime("%Y%m%d")), ("to", end.strftime("%Y%m%d")),
+            ("output", "json"), ("fl", "timestamp,original"), ("filter", "statuscode:200"),
+            ("collapse", "timestamp:8"),
+        ])
+        return f"{self.archive_url}/cdx/search/cdx?{query}"
+
+    def snapshot_url(self, capture: Capture) -> str:
+        # id_ = the page as captured, without the Wayback toolbar and link rewriting
+        return f"{self.archive_url}/web/{capture.timestamp}id_/{capture.original}"
+
+    def list_captures(self, url: str, start: dt.date, end: dt.date, max_age_s: float) -> List[Capture]:
+        with instrument.stage("cdx"):
+            rows = json.loads(self.get(self.cdx_url(url, start, end), max_age_s).text or "[]")
+        # The first row is the field names
+        return sorted(Capture(timestamp, original) for timestamp, original in rows[1:])
+
+
+def thin(captures: List[Capture], min_gap_days: int) -> List[Capture]:
+    """Keep captures at least min_gap_days apart (the earliest of each run)."""
+    kept: List[Capture] = []
+    for capture in captures:
+        if not kept or (capture.date - kept[-1].date).days >= min_gap_days:
+            kept.append(capture)
+    return kept
+
+
+def segments(captures: List[Capture], workers: int) -> List[List[Capture]]:
+    """Split the range into one run of consecutive captures per worker."""
+    size = max(1, -(-len(captures) // workers))
+    return [captures[i:i + size] for i in range(0, len(captures), size)]
+
+
+def fetch_capture(client: WaybackClient, capture: Capture, periods: Periods, out_dir: Path,
+                  prefix: str) -> tuple[str, str]:
+    """Download one capture and save it under its valid period; returns (outcome, detail)."""
+    if periods.covers(capture.date):
+        instrument.count("captures_covered")
+        return "covered", capture.timestamp
+    body = client.get(client.snapshot_url(capture)).body
+    with instrument.stage("name"):
+        period = valid_period_from_html(body.decode("utf-8", errors="replace"))
+    if period["starts"] and period["ends"]:
+        starts, ends = (dt.date.fromisoformat(period[k]) for k in ("starts", "ends"))
+        if not periods.add(starts, ends):
+            instrument.count("captures_duplicate_period")
+            return "duplicate", f"{capture.timestamp} ({period['starts']} - {period['ends']})"
+        name = raw_html_filename(prefix, period)
+    else:
+        name = f"{prefix}_unknown_{capture.timestamp}.html"
+    write_snapshot_bytes(out_dir / name, body)
+    instrument.count("snapshots_saved")
+    return "saved", name
+
+
+def fetch_segment(client: WaybackClient, segment: List[Capture], periods: Periods, out_dir: Path,
+                  prefix: str) -> List[tuple[str, str]]:
+    """
+    Fetch a run of captures in date order, so the later captures of a period
+    are skipped once its first one is saved (a worker never has two captures of
+    the same period in flight).
+    """
+    results = []
+    for capture in segment:
+        try:
+            results.append(fetch_capture(client, capture, periods, out_dir, prefix))
+        except client.requests.RequestException as e:
+            instrument.count("captures_failed")
+            results.append(("failed", f"{capture.timestamp}: {e}"))
+    return results
+
+
+def parse_date(value: str) -> dt.date:
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Download historical offers pages from the Wayback Machine')
+    parser.add_argument('--from', dest='start', type=parse_date, required=True, help='First capture date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', type=parse_date, default=dt.date.today(),
+                        help='Last capture date (YYYY-MM-DD, default: today)')
+    parser.add_argument('--url', default=OFFERS_URL, help=f'Archived page (default: {OFFERS_URL})')
+    parser.add_argument('--prefix', default='savings', help='File name prefix (default: savings)')
+    parser.add_argument('--out-dir', type=Path, default=RAW_DIR, help='Where to save the pages (default: data/raw)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Concurrent downloads and pooled connections (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Requests started per second across all workers, 0 = unlimited (default: {DEFAULT_RATE:g})')
+    parser.add_argument('--min-gap-days', type=int, default=DEFAULT_MIN_GAP_DAYS,
+                        help=f'Fetch at most one capture per this many days (default: {DEFAULT_MIN_GAP_DAYS})')
+    parser.add_argument('--cache-dir', type=Path, default=WAYBACK_CACHE_DIR,
+                        help='On-disk HTTP cache (default: data/cache/wayback)')
+    parser.add_argument('--cdx-max-age-hours', type=float, default=DEFAULT_CDX_MAX_AGE_HOURS,
+                        help=f'Refetch cached capture listings older than this (default: {DEFAULT_CDX_MAX_AGE_HOURS:g})')
+    parser.add_argument('--archive-url', default=ARCHIVE_URL, help=f'Wayback server (default: {ARCHIVE_URL})')
+    parser.add_argument('--list', action='store_true', help='Only list the captures that would be fetched')
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.end < args.start:
+        parser.error("--to is before --from")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    with instrument.session("wayback_backfill", args):
+        run(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    cache = HttpCache(args.cache_dir)
+    client = WaybackClient(args.archive_url, cache, args.workers, args.rate)
+    try:
+        captures = client.list_captures(args.url, args.start, args.end, args.cdx_max_age_hours * 3600)
+        selected = thin(captures, args.min_gap_days)
+        instrument.count("captures_listed", len(captures))
+        print(f"{len(captures)} captures of {args.url} from {args.start} to {args.end}, "
+              f"{len(selected)} at least {args.min_gap_days} day(s) apart")
+        if args.list:
+            for capture in selected:
+                print(f"  {capture.timestamp}  {client.snapshot_url(capture)}")
+            return
+
+        periods = Periods.from_dir(args.out_dir, args.prefix)
+        outcomes = {"saved": 0, "covered": 0, "duplicate": 0, "failed": 0}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(fetch_segment, client, segment, periods, args.out_dir, args.prefix)
+                       for segment in segments(selected, args.workers)]
+            for future in futures:
+                for outcome, detail in future.result():
+                    outcomes[outcome] += 1
+                    if outcome in ("saved", "failed"):
+                        print(f"  {outcome:<6} {detail}")
+    finally:
+        client.close()
+
+    print(f"\nSaved {outcomes['saved']} pages to {args.out_dir} in {time.perf_counter() - started:.1f}s "
+          f"({outcomes['covered']} captures inside known periods skipped, "
+          f"{outcomes['duplicate']} repeated a period, {outcomes['failed']} failed)")
+    print(f"Cache: {cache.hits} hits, {cache.misses} misses ({args.cache_dir})")
+    if outcomes["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
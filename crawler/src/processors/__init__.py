@@ -0,0 +1,3 @@
+"""
+Data processing utilities for Costco Deals Finder.
+"""
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+build_deal_archive.py
+---------------------
+Build or update the columnar deal archive (data/archive/) from the processed
+NDJSON files, then optionally answer a query from it.
+
+Only NDJSON files that are new or changed since the last build are decoded;
+rows of changed or deleted files are dropped first.
+
+Usage:
+  python build_deal_archive.py [--full]
+  python build_deal_archive.py --sku 1720981
+  python build_deal_archive.py --active-on 2025-01-02
+  python build_deal_archive.py --category-monthly [--start 2024-01-01] [--end 2024-12-31]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.deal_archive import ARCHIVE_DIR, PROCESSED_DIR, DealArchive, archive_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the columnar deal archive and query it')
+    parser.add_argument('--processed-dir', default=str(PROCESSED_DIR), help=f'NDJSON input (default: {PROCESSED_DIR})')
+    parser.add_argument('--archive-dir', default=str(ARCHIVE_DIR), help=f'Archive location (default: {ARCHIVE_DIR})')
+    parser.add_argument('--full', action='store_true', help='Rebuild from scratch')
+    parser.add_argument('--no-update', action='store_true', help='Query the archive as is')
+    parser.add_argument('--sku', help='Print the history of this SKU')
+    parser.add_argument('--active-on', metavar='YYYY-MM-DD', help='Print the deals active on this day')
+    parser.add_argument('--category-monthly', action='store_true', help='Print average discount by category and month')
+    parser.add_argument('--start', help='With --category-monthly: only periods overlapping from this day')
+    parser.add_argument('--end', help='With --category-monthly: only periods overlapping up to this day')
+    parser.add_argument('--region', default='US')
+    args = parser.parse_args(argv)
+
+    if args.no_update:
+        archive = DealArchive.load(args.archive_dir)
+    else:
+        started = time.perf_counter()
+        archive = DealArchive.empty() if args.full else DealArchive.load(args.archive_dir, mmap=False)
+        decoded, dropped = archive.update(archive_files(Path(args.processed_dir)))
+        if decoded or dropped or args.full:
+            archive.save(args.archive_dir)
+        print(f"Archive: {len(archive)} rows from {len(archive.manifest)} files "
+              f"({decoded} decoded, {dropped} rows dropped) in {time.perf_counter() - started:.2f}s",
+              file=sys.stderr)
+
+    if args.sku:
+        result = archive.sku_history(args.sku)
+    elif args.active_on:
+        result = archive.active_on(args.active_on, args.region)
+    elif args.category_monthly:
+        result = archive.category_monthly_avg(args.start, args.end, args.region)
+    else:
+        return
+    for row in result:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+compact_snapshots.py
+--------------------
+Thin out redundant offer_snapshot rows in SQL files generated by
+convert_deals_to_sql.py before change detection existed.
+
+All snapshot rows of all files are replayed in seen_at order through the same
+rule the converter now applies: a row is kept only if the offer's discount or
+details changed since the last kept row of the same (sku, starts, ends, region),
+or if --heartbeat-hours passed. The offer_snapshot INSERT of every file is then
+rewritten with the kept rows; product and offer_period INSERTs are untouched.
+
+Usage:
+  python compact_snapshots.py [--sqls-dir data/sqls] [--heartbeat-hours 24] [--dry-run] [--seed-state]
+"""
+import argparse
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.snapshot_state import DEFAULT_HEARTBEAT_HOURS, STATE_DIR, SnapshotState, offer_key
+
+SQLS_DIR = Path(__file__).parent.parent.parent / "data" / "sqls"
+INSERT_RE = re.compile(r"INSERT OR IGNORE INTO (\w+) \(([^)]*)\) VALUES ", re.IGNORECASE)
+SKU_RE = re.compile(r"sku = '((?:[^']|'')*)'")
+PERIOD_RE = re.compile(r"starts = '([^']*)' AND ends = '([^']*)' AND region = '([^']*)'")
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split SQL text on top-level semicolons (ignores ';' inside quoted strings)."""
+    statements, start, in_quote = [], 0, False
+    for i, ch in enumerate(sql):
+        if ch == "'":
+            in_quote = not in_quote  # '' escapes toggle twice, so they cancel out
+        elif ch == ";" and not in_quote:
+            statements.append(sql[start:i + 1].strip())
+            start = i + 1
+    if sql[start:].strip():
+        statements.append(sql[start:].strip())
+    return [s for s in statements if s]
+
+
+def parse_values(values_sql: str) -> List[List[str]]:
+    """Split `(a, b), (c, d);` into rows of raw SQL value expressions."""
+    rows, row, depth, in_quote, token_start = [], [], 0, False, 0
+    for i, ch in enumerate(values_sql):
+        if ch == "'":
+            in_quote = not in_quote
+        elif in_quote:
+            continue
+        elif ch == "(":
+            depth += 1
+            if depth == 1:
+                row, token_start = [], i + 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                row.append(values_sql[token_start:i].strip())
+                rows.append(row)
+        elif ch == "," and depth == 1:
+            row.append(values_sql[token_start:i].strip())
+            token_start = i + 1
+    return rows
+
+
+def parse_insert(statement: str) -> Tuple[str, List[str], List[List[str]]] | None:
+    m = INSERT_RE.match(statement)
+    if not m:
+        return None
+    columns = [c.strip() for c in m.group(2).split(",")]
+    return m.group(1), columns, parse_values(statement[m.end():])
+
+
+def unquote(value: str) -> str | None:
+    if value == "NULL":
+        return None
+    if value.startswith("'") and value.endswith("'"):
+        return value[1:-1].replace("''", "'")
+    return value
+
+
+def make_insert(table: str, columns: List[str], rows: List[List[str]]) -> str:
+    if not rows:
+        return ""
+    values = ", ".join(f"({', '.join(row)})" for row in rows)
+    return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES {values};"
+
+
+def snapshot_key(offer_period_expr: str, periods_by_sku: Dict[str, Tuple[str, str, str]]) -> str | None:
+    """
+    (sku, starts, ends, region) of a snapshot row. Newer files spell out the period
+    in the subselect; older ones only have the sku, so the period comes from the
+    offer_period INSERT of the same file.
+    """
+    skus = SKU_RE.findall(offer_period_expr)
+    if not skus:
+        return None
+    sku = skus[-1].replace("''", "'")
+    period = PERIOD_RE.search(offer_period_expr)
+    starts, ends, region = period.groups() if period else periods_by_sku.get(sku, (None, None, None))
+    if not starts:
+        return None
+    return offer_key(sku, starts, ends, region)
+
+
+def load_file(sql_file: Path) -> dict:
+    """Parse a generated SQL file into its statements and snapshot rows."""
+    statements = split_statements(sql_file.read_text("utf-8"))
+    periods_by_sku: Dict[str, Tuple[str, str, str]] = {}
+    snapshot_index, snapshot_columns, snapshot_rows = None, None, []
+    for i, statement in enumerate(statements):
+        parsed = parse_insert(statement)
+        if not parsed:
+            continue
+        table, columns, rows = parsed
+        if table == "offer_period":
+            for row in rows:
+                values = dict(zip(columns, row))
+                sku = SKU_RE.findall(values.get("product_id", ""))
+                if sku:
+                    periods_by_sku[sku[-1].replace("''", "'")] = (
+                        unquote(values["starts"]), unquote(values["ends"]), unquote(values.get("region", "'US'")) or "US"
+                    )
+        elif table == "offer_snapshot":
+            snapshot_index, snapshot_columns, snapshot_rows = i, columns, rows
+    return {
+        "path": sql_file,
+        "statements": statements,
+        "periods_by_sku": periods_by_sku,
+        "snapshot_index": snapshot_index,
+        "snapshot_columns": snapshot_columns,
+        "snapshot_rows": snapshot_rows,
+    }
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Remove redundant offer_snapshot rows from generated SQL files')
+    parser.add_argument('--sqls-dir', default=str(SQLS_DIR), help=f'Directory with the generated SQL (default: {SQLS_DIR})')
+    parser.add_argument('--heartbeat-hours', type=float, default=DEFAULT_HEARTBEAT_HOURS,
+                        help=f'Keep an unchanged snapshot again after this many hours, 0 = never (default: {DEFAULT_HEARTBEAT_HOURS:g})')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+    parser.add_argument('--seed-state', action='store_true',
+                        help='Also write the resulting last-seen state to data/state/snapshot_state_sql.json '
+                             'so the converter continues from the compacted history')
+    args = parser.parse_args(argv)
+
+    files = [load_file(p) for p in sorted(Path(args.sqls_dir).glob("*.sql"))]
+    files = [f for f in files if f["snapshot_rows"]]
+    if not files:
+        print(f"No offer_snapshot rows found in {args.sqls_dir}")
+        return
+
+    # Replay every snapshot row in seen_at order
+    state_path = STATE_DIR / "snapshot_state_sql.json" if args.seed_state else Path(args.sqls_dir) / ".compact_state.json"
+    # Compaction always starts from an empty history
+    state = SnapshotState(state_path, args.heartbeat_hours, fresh=True)
+    replay = []
+    for file_no, f in enumerate(files):
+        cols = f["snapshot_columns"]
+        for row_no, row in enumerate(f["snapshot_rows"]):
+            values = dict(zip(cols, row))
+            replay.append((unquote(values.get("seen_at", "NULL")) or "", file_no, row_no, values))
+    replay.sort(key=lambda r: r[:3])
+
+    kept: Dict[Tuple[int, int], bool] = {}
+    for seen_at, file_no, row_no, values in replay:
+        key = snapshot_key(values["offer_period_id"], files[file_no]["periods_by_sku"])
+        if key is None:
+            kept[(file_no, row_no)] = True  # can't tell which offer it belongs to, keep it
+            continue
+        kept[(file_no, row_no)] = state.check(
+            key, unquote(values["discount_low"]) or 0, unquote(values["discount_high"]) or 0,
+            unquote(values.get("details", "NULL")), seen_at or None,
+        )
+
+    total_removed = 0
+    for file_no, f in enumerate(files):
+        rows = f["snapshot_rows"]
+        kept_rows = [row for row_no, row in enumerate(rows) if kept[(file_no, row_no)]]
+        removed = len(rows) - len(kept_rows)
+        total_removed += removed
+        if not removed:
+            continue
+        print(f"[COMPACT] {f['path'].name}: {len(rows)} -> {len(kept_rows)} snapshots")
+        if args.dry_run:
+            continue
+        statements = list(f["statements"])
+        statements[f["snapshot_index"]] = make_insert("offer_snapshot", f["snapshot_columns"], kept_rows)
+        f["path"].write_text("\n".join(statements) + "\n", "utf-8")
+
+    total = len(replay)
+    print(f"{'Would remove' if args.dry_run else 'Removed'} {total_removed} of {total} snapshot rows "
+          f"across {len(files)} files")
+    if args.seed_state and not args.dry_run:
+        state.save()
+        print(f"Seeded snapshot state at {state_path}")
+
+
+if __name__ == "__main__":
+    main()
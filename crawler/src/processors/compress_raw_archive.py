@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+compress_raw_archive.py
+-----------------------
+Migrate the plain `.html` snapshots in data/raw to compressed `.html.zst`
+(or `.html.gz`) files, one compression frame per snapshot. The extractors read
+both formats transparently.
+
+Every compressed file is decompressed and compared with the original before the
+original is removed (use --keep-original to keep it anyway).
+
+Usage:
+  python compress_raw_archive.py [--raw-dir data/raw] [--format zst|gz] [--level N] [--keep-original] [--dry-run]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.html_io import read_snapshot_bytes, write_snapshot_bytes
+
+RAW_DIR = Path(__file__).parent.parent.parent / "data" / "raw"
+
+
+def default_format() -> str:
+    try:
+        import zstandard  # noqa: F401
+        return "zst"
+    except ImportError:
+        return "gz"
+
+
+def compress_snapshot(html_file: Path, fmt: str, level: int | None, keep_original: bool) -> tuple[int, int]:
+    """Compress one snapshot, verify it and return (original_bytes, compressed_bytes)."""
+    data = html_file.read_bytes()
+    target = html_file.with_name(f"{html_file.name}.{fmt}")
+    write_snapshot_bytes(target, data, level)
+    if read_snapshot_bytes(target) != data:
+        target.unlink()
+        raise ValueError(f"round-trip mismatch for {html_file.name}")
+    original_size = html_file.stat().st_size
+    compressed_size = target.stat().st_size
+    if not keep_original:
+        html_file.unlink()
+    return original_size, compressed_size
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Compress the raw HTML snapshot archive')
+    parser.add_argument('--raw-dir', default=str(RAW_DIR), help=f'Raw snapshot directory (default: {RAW_DIR})')
+    parser.add_argument('--format', choices=['zst', 'gz'], default=None,
+                        help='Compression format (default: zst if zstandard is installed, else gz)')
+    parser.add_argument('--level', type=int, default=None, help='Compression level (default: zst 10, gz 9)')
+    parser.add_argument('--keep-original', action='store_true', help='Keep the plain .html files')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the files that would be compressed')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or default_format()
+    raw_dir = Path(args.raw_dir)
+    html_files = sorted(raw_dir.glob("*.html"))
+    if not html_files:
+        print(f"No plain .html snapshots in {raw_dir}")
+        return
+
+    total_before = total_after = 0
+    failures = 0
+    for html_file in html_files:
+        if html_file.with_name(f"{html_file.name}.{fmt}").exists():
+            print(f"[SKIP] {html_file.name}.{fmt} already exists")
+            continue
+        if args.dry_run:
+            print(f"[DRY-RUN] {html_file.name} -> {html_file.name}.{fmt}")
+            continue
+        try:
+            before, after = compress_snapshot(html_file, fmt, args.level, args.keep_original)
+        except Exception as e:
+            print(f"[ERROR] {html_file.name}: {e}")
+            failures += 1
+            continue
+        total_before += before
+        total_after += after
+        print(f"[COMPRESS] {html_file.name} -> {html_file.name}.{fmt} "
+              f"({before / 1024:.0f} KB -> {after / 1024:.0f} KB)")
+
+    if total_before:
+        print(f"Compressed {total_before / 1024 / 1024:.1f} MB into {total_after / 1024 / 1024:.1f} MB "
+              f"({total_before / max(total_after, 1):.1f}x)")
+    if failures:
+        print(f"{failures} snapshots failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
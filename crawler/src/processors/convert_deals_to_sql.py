@@ -6,6 +6,25 @@ Preprocess, validate, and transform deals NDJSON for ingestion.
 Outputs a single SQL file (with three INSERTs: product, offer_period, offer_snapshot) and a .ndjson file for unavailable deals.
 No D1 upload logic.
 
+An offer_snapshot row is only emitted when the offer's discount or details
+changed since the last emitted snapshot of the same (sku, starts, ends, region),
+or when --heartbeat-hours have passed. The last-seen state is kept in
+data/state/snapshot_state_sql.json; --all-snapshots disables the check.
+
+The SQL also (re)populates the product_fts search index for products that are
+new or whose normalized name/category/details changed (state in
+data/state/fts_index_state.json; --no-fts skips it, --reindex-all ignores the state).
+--fts-only writes just those statements for every product of the file (to
+data/sqls/fts_<base>.sql by default), which is how products that existed before
+migration 0004 are indexed.
+
+Deals are filed under their canonical SKU: SKUs listed together on a tile are
+grouped in data/state/alias_map.json, and every alternate SKU of a group in the
+file gets an `alias` row pointing at the canonical product.
+
+Tiles repeating an offer (same canonical sku, starts, ends and region) are
+merged into one deal first (see utils/dedupe.py); --keep-duplicates skips that.
+
 Usage:
   python ingest_deals.py --file raw_deals.ndjson --sql-out processed_deals.sql [--unavailable-out unavailable_deals.ndjson]
 """
@@ -16,14 +35,20 @@ import os
 import argparse
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
-from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils import instrument
+from utils.aliases import ALIAS_STATE, AliasMap, make_alias_sql
+from utils.dedupe import dedupe_deals
+from utils.images import thumbnail_url
+from utils.ndjson_index import write_ndjson as write_ndjson_file
+from utils.search_index import SearchIndexState, make_fts_sql
+from utils.snapshot_state import DEFAULT_HEARTBEAT_HOURS, STATE_DIR, SnapshotState
 
 def write_ndjson(data: List[Dict[str, Any]], file_path: str) -> None:
     """Write data to an NDJSON file."""
     try:
-        with open(file_path, 'w') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
+        write_ndjson_file(data, file_path)
     except Exception as e:
         print(f"Error writing to {file_path}: {str(e)}")
         sys.exit(1)
@@ -78,6 +103,7 @@ def transform_product(deal: Dict[str, Any]) -> Dict[str, Any]:
         "category": deal.get("category", "Other"),
         "brand": deal.get("brand"),
         "image_url": deal.get("image_url"),
+        "thumbnail_url": thumbnail_url(deal.get("image_url"), deal.get("image_srcset")),
     }
 
 def transform_offer_period(deal: Dict[str, Any]) -> Dict[str, Any]:
@@ -106,10 +132,13 @@ def transform_offer_snapshot(deal: Dict[str, Any]) -> Dict[str, Any]:
     Returns a dictionary with 'offer_snapshot' data.
     """
     # Flatten for SQL/NDJSON output
+    region = deal.get("region", "US")
     return {
         "offer_period_id": (
             f"(SELECT id FROM offer_period WHERE "
-            f"product_id = (SELECT id FROM product WHERE sku = '{deal['sku']}'))"
+            f"product_id = (SELECT id FROM product WHERE sku = '{deal['sku']}') "
+            f"AND starts = '{deal['valid_period']['starts']}' AND ends = '{deal['valid_period']['ends']}' "
+            f"AND region = '{region}')"
         ),
         "seen_at": deal.get("seen_at"),
         "discount_low": deal["discount"],
@@ -146,14 +175,91 @@ def make_sql_insert(data: List[Dict[str, Any]], table_name: str, skip_cols=None)
         values.append(f"({', '.join(row_values)})")
     return f"INSERT OR IGNORE INTO {table_name} ({', '.join(columns)}) VALUES {', '.join(values)};"
 
-def main():
+def split_deals(deals: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split deals into (available, unavailable); unavailable ones get a 'validation_error'."""
+    available, unavailable = [], []
+    with instrument.stage("validate"):
+        for deal in deals:
+            is_valid, reason = validate_deal(deal)
+            if not is_valid:
+                deal["validation_error"] = reason
+                unavailable.append(deal)
+                continue
+            available.append(deal)
+    instrument.count("available", len(available))
+    instrument.count("unavailable", len(unavailable))
+    return available, unavailable
+
+def build_sql(available: List[Dict[str, Any]], snapshot_state: SnapshotState | None = None,
+              search_index: SearchIndexState | None = None, alias_map: AliasMap | None = None,
+              keep_duplicates: bool = False, fts_only: bool = False) -> str:
+    """
+    Build the product, offer_period and offer_snapshot INSERTs for validated deals.
+    With fts_only, just the product_fts statements (needs a search_index).
+    Tiles repeating the same offer are merged first, unless keep_duplicates.
+    With a SnapshotState, only changed offers (or heartbeats) get a snapshot row.
+    With a SearchIndexState, new or changed products are (re)indexed in product_fts.
+    With an AliasMap, deals are filed under their canonical SKU and the alternate
+    SKUs of their groups are written to the alias table.
+    """
+    if not keep_duplicates:
+        with instrument.stage("dedupe"):
+            available, duplicates = dedupe_deals(available, alias_map)
+        instrument.count("duplicates_removed", duplicates)
+    alias_pairs = alias_map.canonicalize(available) if alias_map is not None else []
+    if fts_only:
+        with instrument.stage("serialize"):
+            return make_fts_sql(search_index.changed_rows(available)) + "\n"
+
+    # Transform available deals into three tables
+    with instrument.stage("transform"):
+        products = [transform_product(d) for d in available]
+        offer_periods = [transform_offer_period(d) for d in available]
+        offer_snapshots = [
+            transform_offer_snapshot(d) for d in available
+            if snapshot_state is None or snapshot_state.should_emit(d)
+        ]
+    instrument.count("offer_snapshots", len(offer_snapshots))
+
+    # Generate SQL for each table
+    with instrument.stage("serialize"):
+        sql = ""
+        sql += make_sql_insert(products, "product") + "\n"
+        sql += make_sql_insert(offer_periods, "offer_period") + "\n"
+        sql += make_sql_insert(offer_snapshots, "offer_snapshot") + "\n"
+        if alias_pairs:
+            sql += make_alias_sql(alias_pairs) + "\n"
+        if search_index is not None:
+            sql += make_fts_sql(search_index.changed_rows(available)) + "\n"
+    return sql
+
+def main(argv: List[str] | None = None):
     parser = argparse.ArgumentParser(description='Preprocess deals for ingestion (outputs SQL and unavailable NDJSON)')
     parser.add_argument('--file', required=True, help='Path to the NDJSON file containing deals')
     parser.add_argument('--sql-out', help='Output SQL file (all tables)', default=None)
     parser.add_argument('--unavailable-file', help='Path to save unavailable deals (default: unprocessed_YYYYMMDD-YYYYMMDD.ndjson)')
     parser.add_argument('--ignore-unavailable', action='store_true', help='If set, do not write unavailable deals NDJSON')
-    args = parser.parse_args()
+    parser.add_argument('--state-file', default=str(STATE_DIR / 'snapshot_state_sql.json'),
+                        help='Last-seen offer state used for snapshot change detection')
+    parser.add_argument('--heartbeat-hours', type=float, default=DEFAULT_HEARTBEAT_HOURS,
+                        help=f'Emit an unchanged snapshot again after this many hours, 0 = never (default: {DEFAULT_HEARTBEAT_HOURS:g})')
+    parser.add_argument('--all-snapshots', action='store_true', help='Emit a snapshot for every deal (no change detection)')
+    parser.add_argument('--fts-state-file', default=str(STATE_DIR / 'fts_index_state.json'),
+                        help='What is already in the product_fts search index')
+    parser.add_argument('--no-fts', action='store_true', help='Do not emit product_fts search index statements')
+    parser.add_argument('--reindex-all', action='store_true', help='Re-index every product of the file in product_fts')
+    parser.add_argument('--fts-only', action='store_true',
+                        help='Only write product_fts statements, for every product of the file (implies --reindex-all; '
+                             'default output data/sqls/fts_<base>.sql)')
+    parser.add_argument('--alias-file', default=str(ALIAS_STATE),
+                        help='Alternate SKU -> canonical SKU map, updated with the SKU groups of this file')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Do not merge tiles repeating the same offer')
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session("convert_deals_to_sql", args):
+        convert(args)
 
+def convert(args: argparse.Namespace) -> None:
     # Determine processed and sqls output directories relative to this script
     script_dir = Path(__file__).parent
     processed_dir = (script_dir / '..' / '..' / 'data' / 'processed').resolve()
@@ -166,7 +272,7 @@ def main():
     base = input_path.stem
 
     # Set SQL output path if not provided
-    args.sql_out = args.sql_out or str(sqls_dir / f"{base}.sql")
+    args.sql_out = args.sql_out or str(sqls_dir / f"{'fts_' if args.fts_only else ''}{base}.sql")
 
     # Set unavailable deals output path if not provided
     if not args.unavailable_file:
@@ -176,23 +282,17 @@ def main():
         args.unavailable_file = str(processed_dir / Path(args.unavailable_file).name)
 
     # Read and validate deals
-    with open(args.file, 'r') as f:
+    with instrument.stage("read"), open(args.file, 'r') as f:
         deals = [json.loads(line) for line in f if line.strip()]
 
     # Transform and split into tables
-    available, unavailable = [], []
-    for deal in deals:
-        is_valid, reason = validate_deal(deal)
-        if not is_valid:
-            deal["validation_error"] = reason
-            unavailable.append(deal)
-            continue
-        available.append(deal)
-
-    # Transform available deals into three tables
-    products = [transform_product(d) for d in available]
-    offer_periods = [transform_offer_period(d) for d in available]
-    offer_snapshots = [transform_offer_snapshot(d) for d in available]
+    available, unavailable = split_deals(deals)
+    alias_map = AliasMap.load(args.alias_file)
+    duplicates = 0
+    if not args.keep_duplicates:
+        with instrument.stage("dedupe"):
+            available, duplicates = dedupe_deals(available, alias_map)
+        instrument.count("duplicates_removed", duplicates)
 
     # Write unavailable deals NDJSON if any and not ignored
     if unavailable and not args.ignore_unavailable:
@@ -206,19 +306,30 @@ def main():
     print(f"Total deals: {len(deals)}")
     print(f"Valid deals: {len(available)}")
     print(f"Unavailable deals: {len(unavailable)}")
+    print(f"Duplicate tiles merged: {duplicates}")
     
     # Generate SQL for each table
-    sql = ""
-    sql += make_sql_insert(products, "product") + "\n"
-    sql += make_sql_insert(offer_periods, "offer_period") + "\n"
-    sql += make_sql_insert(offer_snapshots, "offer_snapshot") + "\n"
+    snapshot_state = None
+    if not (args.all_snapshots or args.fts_only):
+        snapshot_state = SnapshotState(args.state_file, args.heartbeat_hours)
+    search_index = None
+    if args.fts_only or not args.no_fts:
+        search_index = SearchIndexState(args.fts_state_file, args.reindex_all or args.fts_only)
+    # Already merged above
+    sql = build_sql(available, snapshot_state, search_index, alias_map, keep_duplicates=True, fts_only=args.fts_only)
 
     # Write SQL file
-    with open(args.sql_out, 'w') as f:
+    with instrument.stage("serialize"), open(args.sql_out, 'w') as f:
         f.write(sql)
     print(f"Wrote SQL to {args.sql_out}")
+    if snapshot_state:
+        snapshot_state.save()
+        print(f"Snapshots: {snapshot_state.emitted} emitted, {snapshot_state.suppressed} unchanged skipped")
+    if search_index:
+        search_index.save()
+    alias_map.save()
 
-    print(f"Total deals: {len(deals)} | Available: {len(available)} | Unavailable: {len(unavailable)}")
+    print(f"Total deals: {len(deals)} | Available: {len(available)} | Unavailable: {len(unavailable)} | Duplicates: {duplicates}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
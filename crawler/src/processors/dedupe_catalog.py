@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+dedupe_catalog.py
+-----------------
+Find SKUs that are probably the same product (re-issued under a new item number
+with a slightly different name) and propose them as alias groups.
+
+Every SKU of data/processed/ is reduced to one text (its latest name plus the
+words of its details), cut into character shingles and summarized by a MinHash
+signature. Locality-sensitive hashing (the signature split into bands) only
+pairs SKUs that collide in at least one band, so the catalog is never compared
+all-pairs; candidates whose signatures agree closely enough are then scored by
+the exact Jaccard similarity of their shingles and joined into groups.
+
+Groups whose SKUs are already aliased (data/state/alias_map.json) are skipped.
+The proposals are written for review; applying them adds the groups to the alias
+map, which the converter and ingest turn into `alias` rows.
+
+Usage:
+  python dedupe_catalog.py [--threshold 0.6] [--out data/state/alias_proposals.json]
+  python dedupe_catalog.py --apply --apply-min-score 0.9
+  python dedupe_catalog.py --from-proposals data/state/alias_proposals.json   # after review
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.aliases import ALIAS_STATE, AliasMap
+from utils.deal_archive import PROCESSED_DIR, archive_files
+from utils.search_index import normalize_search_text
+from utils.snapshot_state import STATE_DIR
+
+PROPOSALS_FILE = STATE_DIR / "alias_proposals.json"
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_THRESHOLD = 0.6
+SHINGLE_SIZE = 4
+# MinHash estimates with 128 permutations are within ~0.1 of the true similarity
+ESTIMATE_SLACK = 0.15
+MERSENNE_PRIME = (1 << 31) - 1
+# Words of the offer details that say nothing about the product
+DETAILS_NOISE_RE = re.compile(r"\b(?:\d+|off|limit|item|items|valid|through|in|warehouse|online|and|per|member)\b")
+
+
+def load_catalog(files: Iterable[Path]) -> Dict[str, Dict[str, Any]]:
+    """Latest name/details per SKU, with the first and last period it was seen in."""
+    catalog: Dict[str, Dict[str, Any]] = {}
+    for path in files:
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                deal = json.loads(line)
+                sku, name = deal.get("sku"), deal.get("name")
+                if not sku or not name:
+                    continue
+                starts = (deal.get("valid_period") or {}).get("starts") or ""
+                entry = catalog.setdefault(sku, {"name": name, "details": "", "first": starts, "last": starts})
+                if starts >= entry["last"]:
+                    entry.update(name=name, details=deal.get("details") or "", last=starts)
+                entry["first"] = min(entry["first"], starts) if entry["first"] else starts
+    return catalog
+
+
+def shingles(name: str, details: str = "") -> Set[str]:
+    """Character shingles of the normalized name plus the product words of the details."""
+    text = normalize_search_text(name)
+    padded = f" {text} "
+    result = {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+    words = DETAILS_NOISE_RE.sub(" ", normalize_search_text(details)).split()
+    result.update(f"d:{word}" for word in words if len(word) > 2)
+    return result
+
+
+class MinHasher:
+    """MinHash signatures from `num_perm` universal hash functions (a*x + b) mod p."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: Set[str]) -> np.ndarray:
+        if not shingle_set:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        # crc32 is stable across runs (unlike hash()); values < 2**31 keep a*x + b within uint64
+        x = np.fromiter((zlib.crc32(s.encode()) for s in shingle_set), dtype=np.uint64) % np.uint64(MERSENNE_PRIME)
+        return ((np.outer(x, self.a) + self.b) % np.uint64(MERSENNE_PRIME)).min(axis=0)
+
+
+def lsh_candidates(signatures: np.ndarray, bands: int) -> Set[Tuple[int, int]]:
+    """Index pairs that share all rows of at least one band."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    candidates: Set[Tuple[int, int]] = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            buckets.setdefault(chunk[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                candidates.update((a, b) for k, a in enumerate(members) for b in members[k + 1:])
+    return candidates
+
+
+def estimated_similarity(signatures: np.ndarray, pairs: np.ndarray, chunk: int = 100_000) -> np.ndarray:
+    """Share of equal MinHash values per pair, an unbiased estimate of the Jaccard similarity."""
+    estimates = np.empty(len(pairs), dtype=np.float32)
+    for start in range(0, len(pairs), chunk):
+        i, j = pairs[start:start + chunk].T
+        estimates[start:start + chunk] = (signatures[i] == signatures[j]).mean(axis=1)
+    return estimates
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def find_groups(catalog: Dict[str, Dict[str, Any]], threshold: float = DEFAULT_THRESHOLD,
+                num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS,
+                alias_map: AliasMap | None = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Proposed alias groups (best first) and run statistics."""
+    skus = sorted(catalog)
+    sets = [shingles(catalog[s]["name"], catalog[s]["details"]) for s in skus]
+    hasher = MinHasher(num_perm)
+    signatures = np.stack([hasher.signature(s) for s in sets]) if sets else np.empty((0, num_perm), np.uint64)
+    candidates = lsh_candidates(signatures, bands)
+
+    # Union-find over the verified pairs; already aliased pairs need no proposal
+    parent = list(range(len(skus)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Only candidates whose estimate is near the threshold get the exact (slow) set comparison
+    candidate_array = np.array(sorted(candidates), dtype=np.int64).reshape(-1, 2)
+    estimates = estimated_similarity(signatures, candidate_array)
+    likely = candidate_array[estimates >= threshold - ESTIMATE_SLACK]
+
+    pairs: List[Tuple[int, int, float]] = []
+    for i, j in likely.tolist():
+        if alias_map is not None and alias_map.canonical(skus[i]) == alias_map.canonical(skus[j]):
+            continue
+        score = jaccard(sets[i], sets[j])
+        if score >= threshold:
+            pairs.append((i, j, score))
+            parent[root(i)] = root(j)
+
+    group_pairs: Dict[int, List[Tuple[int, int, float]]] = {}
+    for pair in pairs:
+        group_pairs.setdefault(root(pair[0]), []).append(pair)
+    members: Dict[int, List[int]] = {}
+    for i in range(len(skus)):
+        if root(i) in group_pairs:
+            members.setdefault(root(i), []).append(i)
+
+    groups = []
+    for key, indices in members.items():
+        # The SKU seen first keeps the history; the later item numbers become its aliases
+        indices.sort(key=lambda i: (catalog[skus[i]]["first"] or "9999", skus[i]))
+        scores = sorted(((skus[i], skus[j], round(score, 3)) for i, j, score in group_pairs[key]),
+                        key=lambda p: -p[2])
+        groups.append({
+            "canonical": skus[indices[0]],
+            "skus": [skus[i] for i in indices],
+            "score": min(score for _, _, score in scores),
+            "names": {skus[i]: catalog[skus[i]]["name"] for i in indices},
+            "pairs": [{"a": a, "b": b, "jaccard": score} for a, b, score in scores],
+        })
+    groups.sort(key=lambda g: (-g["score"], g["canonical"]))
+    stats = {"skus": len(skus), "candidates": len(candidates), "verified": len(likely),
+             "pairs": len(pairs), "groups": len(groups)}
+    return groups, stats
+
+
+def apply_groups(groups: List[Dict[str, Any]], alias_map: AliasMap) -> int:
+    """Add the groups to the alias map; returns the number of SKUs that got a new canonical SKU."""
+    before = alias_map.aliases()
+    for group in groups:
+        alias_map.add(group["skus"])
+    after = alias_map.aliases()
+    return sum(1 for alt, canonical in after.items() if before.get(alt) != canonical)
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Propose alias groups for near-duplicate products (MinHash/LSH)')
+    parser.add_argument('--processed-dir', default=str(PROCESSED_DIR), help=f'NDJSON input (default: {PROCESSED_DIR})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Minimum shingle Jaccard similarity of a proposed pair (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM,
+                        help=f'MinHash signature length (default: {DEFAULT_NUM_PERM})')
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS,
+                        help=f'LSH bands; more bands find less similar candidates (default: {DEFAULT_BANDS})')
+    parser.add_argument('--out', default=str(PROPOSALS_FILE), help=f'Proposals for review (default: {PROPOSALS_FILE})')
+    parser.add_argument('--alias-file', default=str(ALIAS_STATE), help='Alias map to skip known groups and to update')
+    parser.add_argument('--apply', action='store_true', help='Add proposed groups to the alias map')
+    parser.add_argument('--apply-min-score', type=float, default=0.9,
+                        help='With --apply: only groups whose weakest pair scores at least this (default: 0.9)')
+    parser.add_argument('--from-proposals', metavar='FILE',
+                        help='Add every group of a reviewed proposals file to the alias map and exit')
+    args = parser.parse_args(argv)
+
+    if args.num_perm % args.bands:
+        parser.error('--num-perm must be a multiple of --bands')
+    alias_map = AliasMap.load(args.alias_file)
+
+    if args.from_proposals:
+        with open(args.from_proposals, "r") as f:
+            groups = json.load(f)["groups"]
+        changed = apply_groups(groups, alias_map)
+        alias_map.save()
+        print(f"Applied {len(groups)} groups from {args.from_proposals}: {changed} SKUs re-pointed")
+        return
+
+    started = time.perf_counter()
+    catalog = load_catalog(archive_files(Path(args.processed_dir)))
+    groups, stats = find_groups(catalog, args.threshold, args.num_perm, args.bands, alias_map)
+    elapsed = time.perf_counter() - started
+    rows = args.num_perm // args.bands
+    print(f"{stats['skus']} SKUs, {stats['candidates']} LSH candidates ({stats['verified']} verified), {stats['pairs']} pairs >= {args.threshold} "
+          f"-> {stats['groups']} groups in {elapsed:.2f}s "
+          f"(LSH threshold ~{(1 / args.bands) ** (1 / rows):.2f})")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"threshold": args.threshold, "groups": groups}, f, indent=2, ensure_ascii=False)
+    print(f"Wrote proposals to {out}")
+    for group in groups[:10]:
+        names = " | ".join(group["names"][sku] for sku in group["skus"])
+        print(f"  {group['score']:.2f} {', '.join(group['skus'])}: {names}")
+
+    if args.apply:
+        accepted = [g for g in groups if g["score"] >= args.apply_min_score]
+        changed = apply_groups(accepted, alias_map)
+        alias_map.save()
+        print(f"Applied {len(accepted)} groups with score >= {args.apply_min_score}: {changed} SKUs re-pointed")
+
+
+if __name__ == "__main__":
+    main()
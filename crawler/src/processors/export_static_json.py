@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+export_static_json.py
+---------------------
+Precompute static JSON for the two read paths of the site so they can be served
+from a CDN instead of querying D1 on every page view:
+
+  daily/<region>/<YYYY-MM-DD>.json   deals active on that day (= GET /api/deals/today)
+  sku/<shard>/<sku>.json             every offer period of a product (timeline)
+  manifest.json                      content hash per day file, SKU count, shard scheme
+
+A SKU's shard is its last two characters, so a client can compute the URL
+without a lookup. Files use the same `{"data": [...], "meta": {...}}` shape as
+the API and are only rewritten when their content changes; --gzip also writes a
+precompressed `.json.gz` next to each one.
+
+Regeneration is incremental: every exported period is kept in
+data/state/export_periods.json, and a run only rewrites the days covered by
+periods that are new or changed, and the timelines of the SKUs they belong to.
+A product change (name, image, ...) touches all of that SKU's days.
+
+Deals are exported under their canonical SKU (data/state/alias_map.json), so
+a product listed under several item numbers has one timeline, as in the API.
+
+Usage:
+  python export_static_json.py [--file deals.ndjson ...] [--out-dir data/exports] [--gzip] [--full]
+
+Without --file, all deals NDJSON in data/processed/ are read.
+"""
+import argparse
+import datetime as dt
+import gzip
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from processors.convert_deals_to_sql import split_deals, transform_offer_period, transform_product
+from utils.aliases import ALIAS_STATE, AliasMap
+from utils.snapshot_state import STATE_DIR, offer_key
+
+PROCESSED_DIR = Path(__file__).parent.parent.parent / "data" / "processed"
+EXPORTS_DIR = Path(__file__).parent.parent.parent / "data" / "exports"
+MANIFEST_VERSION = 1
+
+
+def shard_for(sku: str) -> str:
+    """Last two characters of the SKU (zero-padded), e.g. '1234567' -> '67'."""
+    return sku[-2:].rjust(2, "0")
+
+
+def days_between(starts: str, ends: str) -> Iterable[str]:
+    day, last = dt.date.fromisoformat(starts), dt.date.fromisoformat(ends)
+    while day <= last:
+        yield day.isoformat()
+        day += dt.timedelta(days=1)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+class ExportStore:
+    """Every exported product and offer period, persisted as a JSON file."""
+
+    def __init__(self, path: Path, fresh: bool = False):
+        self.path = Path(path)
+        self.products: Dict[str, Dict[str, Any]] = {}
+        self.periods: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists() and not fresh:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+            self.products, self.periods = state["products"], state["periods"]
+
+    def merge(self, deals: List[Dict[str, Any]]) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+        """Merge available deals; returns the affected SKUs and (region, day) pairs."""
+        changed_products, changed_periods = set(), []
+        for deal in deals:
+            product = transform_product(deal)
+            if self.products.get(product["sku"]) != product:
+                self.products[product["sku"]] = product
+                changed_products.add(product["sku"])
+            period = transform_offer_period(deal)
+            del period["product_id"]
+            period["sku"] = deal["sku"]
+            # REAL columns in D1, so the API returns numbers
+            period["discount_low"] = period["discount_high"] = float(deal["discount"])
+            key = offer_key(deal["sku"], period["starts"], period["ends"], period["region"])
+            if self.periods.get(key) != period:
+                self.periods[key] = period
+                changed_periods.append(period)
+
+        skus = changed_products | {p["sku"] for p in changed_periods}
+        days = {(p["region"], day) for p in changed_periods for day in days_between(p["starts"], p["ends"])}
+        if changed_products:
+            days |= {
+                (p["region"], day) for p in self.periods.values() if p["sku"] in changed_products
+                for day in days_between(p["starts"], p["ends"])
+            }
+        return skus, days
+
+    def rows(self, periods: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """API-shaped rows (period + product columns), most recent start first."""
+        rows = [{**period, **self.products[period["sku"]]} for period in periods]
+        return sorted(rows, key=lambda r: (r["starts"], r["ends"], r["sku"]), reverse=True)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"products": self.products, "periods": self.periods}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+def write_if_changed(path: Path, payload: Dict[str, Any], gzip_too: bool) -> Tuple[str, bool]:
+    """Write compact JSON (and .json.gz) unless identical; returns (content hash, written)."""
+    data = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    gz_path = path.with_suffix(".json.gz")
+    changed = not path.exists() or path.read_bytes() != data
+    if changed:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    if gzip_too and (changed or not gz_path.exists()):
+        # mtime=0 keeps the bytes (and the CDN's ETag) stable across runs
+        gz_path.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    return content_hash(data), changed
+
+
+def export(store: ExportStore, skus: Set[str], days: Set[Tuple[str, str]], out_dir: Path,
+           gzip_too: bool) -> Dict[str, int]:
+    """Rewrite the given SKU timelines and day files, then the manifest."""
+    manifest_path = out_dir / "manifest.json"
+    manifest = {"days": {}}
+    if manifest_path.exists():
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+    by_sku: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    by_day: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+    for period in store.periods.values():
+        if period["sku"] in skus:
+            by_sku[period["sku"]].append(period)
+        for day in days_between(period["starts"], period["ends"]):
+            if (period["region"], day) in days:
+                by_day[(period["region"], day)].append(period)
+
+    stats = {"skus": 0, "days": 0, "unchanged": 0}
+    for sku in sorted(skus):
+        rows = store.rows(by_sku[sku])
+        _, written = write_if_changed(out_dir / "sku" / shard_for(sku) / f"{sku}.json",
+                                      {"data": rows, "meta": {"sku": sku, "count": len(rows)}}, gzip_too)
+        stats["skus" if written else "unchanged"] += 1
+
+    for region, day in sorted(days):
+        rows = store.rows(by_day[(region, day)])
+        digest, written = write_if_changed(out_dir / "daily" / region / f"{day}.json",
+                                           {"data": rows, "meta": {"count": len(rows), "region": region, "date": day}},
+                                           gzip_too)
+        manifest["days"].setdefault(region, {})[day] = digest
+        stats["days" if written else "unchanged"] += 1
+
+    manifest.update({
+        "version": MANIFEST_VERSION,
+        "generated_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "sku_count": len(store.products),
+        "sku_shard": "last 2 characters of the SKU",
+        "gzip": gzip_too,
+    })
+    manifest["days"] = {r: dict(sorted(d.items())) for r, d in sorted(manifest["days"].items())}
+    write_if_changed(manifest_path, manifest, gzip_too)
+    return stats
+
+
+def read_deals(files: List[Path]) -> List[Dict[str, Any]]:
+    deals = []
+    for ndjson_file in files:
+        with open(ndjson_file, "r") as f:
+            deals.extend(json.loads(line) for line in f if line.strip())
+    # Later sightings win, like the API ingest's upserts
+    deals.sort(key=lambda d: d.get("seen_at") or "")
+    return deals
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Export precomputed daily and per-SKU JSON for static hosting')
+    parser.add_argument('--file', nargs='+', help='Deals NDJSON file(s) to export (default: all in data/processed)')
+    parser.add_argument('--out-dir', default=str(EXPORTS_DIR), help=f'Export directory (default: {EXPORTS_DIR})')
+    parser.add_argument('--state-file', default=str(STATE_DIR / 'export_periods.json'),
+                        help='Everything exported so far, used for incremental regeneration')
+    parser.add_argument('--gzip', action='store_true', help='Also write precompressed .json.gz files')
+    parser.add_argument('--full', action='store_true', help='Ignore the state and rewrite every day and SKU')
+    parser.add_argument('--alias-file', default=str(ALIAS_STATE),
+                        help='Alternate SKU -> canonical SKU map (read only)')
+    args = parser.parse_args(argv)
+
+    files = [Path(p) for p in args.file] if args.file else sorted(
+        p for p in PROCESSED_DIR.glob("*.ndjson") if not p.name.startswith("unavailable_")
+    )
+    if not files:
+        print(f"No deals NDJSON found in {PROCESSED_DIR}")
+        sys.exit(1)
+
+    available, _ = split_deals(read_deals(files))
+    AliasMap.load(args.alias_file).canonicalize(available)
+    store = ExportStore(args.state_file, fresh=args.full)
+    skus, days = store.merge(available)
+    if not skus and not days:
+        print(f"Exports are up to date ({len(available)} deals, nothing changed)")
+        return
+
+    stats = export(store, skus, days, Path(args.out_dir), args.gzip)
+    store.save()
+    print(f"Exported {stats['skus']} SKU timelines and {stats['days']} day files "
+          f"({stats['unchanged']} unchanged) to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
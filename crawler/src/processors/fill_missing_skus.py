@@ -11,8 +11,13 @@ Fills missing SKUs in the specified NDJSON file by:
 3. If not found, using the SKU of an item with similar name and similar details (from other NDJSONs).
 4. Logging every changed SKU.
 
+Matched SKUs are resolved to their canonical SKU through the alias map
+(data/state/alias_map.json plus the SKU groups of the reference deals), so an
+alternate SKU never starts a separate product.
+
 Output: Writes a new NDJSON file with '_sku_filled' suffix and a log file of changes.
 """
+import argparse
 import json
 from pathlib import Path
 import difflib
@@ -21,17 +26,22 @@ import sys
 from collections import Counter
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils import instrument
+from utils.aliases import AliasMap
+from utils.ndjson_index import MISSING_SKU, IndexedNdjson, rewrite_lines
+
 PROCESSED_DIR = Path(__file__).parent.parent.parent / "data" / "processed"
 LOG_FILE = Path(__file__).parent / "fill_missing_skus.log"
 
 # Set up logging
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(message)s')
 
-def load_reference_deals(processed_dir, exclude_file):
+def load_reference_deals(processed_dir, exclude_file=None):
     """Load all deals from all NDJSON files except the target file."""
     all_deals = []
     for ndjson_file in processed_dir.glob("*.ndjson"):
-        if ndjson_file.resolve() == exclude_file.resolve():
+        if exclude_file is not None and ndjson_file.resolve() == exclude_file.resolve():
             continue
         with open(ndjson_file, "r") as f:
             for line in f:
@@ -91,47 +101,117 @@ def find_sku_by_similarity(name, details, all_deals, name_thresh=0.85, details_t
                     best_sku = deal['sku']
     return best_sku
 
-def process_target_file(target_file, reference_deals):
+def reference_alias_map(reference_deals):
+    """The saved alias map extended with the SKU groups of the reference deals."""
+    alias_map = AliasMap.load()
+    for deal in reference_deals:
+        alias_map.add_deal(deal)
+    return alias_map
+
+def find_sku(deal, reference_deals, name_index=None, alias_map=None):
+    """Return (sku, reason) for a deal without SKU, or (None, None)."""
+    with instrument.stage("match"):
+        new_sku, reason = _find_sku(deal, reference_deals, name_index)
+    instrument.count(f"matched_{reason.replace(' ', '_').replace('/', '_')}" if reason else "unmatched")
+    if new_sku and alias_map is not None:
+        new_sku = alias_map.canonical(new_sku)
+    return new_sku, reason
+
+def _find_sku(deal, reference_deals, name_index=None):
+    # 1. Try exact name
+    if name_index is not None:
+        new_sku = name_index.get(deal['name'])
+    else:
+        new_sku = find_sku_by_exact_name(deal['name'], reference_deals)
+    if new_sku:
+        return new_sku, 'exact name'
+    # 2. Try prefix or suffix match
+    new_sku = find_sku_by_prefix_or_suffix(deal['name'], reference_deals)
+    if new_sku:
+        return new_sku, 'prefix/suffix match'
+    # 3. Try similarity
+    new_sku = find_sku_by_similarity(deal['name'], deal.get('details',''), reference_deals)
+    if new_sku:
+        return new_sku, 'fuzzy match'
+    return None, None
+
+def log_fill(source_name, line, reason, old_deal, deal):
+    log_msg = (
+        f"[SKU FILLED] file={source_name} line={line} reason={reason}\n"
+        f"  OLD: {json.dumps(old_deal, ensure_ascii=False)}\n"
+        f"  NEW: {json.dumps(deal, ensure_ascii=False)}"
+    )
+    logging.info(log_msg)
+    return log_msg
+
+class SkuReference:
+    """
+    Reference deals kept in memory for repeated fills (e.g. by the watcher), with
+    an exact-name index; `add` extends it with newly extracted deals.
+    """
+
+    def __init__(self, reference_deals=None, alias_map=None):
+        self.deals = []
+        self.by_name = {}
+        self.aliases = alias_map if alias_map is not None else AliasMap.load()
+        self.add(reference_deals or [])
+
+    @classmethod
+    def load(cls, processed_dir=PROCESSED_DIR):
+        return cls(load_reference_deals(processed_dir))
+
+    def add(self, deals):
+        for deal in deals:
+            if deal.get('sku'):
+                self.aliases.add_deal(deal)
+                self.deals.append(deal)
+                # First match wins, like find_sku_by_exact_name
+                self.by_name.setdefault(deal['name'], deal['sku'])
+
+    def fill(self, deals, source_name="<memory>"):
+        """Fill missing SKUs in place; returns the number of deals changed."""
+        filled = 0
+        for i, deal in enumerate(deals):
+            if deal.get('sku'):
+                continue
+            new_sku, reason = find_sku(deal, self.deals, self.by_name, self.aliases)
+            if new_sku:
+                old_deal = dict(deal)  # copy for logging
+                deal['sku'] = new_sku
+                log_fill(source_name, i, reason, old_deal, deal)
+                filled += 1
+        return filled
+
+def process_target_file(target_file, reference_deals, alias_map=None):
     output_file = target_file.with_name(target_file.stem + "_sku_filled.ndjson")
-    changes = []
-    with open(target_file, "r") as f, open(output_file, "w") as out:
-        for i, line in enumerate(f):
-            deal = json.loads(line)
-            if not deal.get('sku'):
-                # 1. Try exact name
-                new_sku = find_sku_by_exact_name(deal['name'], reference_deals)
-                reason = 'exact name' if new_sku else None
-                # 2. Try prefix or suffix match
-                if not new_sku:
-                    new_sku = find_sku_by_prefix_or_suffix(deal['name'], reference_deals)
-                    reason = 'prefix/suffix match' if new_sku else None
-                # 3. Try similarity
-                if not new_sku:
-                    new_sku = find_sku_by_similarity(deal['name'], deal.get('details',''), reference_deals)
-                    reason = 'fuzzy match' if new_sku else None
-                if new_sku:
-                    old_deal = dict(deal)  # copy for logging
-                    deal['sku'] = new_sku
-                    log_msg = (
-                        f"[SKU FILLED] file={target_file.name} line={i} reason={reason}\n"
-                        f"  OLD: {json.dumps(old_deal, ensure_ascii=False)}\n"
-                        f"  NEW: {json.dumps(deal, ensure_ascii=False)}"
-                    )
-                    logging.info(log_msg)
-                    changes.append(log_msg)
-            out.write(json.dumps(deal, ensure_ascii=False) + "\n")
-    print(f"Done. Changes logged to {LOG_FILE}\nOutput: {output_file}")
-
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python fill_missing_skus.py <target_ndjson>")
-        sys.exit(1)
-    target_file = Path(sys.argv[1]).expanduser().resolve()
+    changes = {}
+    # Only the deals without SKU are decoded; the rest is copied byte for byte
+    with IndexedNdjson(target_file) as target:
+        for i in target.sku_lines(MISSING_SKU):
+            deal = target.line(i)
+            new_sku, reason = find_sku(deal, reference_deals, alias_map=alias_map)
+            if new_sku:
+                old_deal = dict(deal)  # copy for logging
+                deal['sku'] = new_sku
+                log_fill(target_file.name, i, reason, old_deal, deal)
+                changes[i] = deal
+        with instrument.stage("serialize"):
+            rewrite_lines(target, changes, output_file, ensure_ascii=False)
+    print(f"Done. {len(changes)} SKUs filled, changes logged to {LOG_FILE}\nOutput: {output_file}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill missing SKUs of a deals NDJSON from the other processed files')
+    parser.add_argument('target', help='NDJSON file whose deals without SKU should be filled')
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    target_file = Path(args.target).expanduser().resolve()
     if not target_file.exists():
         print(f"File not found: {target_file}")
         sys.exit(1)
-    reference_deals = load_reference_deals(PROCESSED_DIR, target_file)
-    process_target_file(target_file, reference_deals)
+    with instrument.session("fill_missing_skus", args):
+        with instrument.stage("read"):
+            reference_deals = load_reference_deals(PROCESSED_DIR, target_file)
+        process_target_file(target_file, reference_deals, reference_alias_map(reference_deals))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
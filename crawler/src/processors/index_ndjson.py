@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+index_ndjson.py
+---------------
+Build .idx offset sidecars for NDJSON deal files, or pull single records out of
+a file through its sidecar without decoding the rest.
+
+Usage:
+  python index_ndjson.py --all                                  # every file in data/processed
+  python index_ndjson.py data/processed/savings_20250514-20250608.ndjson
+  python index_ndjson.py data/processed/savings_20250514-20250608.ndjson --line 41
+  python index_ndjson.py data/processed/savings_20250514-20250608.ndjson --sku 1720981
+  python index_ndjson.py data/processed/savings_20250514-20250608.ndjson --missing-sku
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.deal_archive import PROCESSED_DIR
+from utils.ndjson_index import MISSING_SKU, IndexedNdjson, build_index, load_index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build NDJSON offset sidecars and read records through them')
+    parser.add_argument('files', nargs='*', help='NDJSON files')
+    parser.add_argument('--all', action='store_true', help=f'Index every NDJSON file in {PROCESSED_DIR}')
+    parser.add_argument('--force', action='store_true', help='Rebuild sidecars that are still up to date')
+    parser.add_argument('--line', type=int, nargs='+', help='Print these lines (0-based) of the file')
+    parser.add_argument('--sku', nargs='+', help='Print the deals listing these SKUs')
+    parser.add_argument('--missing-sku', action='store_true', help='Print the deals without SKU')
+    args = parser.parse_args(argv)
+
+    files = [Path(f) for f in args.files]
+    if args.all:
+        files += sorted(PROCESSED_DIR.glob("*.ndjson"))
+    if not files:
+        parser.error('give NDJSON files or --all')
+
+    if args.line or args.sku or args.missing_sku:
+        if len(files) != 1:
+            parser.error('--line/--sku/--missing-sku read from exactly one file')
+        with IndexedNdjson(files[0]) as indexed:
+            numbers = set(args.line or [])
+            for sku in args.sku or []:
+                numbers.update(indexed.sku_lines(sku))
+            if args.missing_sku:
+                numbers.update(indexed.sku_lines(MISSING_SKU))
+            for n in sorted(numbers):
+                print(json.dumps({"line": n, **indexed.line(n)}, ensure_ascii=False))
+        return
+
+    built = 0
+    for path in files:
+        if args.force or load_index(path) is None:
+            build_index(path)
+            built += 1
+    print(f"Indexed {built} of {len(files)} files ({len(files) - built} already up to date)")
+
+
+if __name__ == "__main__":
+    main()
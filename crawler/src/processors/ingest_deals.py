@@ -11,33 +11,84 @@ Usage:
   
   # For D1 database:
   python ingest_deals.py --file data/processed/deals_20240314-20240414.ndjson --d1
+
+Snapshots are change-detected: a deal carries a snapshot only if its discount
+or details changed since the last one sent for the same (sku, starts, ends,
+region), or after --heartbeat-hours. State is kept per target in
+data/state/snapshot_state_{local,d1}.json; --all-snapshots disables the check.
+
+--validate-only stops after validation (unavailable deals are still written).
+`requests` and `python-dotenv` are only imported once something is sent, so
+--help and validation runs start fast.
+
+--sku/--line re-ingest just some deals of a file; only those lines are decoded,
+through the file's .idx offset sidecar (built on first use).
+
+Deals are sent under their canonical SKU (data/state/alias_map.json) with the
+other SKUs of the product as product.alt_skus, which the API stores as aliases.
+
+Tiles repeating an offer (same canonical sku, starts, ends and region) are
+merged into one deal before sending (see utils/dedupe.py); --keep-duplicates
+sends every copy.
+
+--bulk sends the deals to /api/ingest/bulk in chunks of --bulk-size, which
+the Worker writes with one db.batch() of multi-row upserts per chunk instead
+of a statement per deal. The bulk endpoint authenticates with INGEST_API_KEY
+(the Worker secret of the same name) on any target, so --bulk --d1 sends
+INGEST_API_KEY where plain --d1 sends CF_D1_API_KEY.
+benchmarks/bench_bulk_ingest.py compares both paths on a local SQLite copy
+of the schema.
+
+--watchlist matches the ingested deals against a watchlist of saved keywords
+and SKUs (utils/watchlist.py) and writes the matches to data/alerts/.
 """
 
 import json
 import sys
-import requests
 import os
 import argparse
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 from datetime import datetime
-from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils import instrument
+from utils.aliases import ALIAS_STATE, AliasMap
+from utils.dedupe import dedupe_deals
+from utils.images import thumbnail_url
+from utils.ndjson_index import IndexedNdjson, write_ndjson as write_ndjson_file
+from utils.snapshot_state import DEFAULT_HEARTBEAT_HOURS, STATE_DIR, SnapshotState
+
+LOCAL_API_URL = "http://localhost:8787/api/ingest"
+# Deals per /api/ingest/bulk request; the Worker refuses more than MAX_BULK_SIZE (MAX_BULK_DEALS in router.ts)
+DEFAULT_BULK_SIZE = 500
+MAX_BULK_SIZE = 1000
 
 def read_deals_file(file_path: str) -> List[Dict[str, Any]]:
     """Read deals from NDJSON file."""
     try:
-        with open(file_path, 'r') as f:
+        with instrument.stage("read"), open(file_path, 'r') as f:
             return [json.loads(line) for line in f if line.strip()]
     except Exception as e:
         print(f"Error reading file: {str(e)}")
         sys.exit(1)
 
+def read_selected_deals(file_path: str, skus: List[str], lines: List[int]) -> List[Dict[str, Any]]:
+    """Decode only the deals of `skus` and the given line numbers, through the file's .idx sidecar."""
+    try:
+        with instrument.stage("read"), IndexedNdjson(Path(file_path)) as indexed:
+            selected = set(lines)
+            for sku in skus:
+                selected.update(indexed.sku_lines(sku))
+            return list(indexed.lines(sorted(selected)))
+    except (OSError, IndexError) as e:
+        print(f"Error reading file: {str(e)}")
+        sys.exit(1)
+
 def write_ndjson(data: List[Dict[str, Any]], file_path: str) -> None:
     """Write data to an NDJSON file."""
     try:
-        with open(file_path, 'w') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
+        write_ndjson_file(data, file_path)
     except Exception as e:
         print(f"Error writing to {file_path}: {str(e)}")
         sys.exit(1)
@@ -97,7 +148,9 @@ def transform_deal(deal: Dict[str, Any]) -> Dict[str, Any]:
         "name": deal["name"],
         "category": deal.get("category", "Other"),
         "image_url": deal.get("image_url", None),
-        "brand": None  # We'll set this to NULL for now
+        "thumbnail_url": thumbnail_url(deal.get("image_url"), deal.get("image_srcset")),
+        "brand": None,  # We'll set this to NULL for now
+        "alt_skus": deal.get("alt_skus", []),
     }
 
     # Extract offer period data
@@ -134,10 +187,16 @@ def extract_limit_qty(details: str) -> int | None:
     match = re.search(r"Limit\s+(\d+)", details)
     return int(match.group(1)) if match else None
 
+def _requests():
+    # Imported on first use: it is the slowest import of the script
+    import requests
+    return requests
+
 def get_api_url(use_d1: bool) -> str:
     """Get the appropriate API URL based on the target database."""
     if use_d1:
         # Load environment variables from .env file
+        from dotenv import load_dotenv
         load_dotenv()
         # Get the API URL from environment
         api_url = os.getenv("VITE_API_URL")
@@ -146,53 +205,108 @@ def get_api_url(use_d1: bool) -> str:
             sys.exit(1)
         return f"{api_url}/api/ingest"
     else:
-        return os.getenv("INGEST_API_URL", "http://localhost:8787/api/ingest")
+        return os.getenv("INGEST_API_URL", LOCAL_API_URL)
 
-def ingest_deals(deals: List[Dict[str, Any]], api_url: str, use_d1: bool) -> None:
-    """Ingest deals into the database via the ingestion endpoint."""
-    try:
-        # Transform deals to match database schema
-        transformed_deals = [transform_deal(deal) for deal in deals]
-        
-        # Create headers with authentication
-        headers = {
-            "Content-Type": "application/json"
-        }
-        if use_d1:
-            api_key = os.getenv("CF_D1_API_KEY")
-            if not api_key:
-                print("Warning: CF_D1_API_KEY not set, proceeding without Authorization header")
-            else:
-                headers["Authorization"] = f"Bearer {api_key}"
-        
-        print(f"Sending request to: {api_url}")
-        
-        # Send request to API
-        response = requests.post(
+class IngestError(Exception):
+    """The ingest endpoint rejected a request (non-200 or non-success response)."""
+
+def build_headers(use_d1: bool, bulk: bool = False) -> Dict[str, str]:
+    """Request headers for the ingest endpoint.
+
+    The bulk endpoint takes INGEST_API_KEY on any target (local or D1); otherwise
+    only D1 is authenticated, with CF_D1_API_KEY.
+    """
+    headers = {
+        "Content-Type": "application/json"
+    }
+    if use_d1 or bulk:
+        key_name = "INGEST_API_KEY" if bulk else "CF_D1_API_KEY"
+        api_key = os.getenv(key_name)
+        if not api_key:
+            print(f"Warning: {key_name} not set, proceeding without Authorization header")
+        else:
+            headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+def post_deals(transformed_deals: List[Dict[str, Any]], api_url: str, headers: Dict[str, str],
+               session: "requests.Session | None" = None) -> Dict[str, Any]:
+    """POST one payload of transformed deals; returns the response JSON or raises IngestError."""
+    with instrument.stage("network"):
+        response = (session or _requests()).post(
             api_url,
             json=transformed_deals,
             headers=headers,
             verify=True,  # Use system's default SSL certificates
             timeout=30
         )
+    instrument.count("requests")
+    instrument.count("deals_posted", len(transformed_deals))
+    if response.status_code != 200:
+        raise IngestError(f"Error ingesting deals: {response.status_code}\nResponse: {response.text}")
+    result = response.json()
+    if result.get('status') != 'success':
+        details = f"\nDetails: {result['details']}" if 'details' in result else ""
+        raise IngestError(f"Error: {result.get('message', 'Unknown error')}{details}")
+    return result
+
+def post_deals_bulk(transformed_deals: List[Dict[str, Any]], api_url: str, headers: Dict[str, str],
+                    bulk_size: int) -> int:
+    """POST the deals to the bulk endpoint in chunks of bulk_size over one session; returns the statement count."""
+    statements = 0
+    with _requests().Session() as session:
+        for i in range(0, len(transformed_deals), bulk_size):
+            result = post_deals(transformed_deals[i:i + bulk_size], api_url, headers, session)
+            statements += result.get('details', {}).get('statements', 0)
+            instrument.count("bulk_chunks")
+    return statements
+
+def ingest_deals(deals: List[Dict[str, Any]], api_url: str, use_d1: bool,
+                 snapshot_state: SnapshotState | None = None, alias_map: AliasMap | None = None,
+                 bulk_size: int | None = None, keep_duplicates: bool = False) -> None:
+    """
+    Ingest deals into the database via the ingestion endpoint.
+    Tiles repeating the same offer are merged first, unless keep_duplicates.
+    With a SnapshotState, unchanged offers are sent with "snapshot": null.
+    With an AliasMap, deals are sent under their canonical SKU with the rest of
+    their group as alt_skus.
+    With a bulk_size, they go to {api_url}/bulk in chunks of that many deals.
+    """
+    try:
+        if not keep_duplicates:
+            with instrument.stage("dedupe"):
+                deals, duplicates = dedupe_deals(deals, alias_map)
+            instrument.count("duplicates_removed", duplicates)
+        if alias_map is not None:
+            alias_map.canonicalize(deals)
+        # Transform deals to match database schema
+        with instrument.stage("transform"):
+            transformed_deals = [transform_deal(deal) for deal in deals]
+            if snapshot_state:
+                for deal, transformed in zip(deals, transformed_deals):
+                    if not snapshot_state.should_emit(deal):
+                        transformed["snapshot"] = None
         
-        if response.status_code != 200:
-            print(f"Error ingesting deals: {response.status_code}")
-            print(f"Response: {response.text}")
-            sys.exit(1)
+        # Create headers with authentication
+        headers = build_headers(use_d1, bulk=bulk_size is not None)
+
+        if bulk_size is not None:
+            print(f"Sending {len(transformed_deals)} deals to: {api_url}/bulk ({bulk_size} per request)")
+            statements = post_deals_bulk(transformed_deals, f"{api_url}/bulk", headers, bulk_size)
+            print(f"Successfully ingested {len(deals)} deals ({statements} batched statements)")
+            return
         
-        result = response.json()
-        if result.get('status') == 'success':
-            print(f"Successfully ingested {len(deals)} deals")
-            if 'details' in result:
-                print(f"Details: {result['details']}")
-        else:
-            print(f"Error: {result.get('message', 'Unknown error')}")
-            if 'details' in result:
-                print(f"Details: {result['details']}")
-            sys.exit(1)
+        print(f"Sending request to: {api_url}")
+        
+        # Send request to API
+        result = post_deals(transformed_deals, api_url, headers)
+        print(f"Successfully ingested {len(deals)} deals")
+        if 'details' in result:
+            print(f"Details: {result['details']}")
             
-    except requests.exceptions.RequestException as e:
+    except IngestError as e:
+        print(str(e))
+        sys.exit(1)
+    except _requests().exceptions.RequestException as e:
         print(f"Network error: {str(e)}")
         if hasattr(e, 'response') and e.response is not None:
             print(f"Response status code: {e.response.status_code}")
@@ -219,39 +333,75 @@ def get_valid_period_filename(deals: List[Dict[str, Any]], prefix: str) -> str:
     else:
         return f"{prefix}_unknown_period.ndjson"
 
-def main():
+def main(argv: List[str] | None = None):
     parser = argparse.ArgumentParser(description='Ingest deals into the database')
     parser.add_argument('--file', required=True, help='Path to the NDJSON file containing deals')
     parser.add_argument('--d1', action='store_true', help='Use D1 database instead of local')
     parser.add_argument('--unavailable-file', help='Path to save unavailable deals (default: unprocessed_YYYYMMDD-YYYYMMDD.ndjson)')
-    args = parser.parse_args()
+    parser.add_argument('--state-file', help='Last-seen offer state for snapshot change detection '
+                                             '(default: data/state/snapshot_state_{local,d1}.json)')
+    parser.add_argument('--heartbeat-hours', type=float, default=DEFAULT_HEARTBEAT_HOURS,
+                        help=f'Send an unchanged snapshot again after this many hours, 0 = never (default: {DEFAULT_HEARTBEAT_HOURS:g})')
+    parser.add_argument('--all-snapshots', action='store_true', help='Send a snapshot with every deal (no change detection)')
+    parser.add_argument('--alias-file', default=str(ALIAS_STATE),
+                        help='Alternate SKU -> canonical SKU map, updated with the SKU groups of this file')
+    parser.add_argument('--sku', nargs='+', help='Only (re-)ingest the deals of these SKUs')
+    parser.add_argument('--line', type=int, nargs='+', help='Only (re-)ingest these lines (0-based) of the file')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Do not merge tiles repeating the same offer')
+    parser.add_argument('--validate-only', action='store_true', help='Validate and report, but send nothing')
+    parser.add_argument('--watchlist', help='Match the ingested deals against this watchlist (writes data/alerts/)')
+    parser.add_argument('--bulk', action='store_true', help='Use the set-based bulk ingest endpoint (/api/ingest/bulk); authenticates with '
+                             'INGEST_API_KEY instead of CF_D1_API_KEY, also with --d1')
+    parser.add_argument('--bulk-size', type=int, default=DEFAULT_BULK_SIZE,
+                        help=f'Deals per bulk request, at most {MAX_BULK_SIZE} (default: {DEFAULT_BULK_SIZE})')
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if not 0 < args.bulk_size <= MAX_BULK_SIZE:
+        parser.error(f"--bulk-size must be between 1 and {MAX_BULK_SIZE}")
+    with instrument.session("ingest_deals", args):
+        run(args)
 
+def run(args: argparse.Namespace) -> None:
     # Get API URL based on target database
-    api_url = get_api_url(args.d1)
-    print(f"Using API endpoint: {api_url}")
+    if not args.validate_only:
+        api_url = get_api_url(args.d1)
+        print(f"Using API endpoint: {api_url}")
 
     try:
-        # Read deals from file
-        deals = read_deals_file(args.file)
+        # Read deals from file (only the selected lines with --sku/--line)
+        if args.sku or args.line:
+            deals = read_selected_deals(args.file, args.sku or [], args.line or [])
+            print(f"Selected {len(deals)} deals from {args.file}")
+        else:
+            deals = read_deals_file(args.file)
         
         # Validate deals and separate them
         valid_deals = []
         unavailable_deals = []
         
-        for deal in deals:
-            is_valid, reason = validate_deal(deal)
-            if is_valid:
-                valid_deals.append(deal)
-            else:
-                # Add validation reason to the deal
-                deal['validation_error'] = reason
-                unavailable_deals.append(deal)
+        with instrument.stage("validate"):
+            for deal in deals:
+                is_valid, reason = validate_deal(deal)
+                if is_valid:
+                    valid_deals.append(deal)
+                else:
+                    # Add validation reason to the deal
+                    deal['validation_error'] = reason
+                    unavailable_deals.append(deal)
         
+        alias_map = AliasMap.load(args.alias_file)
+        duplicates = 0
+        if not args.keep_duplicates:
+            with instrument.stage("dedupe"):
+                valid_deals, duplicates = dedupe_deals(valid_deals, alias_map)
+            instrument.count("duplicates_removed", duplicates)
+
         # Report statistics
         print(f"\nDeal Statistics:")
         print(f"Total deals: {len(deals)}")
         print(f"Valid deals: {len(valid_deals)}")
         print(f"Unavailable deals: {len(unavailable_deals)}")
+        print(f"Duplicate tiles merged: {duplicates}")
         
         if unavailable_deals:
             # Generate filename based on valid period
@@ -271,10 +421,30 @@ def main():
         if not valid_deals:
             print("\nNo valid deals to ingest")
             sys.exit(1)
+        if args.validate_only:
+            return
             
         # Ingest valid deals
+        snapshot_state = None
+        if not args.all_snapshots:
+            state_file = args.state_file or STATE_DIR / f"snapshot_state_{'d1' if args.d1 else 'local'}.json"
+            snapshot_state = SnapshotState(state_file, args.heartbeat_hours)
         print("\nIngesting valid deals...")
-        ingest_deals(valid_deals, api_url, args.d1)
+        # Already merged above
+        ingest_deals(valid_deals, api_url, args.d1, snapshot_state, alias_map,
+                     args.bulk_size if args.bulk else None, keep_duplicates=True)
+        alias_map.save()
+        if snapshot_state:
+            snapshot_state.save()
+            print(f"Snapshots: {snapshot_state.emitted} sent, {snapshot_state.suppressed} unchanged skipped")
+        if args.watchlist:
+            from utils.watchlist import Watchlist, alerts_file, write_alerts
+            with instrument.stage("watchlist"):
+                watchlist = Watchlist.load(args.watchlist)
+                matches = watchlist.match(valid_deals)
+                out = alerts_file(args.file)
+                write_alerts(watchlist, matches, out)
+            print(f"Watchlist: {len(matches)} of {len(watchlist.entries)} entries matched -> {out}")
         
     except FileNotFoundError:
         print(f"Error: File '{args.file}' not found")
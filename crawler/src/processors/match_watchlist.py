@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+match_watchlist.py
+------------------
+Match batches of deals (NDJSON files from the extractors) against a watchlist
+of saved keywords and SKUs, and write the matches grouped by watch entry to
+data/alerts/<batch>.alerts.ndjson (see utils/watchlist.py).
+
+The watchlist is compiled once and every file is matched in one pass over its
+deals. watch_raw.py and ingest_deals.py take the same --watchlist to match
+each new batch as it is extracted or ingested.
+
+Usage:
+  python match_watchlist.py --watchlist watchlist.ndjson data/processed/savings_20250514-20250608.ndjson
+  python match_watchlist.py --watchlist watchlist.ndjson --all [--alerts-dir /tmp/alerts]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils import instrument
+from utils.watchlist import ALERTS_DIR, Watchlist, alerts_file, write_alerts
+
+PROCESSED_DIR = Path(__file__).parent.parent.parent / "data" / "processed"
+
+
+def match_file(watchlist: Watchlist, ndjson_file: Path, alerts_dir: Path) -> tuple[int, int, Path]:
+    """Match one NDJSON batch; returns (deals, matched entries, alerts file)."""
+    with instrument.stage("read"), open(ndjson_file, "r", encoding="utf-8") as f:
+        deals = [json.loads(line) for line in f if line.strip()]
+    with instrument.stage("match"):
+        matches = watchlist.match(deals)
+    out = alerts_file(ndjson_file, alerts_dir)
+    write_alerts(watchlist, matches, out)
+    instrument.count("deals", len(deals))
+    instrument.count("entries_matched", len(matches))
+    return len(deals), len(matches), out
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Match deals against a watchlist of keywords and SKUs')
+    parser.add_argument('files', nargs='*', help='NDJSON files of deals')
+    parser.add_argument('--watchlist', required=True, help='Watchlist (NDJSON or JSON array of {id, user, keywords, skus})')
+    parser.add_argument('--all', action='store_true', help=f'Match every NDJSON file in {PROCESSED_DIR}')
+    parser.add_argument('--alerts-dir', type=Path, default=ALERTS_DIR, help=f'Where to write the matches (default: {ALERTS_DIR})')
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    files = [Path(f) for f in args.files]
+    if args.all:
+        files += sorted(PROCESSED_DIR.glob("*.ndjson"))
+    if not files:
+        parser.error('give NDJSON files or --all')
+
+    with instrument.session("match_watchlist", args):
+        started = time.perf_counter()
+        with instrument.stage("compile"):
+            try:
+                watchlist = Watchlist.load(args.watchlist)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        print(f"Compiled {len(watchlist.entries)} watch entries ({len(watchlist.keywords)} distinct keywords, "
+              f"{len(watchlist.skus)} SKUs) in {time.perf_counter() - started:.2f}s")
+        for path in files:
+            deals, matched, out = match_file(watchlist, path, args.alerts_dir)
+            print(f"{path.name}: {deals} deals, {matched} watch entries matched -> {out}")
+
+
+if __name__ == "__main__":
+    main()
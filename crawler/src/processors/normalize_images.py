@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+normalize_images.py
+-------------------
+Normalize the image URLs of deals NDJSON already in the archive, the way the
+extractors now write them: Wayback Machine prefixes stripped from image_url,
+image_srcset (where present) cleaned and sorted by width, and a missing
+image_url taken from the widest srcset variant. Files are rewritten in place
+(only changed lines are re-encoded) together with their .idx sidecar.
+
+With --sql-out it also writes UPDATEs setting product.image_url and the
+thumbnail_url added by migration 0005 for every product of the files (latest
+file wins, canonical SKUs from data/state/alias_map.json), since the
+converter's INSERT OR IGNORE never touches existing product rows.
+
+Usage:
+  python normalize_images.py --all [--dry-run] [--sql-out data/sqls/normalize_images.sql]
+  python normalize_images.py data/processed/savings_20250514-20250608.ndjson
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.aliases import ALIAS_STATE, AliasMap
+from utils.deal_archive import PROCESSED_DIR
+from utils.images import full_image_url, normalize_image_url, normalize_srcset, thumbnail_url
+from utils.ndjson_index import IndexedNdjson, index_path, rewrite_lines
+
+
+def normalize_deal(deal: Dict[str, Any]) -> bool:
+    """Normalize a deal's image fields in place; True if anything changed."""
+    before = (deal.get("image_url"), deal.get("image_srcset"))
+    if "image_srcset" in deal:
+        deal["image_srcset"] = normalize_srcset(deal["image_srcset"])
+    deal["image_url"] = full_image_url(normalize_image_url(deal.get("image_url")), deal.get("image_srcset"))
+    return (deal.get("image_url"), deal.get("image_srcset")) != before
+
+
+def normalize_file(path: Path, dry_run: bool = False) -> tuple[int, List[Dict[str, Any]]]:
+    """Rewrite `path` with normalized deals; returns (changed lines, all deals)."""
+    changes, deals = {}, []
+    with IndexedNdjson(path) as source:
+        for n in range(len(source)):
+            if not source.raw(n).strip():
+                continue
+            deal = source.line(n)
+            if normalize_deal(deal):
+                changes[n] = deal
+            deals.append(deal)
+        if changes and not dry_run:
+            tmp = path.with_name(path.name + ".tmp")
+            rewrite_lines(source, changes, tmp, ensure_ascii=False)
+    if changes and not dry_run:
+        os.replace(tmp, path)
+        os.replace(index_path(tmp), index_path(path))
+    return len(changes), deals
+
+
+def _quote(value: str | None) -> str:
+    return "NULL" if value is None else "'" + value.replace("'", "''") + "'"
+
+
+def make_update_sql(products: Dict[str, Dict[str, Any]]) -> str:
+    """One UPDATE per product setting image_url (kept when unknown) and thumbnail_url."""
+    return "\n".join(
+        f"UPDATE product SET image_url = COALESCE({_quote(p['image_url'])}, image_url), "
+        f"thumbnail_url = {_quote(p['thumbnail_url'])} WHERE sku = {_quote(sku)};"
+        for sku, p in sorted(products.items())
+    ) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Normalize image URLs of archived deals NDJSON')
+    parser.add_argument('files', nargs='*', help='NDJSON files')
+    parser.add_argument('--all', action='store_true', help=f'Every deals NDJSON in {PROCESSED_DIR}')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    parser.add_argument('--sql-out', help='Also write product image_url/thumbnail_url UPDATEs to this file')
+    parser.add_argument('--alias-file', default=str(ALIAS_STATE), help='Alternate SKU -> canonical SKU map')
+    args = parser.parse_args(argv)
+
+    files = [Path(f) for f in args.files]
+    if args.all:
+        files += sorted(p for p in PROCESSED_DIR.glob("*.ndjson") if not p.name.startswith("unavailable_"))
+    if not files:
+        parser.error('give NDJSON files or --all')
+
+    alias_map = AliasMap.load(args.alias_file)
+    products: Dict[str, Dict[str, Any]] = {}
+    total = 0
+    for path in files:
+        changed, deals = normalize_file(path, args.dry_run)
+        total += changed
+        print(f"{path.name}: {changed} of {len(deals)} deals {'would change' if args.dry_run else 'normalized'}")
+        for deal in deals:
+            if deal.get("sku") and deal.get("image_url"):
+                products[alias_map.canonical(deal["sku"])] = {
+                    "image_url": deal["image_url"],
+                    "thumbnail_url": thumbnail_url(deal["image_url"], deal.get("image_srcset")),
+                }
+    print(f"Total: {total} deals in {len(files)} files")
+
+    if args.sql_out:
+        Path(args.sql_out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.sql_out, 'w') as f:
+            f.write(make_update_sql(products))
+        print(f"Wrote {len(products)} product image UPDATEs to {args.sql_out}")
+
+
+if __name__ == "__main__":
+    main()
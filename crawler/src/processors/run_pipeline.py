@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+run_pipeline.py
+---------------
+Run the processing pipeline for one raw snapshot as a DAG of stages:
+
+  extract ──> ingest_local
+          └─> convert_sql ──> import_d1 ──> export_static
+
+Every stage consumes and produces typed artifacts (html, ndjson, sql, receipt),
+so output paths are passed along directly instead of being parsed from stdout.
+Independent branches run concurrently; local ingest and SQL conversion both
+update data/state/alias_map.json, and each merges the other's groups when it
+saves.
+
+A stage is skipped when the content hash of its inputs (input files, the
+stage's own code and the shared modules under src/utils and src/crawlers)
+matches its last successful run and its output files are unchanged since.
+Stages with a side effect are cached per target (local API URL, D1 database),
+so pointing the pipeline at another or a reset database runs them again. The cache lives in data/state/pipeline_cache.json;
+--force or --force-stage re-runs stages regardless. A per-stage timing report
+is printed at the end (and written as JSON with --report).
+
+Usage (from crawler/):
+  python src/processors/run_pipeline.py data/raw/savings_122624_012025.html [--skip-local] [--skip-d1] [--no-export]
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from crawlers import extractor_for
+from processors.ingest_deals import LOCAL_API_URL
+from utils.snapshot_state import STATE_DIR
+
+CRAWLER_DIR = Path(__file__).resolve().parent.parent.parent
+SRC_DIR = CRAWLER_DIR / "src"
+SQLS_DIR = CRAWLER_DIR / "data" / "sqls"
+CACHE_FILE = STATE_DIR / "pipeline_cache.json"
+# Imported by the stage scripts, so a change here invalidates every stage
+SHARED_SOURCE_DIRS = [SRC_DIR / "utils", SRC_DIR / "crawlers"]
+ARTIFACT_KINDS = {"html", "ndjson", "sql", "receipt"}
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """A typed stage input/output. Receipts have no file; they just mark a side effect as done."""
+    kind: str
+    path: Path | None = None
+
+    def __post_init__(self):
+        if self.kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {self.kind}")
+
+    def digest(self) -> str:
+        if self.path is None:
+            return self.kind
+        return file_hash(self.path)
+
+
+@dataclass
+class Stage:
+    name: str
+    needs: List[str]
+    consumes: List[str]
+    produces: str
+    run: Callable[[Dict[str, Artifact]], Artifact]
+    # Code whose change invalidates the cached result
+    sources: List[Path] = field(default_factory=list)
+    # Where a side effect lands (API URL, database); part of the cache key
+    target: str | None = None
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # ran, cached, failed, skipped
+    seconds: float = 0.0
+    artifact: Artifact | None = None
+    error: str | None = None
+
+
+class StageError(Exception):
+    pass
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+class PipelineCache:
+    """Input hash and outputs of the last successful run of each stage."""
+
+    def __init__(self, path: Path = CACHE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+
+    def lookup(self, key: str, input_hash: str) -> Artifact | None:
+        """The cached output artifact, if the inputs match and the output file is untouched."""
+        entry = self._entries.get(key)
+        if not entry or entry["input_hash"] != input_hash:
+            return None
+        path = Path(entry["path"]) if entry["path"] else None
+        if path is not None and (not path.exists() or file_hash(path) != entry["output_hash"]):
+            return None
+        return Artifact(entry["kind"], path)
+
+    def store(self, key: str, input_hash: str, artifact: Artifact) -> None:
+        with self._lock:
+            self._entries[key] = {
+                "input_hash": input_hash,
+                "kind": artifact.kind,
+                "path": str(artifact.path) if artifact.path else None,
+                "output_hash": artifact.digest() if artifact.path else None,
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+
+    def save(self) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def shared_sources() -> List[Path]:
+    return sorted(p for d in SHARED_SOURCE_DIRS for p in d.rglob("*.py") if "__pycache__" not in p.parts)
+
+
+def stage_targets() -> Dict[str, str]:
+    """Where the local ingest and the D1 import write, as configured for their scripts."""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(CRAWLER_DIR.parent / ".env")
+    except ImportError:
+        pass
+    d1 = f"d1:{os.getenv('CF_ACCOUNT_ID', '')}/{os.getenv('CF_D1_DB_ID', '')}"
+    return {"local": os.getenv("INGEST_API_URL", LOCAL_API_URL), "d1": d1}
+
+
+def run_command(stage: str, cmd: List[str]) -> None:
+    """Run a stage command; its output is printed in one block so concurrent stages don't interleave."""
+    proc = subprocess.run(cmd, cwd=CRAWLER_DIR, capture_output=True, text=True)
+    output = (proc.stdout + proc.stderr).rstrip()
+    if output:
+        print("\n".join(f"[{stage}] {line}" for line in output.splitlines()), flush=True)
+    if proc.returncode != 0:
+        raise StageError(f"{' '.join(cmd[:2])} exited with {proc.returncode}")
+
+
+def build_stages(html_file: Path, args) -> List[Stage]:
+    extractor = extractor_for(html_file.name)
+    python = sys.executable
+    targets = stage_targets()
+
+    def extract(inputs):
+        deals, output_file = extractor.extract_file(inputs["source"].path)
+        print(f"[extract] Wrote {len(deals)} deals to {output_file}", flush=True)
+        return Artifact("ndjson", output_file)
+
+    def ingest_local(inputs):
+        run_command("ingest_local", [python, "src/processors/ingest_deals.py",
+                                     "--file", str(inputs["extract"].path)])
+        return Artifact("receipt")
+
+    def convert_sql(inputs):
+        sql_file = SQLS_DIR / f"{inputs['extract'].path.stem}.sql"
+        run_command("convert_sql", [python, "src/processors/convert_deals_to_sql.py",
+                                    "--file", str(inputs["extract"].path), "--sql-out", str(sql_file)])
+        return Artifact("sql", sql_file)
+
+    def import_d1(inputs):
+        run_command("import_d1", ["node", "src/processors/ingest_to_d1.js", str(inputs["convert_sql"].path)])
+        return Artifact("receipt")
+
+    def export_static(inputs):
+        run_command("export_static", [python, "src/processors/export_static_json.py",
+                                      "--file", str(inputs["extract"].path), "--gzip"])
+        return Artifact("receipt")
+
+    processors = SRC_DIR / "processors"
+    stages = [
+        Stage("extract", [], ["html"], "ndjson", extract, [Path(extractor.__file__)]),
+        Stage("ingest_local", ["extract"], ["ndjson"], "receipt", ingest_local, [processors / "ingest_deals.py"],
+              targets["local"]),
+        Stage("convert_sql", ["extract"], ["ndjson"], "sql", convert_sql,
+              [processors / "convert_deals_to_sql.py", SRC_DIR / "utils" / "search_index.py"]),
+        Stage("import_d1", ["convert_sql"], ["sql"], "receipt", import_d1, [processors / "ingest_to_d1.js"],
+              targets["d1"]),
+        # After the D1 import so the CDN never serves deals the API doesn't have
+        Stage("export_static", ["extract", "import_d1"], ["ndjson", "receipt"], "receipt", export_static,
+              [processors / "export_static_json.py"], targets["d1"]),
+    ]
+    skipped = set()
+    if args.skip_local:
+        skipped.add("ingest_local")
+    if args.skip_d1:
+        skipped |= {"import_d1", "export_static"}
+    if args.no_export:
+        skipped.add("export_static")
+    return [s for s in stages if s.name not in skipped]
+
+
+def input_hash(stage: Stage, inputs: Dict[str, Artifact], shared: List[Path] | None = None) -> str:
+    h = hashlib.sha256(stage.name.encode())
+    for name in sorted(inputs):
+        h.update(f"{name}:{inputs[name].kind}:{inputs[name].digest()}".encode())
+    for source in stage.sources:
+        h.update(file_hash(source).encode())
+    for source in shared or []:
+        h.update(f"{source.relative_to(SRC_DIR)}:{file_hash(source)}".encode())
+    return h.hexdigest()[:16]
+
+
+def run_dag(stages: List[Stage], source: Artifact, cache: PipelineCache, cache_prefix: str,
+            force: set[str], max_workers: int = 4) -> List[StageResult]:
+    """Run stages as their dependencies finish; dependents of a failed stage are skipped."""
+    results: Dict[str, StageResult] = {}
+    artifacts: Dict[str, Artifact] = {"source": source}
+    shared = shared_sources()
+
+    def execute(stage: Stage) -> StageResult:
+        started = time.perf_counter()
+        inputs = {"source": source} if not stage.needs else {n: artifacts[n] for n in stage.needs}
+        kinds = sorted(a.kind for a in inputs.values())
+        if kinds != sorted(stage.consumes):
+            return StageResult(stage.name, "failed", error=f"expected {stage.consumes}, got {kinds}")
+        key = f"{cache_prefix}:{stage.name}" + (f"@{stage.target}" if stage.target else "")
+        digest = input_hash(stage, inputs, shared)
+        cached = None if stage.name in force else cache.lookup(key, digest)
+        if cached:
+            return StageResult(stage.name, "cached", time.perf_counter() - started, cached)
+        try:
+            artifact = stage.run(inputs)
+        except (Exception, SystemExit) as e:
+            return StageResult(stage.name, "failed", time.perf_counter() - started, error=str(e) or type(e).__name__)
+        if artifact.kind != stage.produces:
+            return StageResult(stage.name, "failed", error=f"produced {artifact.kind}, declared {stage.produces}")
+        cache.store(key, digest, artifact)
+        return StageResult(stage.name, "ran", time.perf_counter() - started, artifact)
+
+    pending = list(stages)
+    running: Dict[Future, Stage] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if any(results.get(n) and results[n].status in ("failed", "skipped") for n in stage.needs):
+                    results[stage.name] = StageResult(stage.name, "skipped", error="upstream stage failed")
+                    pending.remove(stage)
+                elif all(n in results for n in stage.needs):
+                    running[pool.submit(execute, stage)] = stage
+                    pending.remove(stage)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[running.pop(future).name] = result
+                if result.artifact:
+                    artifacts[result.name] = result.artifact
+    return [results[s.name] for s in stages]
+
+
+def print_report(results: List[StageResult], elapsed: float) -> None:
+    print("---")
+    print(f"{'stage':<15} {'status':<8} {'seconds':>8}  output")
+    for r in results:
+        output = r.error if r.error else (str(r.artifact.path) if r.artifact and r.artifact.path else "")
+        print(f"{r.name:<15} {r.status:<8} {r.seconds:>8.2f}  {output}")
+    serial = sum(r.seconds for r in results)
+    print(f"Total {elapsed:.2f}s wall ({serial:.2f}s summed over stages)")
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Run extract → ingest/convert → D1 import → export with caching')
+    parser.add_argument('html_file', help='Raw snapshot (.html, .html.gz or .html.zst)')
+    parser.add_argument('--skip-local', action='store_true', help='Do not ingest to the local dev server')
+    parser.add_argument('--skip-d1', action='store_true', help='Do not import to D1 (also skips the static export)')
+    parser.add_argument('--no-export', action='store_true', help='Do not regenerate the static JSON exports')
+    parser.add_argument('--force', action='store_true', help='Re-run every stage even if its inputs are unchanged')
+    parser.add_argument('--force-stage', action='append', default=[], help='Re-run this stage (repeatable)')
+    parser.add_argument('--cache-file', default=str(CACHE_FILE), help=f'Stage cache (default: {CACHE_FILE})')
+    parser.add_argument('--report', help='Also write the timing report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    html_file = Path(args.html_file).expanduser().resolve()
+    if not html_file.exists():
+        print(f"Error: File '{args.html_file}' not found")
+        sys.exit(1)
+
+    stages = build_stages(html_file, args)
+    force = {s.name for s in stages} if args.force else set(args.force_stage)
+    cache = PipelineCache(args.cache_file)
+    started = time.perf_counter()
+    results = run_dag(stages, Artifact("html", html_file), cache, html_file.name, force)
+    elapsed = time.perf_counter() - started
+    cache.save()
+
+    print_report(results, elapsed)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({
+                "html_file": str(html_file),
+                "wall_s": round(elapsed, 3),
+                "stages": [
+                    {"name": r.name, "status": r.status, "seconds": round(r.seconds, 3),
+                     "output": str(r.artifact.path) if r.artifact and r.artifact.path else None, "error": r.error}
+                    for r in results
+                ],
+            }, f, indent=2)
+    if any(r.status in ("failed", "skipped") for r in results):
+        print("Pipeline failed.")
+        sys.exit(1)
+    print("Pipeline completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
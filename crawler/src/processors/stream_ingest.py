@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+stream_ingest.py
+----------------
+Extract a raw snapshot and ingest it through the API as a stream: deals are
+yielded tile by tile, validated/transformed as they arrive and POSTed in
+batches by several concurrent uploaders, instead of extract-all → read-all →
+one big POST.
+
+  parse (thread) ──deals──> transform ──batches──> N uploaders
+              bounded queue           bounded queue
+
+Both queues are bounded, so a slow API applies back-pressure all the way to the
+parser. Memory holds roughly (queue sizes × batch size) deals, plus the merge
+fields of each distinct offer already sent (SKUs, image URL, details, channel;
+see utils/dedupe.py). The document itself is still parsed by lxml in one call;
+streaming starts at the tile level, where most of the extraction time goes.
+
+The processed NDJSON is written as deals stream past, to the same file the
+extractor writes. Snapshots are change-detected and deals are sent under their
+canonical SKU (data/state/alias_map.json), like ingest_deals.py. A tile
+repeating an offer is merged into the first copy (utils/dedupe.py). If that
+copy's batch already went out, the repeat is merged with its kept fields and
+sent again, and the API upserts it.
+
+Usage:
+  python stream_ingest.py data/raw/savings_122624_012025.html [--d1] [--batch-size 50] [--concurrency 4] [--compare]
+
+--compare also runs the sequential path (extract everything, then one POST) with
+the same seen_at and reports time-to-first-ingested-deal and wall time for both.
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from crawlers import extractor_for
+from processors.ingest_deals import (
+    IngestError, build_headers, get_api_url, post_deals, transform_deal, validate_deal,
+)
+from utils.aliases import ALIAS_STATE, AliasMap
+from utils.dedupe import MERGE_FIELDS, dedupe_deals, dedupe_key, merge_deal
+from utils.html_io import read_html, snapshot_stem
+from utils.ndjson_index import NdjsonWriter
+from utils.snapshot_state import DEFAULT_HEARTBEAT_HOURS, STATE_DIR, SnapshotState
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CONCURRENCY = 4
+DEFAULT_QUEUE_SIZE = 200
+_DONE = object()
+
+
+def parse_snapshot(html_file: Path):
+    """(extractor, soup, valid_period) for a raw snapshot."""
+    extractor = extractor_for(html_file.name)
+    soup = BeautifulSoup(read_html(html_file, errors="replace"), "lxml")
+    return extractor, soup, extractor.extract_valid_period(soup)
+
+
+async def stream_ingest(html_file: Path, api_url: str, headers: Dict[str, str], seen_at: str,
+                        snapshot_state: SnapshotState | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                        concurrency: int = DEFAULT_CONCURRENCY, queue_size: int = DEFAULT_QUEUE_SIZE,
+                        alias_map: AliasMap | None = None, keep_duplicates: bool = False) -> Dict[str, Any]:
+    import requests  # only needed once there is something to POST
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    metrics: Dict[str, Any] = {"deals": 0, "valid": 0, "duplicates": 0, "ingested": 0, "batches": 0, "errors": [],
+                               "first_deal_s": None, "first_ingested_s": None}
+    deals_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    batches_q: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    stop = threading.Event()
+
+    def produce():
+        """Runs on a worker thread; blocks while the deals queue is full."""
+        try:
+            extractor, soup, valid_period = parse_snapshot(html_file)
+            metrics["parse_s"] = round(time.perf_counter() - started, 3)
+            metrics["ndjson"] = str(extractor.output_file_for(snapshot_stem(html_file), valid_period))
+            for deal in extractor.iter_deals(soup, valid_period, seen_at):
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(deals_q.put(deal), loop).result()
+        finally:
+            asyncio.run_coroutine_threadsafe(deals_q.put(_DONE), loop).result()
+
+    async def transform():
+        # offer key -> transformed deal; a repeated offer replaces its entry instead of adding one
+        batch: Dict[Any, Dict[str, Any]] = {}
+        # offer key -> deal, for the offers in `batch`
+        offers: Dict[Any, Dict[str, Any]] = {}
+        # offer key -> merge fields, for offers whose batch went out
+        sent: Dict[Any, Dict[str, Any]] = {}
+        ndjson = None
+        deal = None
+        try:
+            while (deal := await deals_q.get()) is not _DONE:
+                if metrics["first_deal_s"] is None:
+                    metrics["first_deal_s"] = round(time.perf_counter() - started, 3)
+                    ndjson_file = Path(metrics["ndjson"])
+                    ndjson_file.parent.mkdir(parents=True, exist_ok=True)
+                    ndjson = NdjsonWriter(ndjson_file)
+                metrics["deals"] += 1
+                ndjson.write(deal)
+                if not validate_deal(deal)[0]:
+                    continue
+                metrics["valid"] += 1
+                if alias_map is not None:
+                    alias_map.canonicalize([deal])
+                key = metrics["valid"] if keep_duplicates else dedupe_key(deal, alias_map)
+                if key in offers:
+                    merge_deal(offers[key], deal)
+                    deal = offers[key]
+                    metrics["duplicates"] += 1
+                else:
+                    if key in sent:
+                        kept = {**deal, **sent[key]}
+                        merge_deal(kept, deal)
+                        deal = kept
+                        metrics["duplicates"] += 1
+                    offers[key] = deal
+                transformed = transform_deal(deal)
+                if snapshot_state and not snapshot_state.should_emit(deal):
+                    transformed["snapshot"] = None
+                batch[key] = transformed
+                if len(batch) >= batch_size:
+                    await batches_q.put(list(batch.values()))
+                    if not keep_duplicates:
+                        sent.update((k, {f: d[f] for f in MERGE_FIELDS if f in d}) for k, d in offers.items())
+                    batch, offers = {}, {}
+            if batch:
+                await batches_q.put(list(batch.values()))
+        finally:
+            if ndjson:
+                ndjson.close()
+            if deal is not _DONE:
+                # Stopped early: let the producer see stop and unblock its pending put
+                stop.set()
+                while await deals_q.get() is not _DONE:
+                    pass
+            for _ in range(concurrency):
+                await batches_q.put(_DONE)
+
+    async def upload(session: requests.Session):
+        while (batch := await batches_q.get()) is not _DONE:
+            if metrics["errors"]:
+                continue  # keep draining so the pipeline can shut down
+            try:
+                await asyncio.to_thread(post_deals, batch, api_url, headers, session)
+            except (IngestError, requests.exceptions.RequestException, ValueError) as e:
+                metrics["errors"].append(str(e))
+                stop.set()
+                continue
+            metrics["batches"] += 1
+            metrics["ingested"] += len(batch)
+            if metrics["first_ingested_s"] is None:
+                metrics["first_ingested_s"] = round(time.perf_counter() - started, 3)
+
+    with requests.Session() as session:
+        await asyncio.gather(
+            asyncio.to_thread(produce),
+            transform(),
+            *(upload(session) for _ in range(concurrency)),
+        )
+    metrics["wall_s"] = round(time.perf_counter() - started, 3)
+    return metrics
+
+
+def sequential_ingest(html_file: Path, api_url: str, headers: Dict[str, str], seen_at: str,
+                      alias_map: AliasMap | None = None, keep_duplicates: bool = False) -> Dict[str, Any]:
+    """The extract → validate → single POST path, timed the same way."""
+    started = time.perf_counter()
+    extractor, soup, valid_period = parse_snapshot(html_file)
+    deals = list(extractor.iter_deals(soup, valid_period, seen_at))
+    extractor.write_deals(deals, extractor.output_file_for(snapshot_stem(html_file), valid_period))
+    valid = [d for d in deals if validate_deal(d)[0]]
+    if not keep_duplicates:
+        valid, _ = dedupe_deals(valid, alias_map)
+    if alias_map is not None:
+        alias_map.canonicalize(valid)
+    valid = [transform_deal(d) for d in valid]
+    post_deals(valid, api_url, headers)
+    wall = round(time.perf_counter() - started, 3)
+    return {"deals": len(deals), "valid": len(valid), "ingested": len(valid), "batches": 1,
+            "first_ingested_s": wall, "wall_s": wall, "errors": []}
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Extract a raw snapshot and ingest it as a stream of batches')
+    parser.add_argument('html_file', help='Raw snapshot (.html, .html.gz or .html.zst)')
+    parser.add_argument('--d1', action='store_true', help='Use D1 database instead of local')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Deals per ingest request (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Ingest requests in flight at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'Deals buffered between parsing and upload (default: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--heartbeat-hours', type=float, default=DEFAULT_HEARTBEAT_HOURS,
+                        help=f'Send an unchanged snapshot again after this many hours, 0 = never (default: {DEFAULT_HEARTBEAT_HOURS:g})')
+    parser.add_argument('--all-snapshots', action='store_true', help='Send a snapshot with every deal (no change detection)')
+    parser.add_argument('--alias-file', default=str(ALIAS_STATE),
+                        help='Alternate SKU -> canonical SKU map, updated with the SKU groups of this snapshot')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Do not merge tiles repeating the same offer')
+    parser.add_argument('--compare', action='store_true',
+                        help='Also run the sequential path and compare (implies --all-snapshots)')
+    args = parser.parse_args(argv)
+
+    html_file = Path(args.html_file).expanduser()
+    if not html_file.exists():
+        print(f"Error: File '{args.html_file}' not found")
+        sys.exit(1)
+
+    api_url = get_api_url(args.d1)
+    headers = build_headers(args.d1)
+    # One seen_at for the run, so --compare's two passes upsert the same snapshots
+    seen_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    snapshot_state = None
+    if not (args.all_snapshots or args.compare):
+        snapshot_state = SnapshotState(STATE_DIR / f"snapshot_state_{'d1' if args.d1 else 'local'}.json",
+                                       args.heartbeat_hours)
+    alias_map = AliasMap.load(args.alias_file)
+
+    runs = {}
+    if args.compare:
+        import requests
+        try:
+            runs["sequential"] = sequential_ingest(html_file, api_url, headers, seen_at, alias_map,
+                                                   args.keep_duplicates)
+        except (IngestError, requests.exceptions.RequestException) as e:
+            print(f"Sequential ingest failed: {e}")
+            sys.exit(1)
+    runs["streaming"] = asyncio.run(stream_ingest(
+        html_file, api_url, headers, seen_at, snapshot_state,
+        args.batch_size, args.concurrency, args.queue_size, alias_map, args.keep_duplicates,
+    ))
+
+    streaming = runs["streaming"]
+    if streaming["errors"]:
+        print(streaming["errors"][0])
+        print(f"Streaming ingest failed after {streaming['ingested']} deals")
+        sys.exit(1)
+    alias_map.save()
+    if snapshot_state:
+        snapshot_state.save()
+        print(f"Snapshots: {snapshot_state.emitted} sent, {snapshot_state.suppressed} unchanged skipped")
+
+    print(f"Wrote {streaming['deals']} deals to {streaming['ndjson']}")
+    print(f"{'path':<11} {'deals':>6} {'ingested':>9} {'requests':>9} {'first ingested s':>17} {'wall s':>8}")
+    for name, m in runs.items():
+        print(f"{name:<11} {m['deals']:>6} {m['ingested']:>9} {m['batches']:>9} "
+              f"{m['first_ingested_s'] or 0:>17.3f} {m['wall_s']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+watch_raw.py
+------------
+Long-running worker that processes raw snapshots as they land in data/raw/.
+
+Each new snapshot (.html, .html.gz, .html.zst) goes through extraction, SKU
+fill, SQL conversion and (with --ingest) API ingest in this process, so the
+parsers, the SKU reference index, the snapshot/search-index state and the HTTP
+session stay warm between files instead of being rebuilt by a cold
+run_pipeline.sh per file.
+
+The directory is watched with watchdog (inotify on Linux) when it is installed,
+otherwise polled. A file is only picked up once its size and mtime have not
+changed for --settle-seconds, so snapshots still being copied or written are
+not read half-way. Processed files are remembered in data/state/watcher_state.json;
+on the first start, files already in data/raw/ are marked as seen unless
+--backfill is given.
+
+A small HTTP endpoint reports queue depth and per-file latency:
+  GET /status    JSON (queue, current file, counters, recent files with stage timings)
+  GET /metrics   the same counters as plain text
+
+With --watchlist, each batch is also matched against the saved keywords and
+SKUs of a watchlist (compiled once at start, see utils/watchlist.py) and the
+matches are written to data/alerts/.
+
+Usage:
+  python watch_raw.py [--raw-dir data/raw] [--ingest [--d1]] [--status-port 8799] [--backfill] [--watchlist FILE]
+"""
+import argparse
+import collections
+import datetime as dt
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from crawlers import extractor_for
+from processors import convert_deals_to_sql
+from processors.fill_missing_skus import PROCESSED_DIR, SkuReference
+from processors.ingest_deals import build_headers, get_api_url, post_deals, transform_deal, validate_deal
+from utils.dedupe import dedupe_deals
+from utils.html_io import SNAPSHOT_SUFFIXES
+from utils.ndjson_index import write_ndjson
+from utils.search_index import SearchIndexState
+from utils.snapshot_state import DEFAULT_HEARTBEAT_HOURS, STATE_DIR, SnapshotState
+from utils.watchlist import Watchlist, alerts_file, write_alerts
+
+RAW_DIR = Path(__file__).parent.parent.parent / "data" / "raw"
+SQLS_DIR = Path(__file__).parent.parent.parent / "data" / "sqls"
+WATCHER_STATE = STATE_DIR / "watcher_state.json"
+DEFAULT_SETTLE_S = 2.0
+DEFAULT_STATUS_PORT = 8799
+INGEST_BATCH_SIZE = 100
+RECENT_FILES = 50
+
+
+def is_snapshot(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(SNAPSHOT_SUFFIXES) and not path.name.startswith(".")
+
+
+class SettleTracker:
+    """Reports files whose size and mtime have been stable for `settle_s` seconds.
+
+    scan() runs on the watcher thread; settling() may be called from any thread.
+    """
+
+    def __init__(self, raw_dir: Path, settle_s: float, done: Dict[str, dict]):
+        self.raw_dir = raw_dir
+        self.settle_s = settle_s
+        self.done = done
+        self.pending: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def settling(self) -> List[str]:
+        with self._lock:
+            return sorted(self.pending)
+
+    def scan(self) -> List[Path]:
+        now = time.time()
+        ready = []
+        for path in sorted(self.raw_dir.iterdir()):
+            if not is_snapshot(path):
+                continue
+            stat = path.stat()
+            signature = (stat.st_size, stat.st_mtime)
+            seen = self.done.get(path.name)
+            if seen and (seen["size"], seen["mtime"]) == signature:
+                continue
+            with self._lock:
+                if self.pending.get(path.name, (None,))[0] != signature:
+                    self.pending[path.name] = (signature, now)
+                    continue
+                if now - self.pending[path.name][1] >= self.settle_s:
+                    del self.pending[path.name]
+                    ready.append(path)
+        return ready
+
+
+class Processor:
+    """Extract → fill SKUs → SQL → ingest, with all state kept warm across files."""
+
+    def __init__(self, args):
+        self.args = args
+        started = time.perf_counter()
+        self.sku_reference = SkuReference.load(PROCESSED_DIR)
+        print(f"Loaded {len(self.sku_reference.deals)} reference deals in {time.perf_counter() - started:.1f}s")
+        self.sql_state = None if args.all_snapshots else SnapshotState(STATE_DIR / "snapshot_state_sql.json",
+                                                                       args.heartbeat_hours)
+        self.search_index = SearchIndexState()
+        self.alias_map = self.sku_reference.aliases
+        self.watchlist = Watchlist.load(args.watchlist) if args.watchlist else None
+        self.session = self.api_url = self.headers = self.ingest_state = None
+        if args.ingest:
+            self.session = requests.Session()
+            self.api_url, self.headers = get_api_url(args.d1), build_headers(args.d1)
+            if not args.all_snapshots:
+                target = 'd1' if args.d1 else 'local'
+                self.ingest_state = SnapshotState(STATE_DIR / f"snapshot_state_{target}.json", args.heartbeat_hours)
+
+    def process(self, path: Path) -> Dict[str, Any]:
+        timings = {}
+
+        started = time.perf_counter()
+        deals, ndjson_file = extractor_for(path.name).extract_file(path)
+        timings["extract_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        filled = self.sku_reference.fill(deals, ndjson_file.name)
+        if filled:
+            filled_file = ndjson_file.with_name(ndjson_file.stem + "_sku_filled.ndjson")
+            write_ndjson(deals, filled_file, ensure_ascii=False)
+        self.sku_reference.add(deals)
+        timings["fill_skus_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        available, unavailable = convert_deals_to_sql.split_deals(deals)
+        sql_file = Path(self.args.sql_dir) / f"{ndjson_file.stem}.sql"
+        sql_file.parent.mkdir(parents=True, exist_ok=True)
+        sql_file.write_text(convert_deals_to_sql.build_sql(available, self.sql_state, self.search_index, self.alias_map),
+                            "utf-8")
+        if self.sql_state:
+            self.sql_state.save()
+        self.search_index.save()
+        self.alias_map.save()
+        timings["convert_s"] = time.perf_counter() - started
+
+        result = {"deals": len(deals), "available": len(available), "skus_filled": filled, "sql": str(sql_file)}
+        # The same merged, canonical deals build_sql converted
+        merged, _ = dedupe_deals(available, self.alias_map)
+        self.alias_map.canonicalize(merged)
+        if self.watchlist:
+            started = time.perf_counter()
+            result["watch_matches"] = write_alerts(self.watchlist, self.watchlist.match(merged),
+                                                   alerts_file(ndjson_file))
+            timings["watchlist_s"] = time.perf_counter() - started
+        if self.args.ingest:
+            started = time.perf_counter()
+            to_ingest = [d for d in merged if validate_deal(d)[0]]
+            transformed = [transform_deal(d) for d in to_ingest]
+            if self.ingest_state:
+                for deal, row in zip(to_ingest, transformed):
+                    if not self.ingest_state.should_emit(deal):
+                        row["snapshot"] = None
+            try:
+                for i in range(0, len(transformed), INGEST_BATCH_SIZE):
+                    post_deals(transformed[i:i + INGEST_BATCH_SIZE], self.api_url, self.headers, self.session)
+            except Exception:
+                if self.ingest_state:
+                    # Drop the staged snapshots so they are sent again with the next file
+                    self.ingest_state = SnapshotState(self.ingest_state.path, self.args.heartbeat_hours)
+                raise
+            if self.ingest_state:
+                self.ingest_state.save()
+            result["ingested"] = len(transformed)
+            timings["ingest_s"] = time.perf_counter() - started
+
+        result["timings"] = {k: round(v, 3) for k, v in timings.items()}
+        return result
+
+
+class Watcher:
+    def __init__(self, args):
+        self.args = args
+        self.raw_dir = Path(args.raw_dir)
+        self.queue: "queue.Queue[tuple[Path, float]]" = queue.Queue()
+        self.stop = threading.Event()
+        self.wake = threading.Event()
+        self.started_at = time.time()
+        self.current: str | None = None
+        self.counters = {"processed": 0, "failed": 0, "deals": 0}
+        self.recent = collections.deque(maxlen=RECENT_FILES)
+        self.mode = "polling"
+        self._lock = threading.Lock()
+        self.done = self._load_done()
+        self.tracker = SettleTracker(self.raw_dir, args.settle_seconds, self.done)
+        self._queued: set[str] = set()
+
+    def _load_done(self) -> Dict[str, dict]:
+        if WATCHER_STATE.exists():
+            with open(WATCHER_STATE, "r") as f:
+                return json.load(f)
+        done = {}
+        if not self.args.backfill:
+            # First start: what is already there has been handled by run_pipeline.sh
+            for path in self.raw_dir.iterdir():
+                if is_snapshot(path):
+                    stat = path.stat()
+                    done[path.name] = {"size": stat.st_size, "mtime": stat.st_mtime, "status": "existing"}
+        self._save_done(done)
+        return done
+
+    def _save_done(self, done: Dict[str, dict]) -> None:
+        WATCHER_STATE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = WATCHER_STATE.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(done, f, indent=1)
+        os.replace(tmp, WATCHER_STATE)
+
+    def start_observer(self):
+        """Wake the scanner on filesystem events; falls back to polling without watchdog."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            print("watchdog is not installed, polling every "
+                  f"{self.args.poll_seconds:g}s (pip install watchdog for inotify)")
+            return None
+
+        wake = self.wake
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.raw_dir), recursive=False)
+        observer.start()
+        self.mode = "events"
+        return observer
+
+    def scan_loop(self):
+        while not self.stop.is_set():
+            for path in self.tracker.scan():
+                if path.name not in self._queued:
+                    self._queued.add(path.name)
+                    self.queue.put((path, time.time()))
+            # Rescan soon while files are settling, otherwise wait for an event (or the poll interval)
+            timeout = self.args.settle_seconds / 2 if self.tracker.pending else self.args.poll_seconds
+            if self.wake.wait(timeout):
+                self.wake.clear()
+
+    def work_loop(self, processor: Processor):
+        while not self.stop.is_set():
+            try:
+                path, detected_at = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.current = path.name
+            record = {"file": path.name, "detected_at": dt.datetime.fromtimestamp(detected_at).isoformat(timespec="seconds")}
+            stat = None
+            try:
+                stat = path.stat()
+                record.update(processor.process(path))
+                record["status"] = "ok"
+                self.counters["processed"] += 1
+                self.counters["deals"] += record["deals"]
+                print(f"[OK] {path.name}: {record['deals']} deals, {record['skus_filled']} SKUs filled, "
+                      f"{record['timings']} -> {record['sql']}")
+            except Exception as e:
+                record.update({"status": "failed", "error": str(e)})
+                self.counters["failed"] += 1
+                print(f"[FAILED] {path.name}: {e}")
+            record["latency_s"] = round(time.time() - detected_at, 3)
+            with self._lock:
+                self.recent.append(record)
+                if stat:
+                    # Failed files are not retried until they change
+                    self.done[path.name] = {"size": stat.st_size, "mtime": stat.st_mtime, "status": record["status"],
+                                            "finished_at": dt.datetime.now().isoformat(timespec="seconds")}
+                    self._save_done(self.done)
+            self._queued.discard(path.name)
+            self.current = None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self.recent)
+        latencies = sorted(r["latency_s"] for r in recent)
+        return {
+            "mode": self.mode,
+            "raw_dir": str(self.raw_dir),
+            "uptime_s": round(time.time() - self.started_at),
+            "queue_depth": self.queue.qsize(),
+            "current": self.current,
+            "settling": self.tracker.settling(),
+            **self.counters,
+            "latency_s": {
+                "last": latencies and recent[-1]["latency_s"],
+                "median": latencies and latencies[len(latencies) // 2],
+                "max": latencies and latencies[-1],
+            },
+            "recent": recent[::-1],
+        }
+
+
+def serve_status(watcher: Watcher, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = watcher.status()
+            if self.path.rstrip("/") in ("", "/status"):
+                body, content_type = json.dumps(status, indent=2).encode(), "application/json"
+            elif self.path == "/metrics":
+                lines = [f"watcher_{k} {status[k]}" for k in ("queue_depth", "processed", "failed", "deals", "uptime_s")]
+                lines += [f'watcher_latency_seconds{{stat="{k}"}} {v or 0}' for k, v in status["latency_s"].items()]
+                body, content_type = ("\n".join(lines) + "\n").encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="status", daemon=True).start()
+    return server
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Watch data/raw and process new snapshots as they land')
+    parser.add_argument('--raw-dir', default=str(RAW_DIR), help=f'Directory to watch (default: {RAW_DIR})')
+    parser.add_argument('--sql-dir', default=str(SQLS_DIR), help=f'Where to write the SQL files (default: {SQLS_DIR})')
+    parser.add_argument('--ingest', action='store_true', help='Also ingest the deals through the API')
+    parser.add_argument('--d1', action='store_true', help='With --ingest: use the D1 API instead of the local one')
+    parser.add_argument('--heartbeat-hours', type=float, default=DEFAULT_HEARTBEAT_HOURS,
+                        help=f'Emit an unchanged snapshot again after this many hours, 0 = never (default: {DEFAULT_HEARTBEAT_HOURS:g})')
+    parser.add_argument('--all-snapshots', action='store_true', help='Emit a snapshot for every deal (no change detection)')
+    parser.add_argument('--settle-seconds', type=float, default=DEFAULT_SETTLE_S,
+                        help=f'A file must be unchanged this long before it is processed (default: {DEFAULT_SETTLE_S:g})')
+    parser.add_argument('--poll-seconds', type=float, default=5.0, help='Scan interval without filesystem events (default: 5)')
+    parser.add_argument('--status-port', type=int, default=DEFAULT_STATUS_PORT,
+                        help=f'Port of the status endpoint on 127.0.0.1, 0 = off (default: {DEFAULT_STATUS_PORT})')
+    parser.add_argument('--watchlist', help='Match every new batch against this watchlist (writes data/alerts/)')
+    parser.add_argument('--backfill', action='store_true',
+                        help='On the first start, also process the snapshots already in the directory')
+    args = parser.parse_args(argv)
+
+    if not Path(args.raw_dir).is_dir():
+        print(f"Error: '{args.raw_dir}' is not a directory")
+        sys.exit(1)
+
+    watcher = Watcher(args)
+    processor = Processor(args)
+    observer = watcher.start_observer()
+    server = serve_status(watcher, args.status_port) if args.status_port else None
+
+    def shutdown(*_):
+        watcher.stop.set()
+        watcher.wake.set()
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    scanner = threading.Thread(target=watcher.scan_loop, name="scanner", daemon=True)
+    scanner.start()
+    status_url = f", status on http://127.0.0.1:{args.status_port}/status" if server else ""
+    print(f"Watching {args.raw_dir} ({watcher.mode}){status_url}")
+    watcher.work_loop(processor)
+
+    scanner.join(timeout=5)
+    if observer:
+        observer.stop()
+        observer.join()
+    if server:
+        server.shutdown()
+    print(f"Stopped after processing {watcher.counters['processed']} files ({watcher.counters['failed']} failed)")
+
+
+if __name__ == "__main__":
+    main()
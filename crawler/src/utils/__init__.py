@@ -0,0 +1,3 @@
+"""
+Shared utilities for the Costco Deals Finder crawler and processors.
+"""
@@ -0,0 +1,144 @@
+"""
+Alternate SKUs of the same product.
+
+A tile can list several item numbers ("Item 1720981, 1720886"); the extractors
+keep the first as `sku` and the rest as `alt_skus`. AliasMap groups every SKU
+seen together into one canonical SKU (union-find, so groups that share a SKU
+merge, and a group keeps its canonical SKU as new SKUs join it), which the
+converter and ingest use for the product row and the `alias` table, and
+fill_missing_skus uses to resolve matches. The map is kept in
+data/state/alias_map.json as alt SKU -> canonical SKU; `save()` merges in what
+other processes saved meanwhile, under a lock on alias_map.json.lock.
+"""
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized between processes
+    fcntl = None
+
+from utils.snapshot_state import STATE_DIR
+
+ALIAS_STATE = STATE_DIR / "alias_map.json"
+SKU_RE = re.compile(r"\d{4,}")
+
+
+def parse_item_skus(items_text: str) -> List[str]:
+    """All item numbers of an 'Item 1720981, 1720886' list, in order and without duplicates."""
+    return list(dict.fromkeys(SKU_RE.findall(items_text or "")))
+
+
+class AliasMap:
+    """Canonical SKU for every SKU that was listed together with another one."""
+
+    def __init__(self, aliases: Dict[str, str] | None = None, path: Path = ALIAS_STATE):
+        self.path = Path(path)
+        self._parent: Dict[str, str] = dict(aliases or {})
+        # SKUs that have had other SKUs grouped under them (the roots among them are established groups)
+        self._grouped = set(self._parent.values())
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, str]:
+        if not Path(path).exists():
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, path: Path = ALIAS_STATE) -> "AliasMap":
+        return cls(cls._read(path), path)
+
+    def canonical(self, sku: str | None) -> str | None:
+        if sku is None:
+            return None
+        with self._lock:
+            root = sku
+            while root in self._parent:
+                root = self._parent[root]
+            # Path compression keeps later lookups O(1)
+            while sku != root:
+                self._parent[sku], sku = root, self._parent[sku]
+            return root
+
+    def add(self, skus: Iterable[str | None]) -> str | None:
+        """
+        Group SKUs and return the group's canonical SKU. An existing group keeps
+        its canonical SKU (and with it the product row and history); the first
+        SKU only becomes canonical when none of the SKUs was grouped before.
+        """
+        skus = [s for s in skus if s]
+        if not skus:
+            return None
+        with self._lock:
+            roots = list(dict.fromkeys(self.canonical(sku) for sku in skus))
+            canonical = next((root for root in roots if root in self._grouped), roots[0])
+            for root in roots:
+                if root != canonical:
+                    self._parent[root] = canonical
+                    self._grouped.add(canonical)
+            return canonical
+
+    def add_deal(self, deal: Dict[str, Any]) -> str | None:
+        return self.add([deal.get("sku"), *deal.get("alt_skus", [])])
+
+    def canonicalize(self, deals: List[Dict[str, Any]]) -> List[tuple]:
+        """
+        Register every deal's SKUs, point each deal at its canonical SKU (the
+        listed SKU moves to alt_skus) and return the (canonical, alt) pairs of
+        the groups these deals belong to.
+        """
+        for deal in deals:
+            self.add_deal(deal)
+        touched = set()
+        for deal in deals:
+            canonical = self.canonical(deal.get("sku"))
+            if canonical and canonical != deal["sku"]:
+                deal["alt_skus"] = [deal["sku"], *(s for s in deal.get("alt_skus", []) if s != canonical)]
+                deal["sku"] = canonical
+            if canonical:
+                touched.add(canonical)
+        return sorted((canonical, alt) for alt, canonical in self.aliases().items() if canonical in touched)
+
+    def aliases(self) -> Dict[str, str]:
+        with self._lock:
+            return {alt: self.canonical(alt) for alt in list(self._parent)}
+
+    def save(self) -> None:
+        """
+        Write the map, first merging in the groups saved since it was loaded (by
+        ingest_deals.py, convert_deals_to_sql.py, … running at the same time).
+        """
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_suffix(self.path.suffix + ".lock"), "w") as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                for alt, canonical in self._read(self.path).items():
+                    self.add([canonical, alt])
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                with open(tmp, "w") as f:
+                    json.dump(self.aliases(), f, separators=(",", ":"), sort_keys=True)
+                os.replace(tmp, self.path)
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def make_alias_sql(pairs: List[tuple]) -> str:
+    """Upsert `alias` rows pointing each alternate SKU at its canonical product."""
+    if not pairs:
+        return ""
+    values = ", ".join(
+        f"((SELECT id FROM product WHERE sku = {_quote(canonical)}), {_quote(alt)})" for canonical, alt in pairs
+    )
+    return (
+        f"INSERT INTO alias (product_id, alt_sku) VALUES {values} "
+        f"ON CONFLICT(alt_sku) DO UPDATE SET product_id = excluded.product_id;"
+    )
@@ -0,0 +1,259 @@
+"""
+Columnar archive of every processed deal, for history queries without decoding
+hundreds of NDJSON files.
+
+Each column is a NumPy array saved as its own .npy file in data/archive/
+(memory-mapped on load); text columns hold int32 codes into append-only string
+dictionaries (dictionaries.json), dates are datetime64. manifest.json records
+which NDJSON file each row came from, so a rebuild only decodes new or changed
+files and drops the rows of changed or deleted ones.
+
+    archive = DealArchive.load()
+    archive.sku_history("1720981")
+    archive.active_on("2025-01-02")
+    archive.category_monthly_avg(start="2024-01-01")
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+ARCHIVE_DIR = Path(__file__).parent.parent.parent / "data" / "archive"
+PROCESSED_DIR = Path(__file__).parent.parent.parent / "data" / "processed"
+
+# Dictionary-encoded text columns and the deal field each one comes from
+TEXT_COLUMNS = {
+    "sku": "sku",
+    "name": "name",
+    "category": "category",
+    "sale_type": "discount_type",
+    "channel": "channel",
+    "region": "region",
+}
+COLUMN_DTYPES = {
+    **{col: np.int32 for col in TEXT_COLUMNS},
+    "discount": np.float32,
+    "starts": "datetime64[D]",
+    "ends": "datetime64[D]",
+    "seen_at": "datetime64[s]",
+    "file_id": np.int32,
+}
+MISSING = -1
+
+
+def archive_files(processed_dir: Path = PROCESSED_DIR) -> List[Path]:
+    """Deals NDJSON files to archive; a <name>_sku_filled.ndjson replaces <name>.ndjson."""
+    files = {p.name: p for p in processed_dir.glob("*.ndjson") if not p.name.startswith("unavailable_")}
+    for name in list(files):
+        if name.endswith("_sku_filled.ndjson"):
+            files.pop(name.replace("_sku_filled.ndjson", ".ndjson"), None)
+    return [files[name] for name in sorted(files)]
+
+
+def _to_date(value: str | None) -> np.datetime64:
+    try:
+        return np.datetime64(value[:10], "D") if value else np.datetime64("NaT", "D")
+    except ValueError:
+        return np.datetime64("NaT", "D")
+
+
+def _to_seconds(value: str | None) -> np.datetime64:
+    try:
+        return np.datetime64(value.rstrip("Z")[:19], "s") if value else np.datetime64("NaT", "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+
+class DealArchive:
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, List[str]],
+                 manifest: Dict[str, dict]):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.manifest = manifest
+        self._codes = {col: {value: i for i, value in enumerate(values)} for col, values in dictionaries.items()}
+
+    def __len__(self) -> int:
+        return len(self.columns["discount"])
+
+    @classmethod
+    def empty(cls) -> "DealArchive":
+        return cls({col: np.array([], dtype=dtype) for col, dtype in COLUMN_DTYPES.items()},
+                   {col: [] for col in TEXT_COLUMNS}, {})
+
+    @classmethod
+    def load(cls, archive_dir: Path = ARCHIVE_DIR, mmap: bool = True) -> "DealArchive":
+        archive_dir = Path(archive_dir)
+        if not (archive_dir / "manifest.json").exists():
+            return cls.empty()
+        columns = {col: np.load(archive_dir / f"{col}.npy", mmap_mode="r" if mmap else None)
+                   for col in COLUMN_DTYPES}
+        with open(archive_dir / "dictionaries.json", "r") as f:
+            dictionaries = json.load(f)
+        with open(archive_dir / "manifest.json", "r") as f:
+            manifest = json.load(f)
+        return cls(columns, dictionaries, manifest)
+
+    def save(self, archive_dir: Path = ARCHIVE_DIR) -> None:
+        archive_dir = Path(archive_dir)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        for col, values in self.columns.items():
+            tmp = archive_dir / f"{col}.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(values))
+            os.replace(tmp, archive_dir / f"{col}.npy")
+        for name, data in (("dictionaries", self.dictionaries), ("manifest", self.manifest)):
+            tmp = archive_dir / f"{name}.json.tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, archive_dir / f"{name}.json")
+
+    # --- building ---
+
+    def _encode(self, col: str, value: Any) -> int:
+        if value is None or value == "":
+            return MISSING
+        value = str(value)
+        code = self._codes[col].get(value)
+        if code is None:
+            code = self._codes[col][value] = len(self.dictionaries[col])
+            self.dictionaries[col].append(value)
+        return code
+
+    def update(self, files: Iterable[Path]) -> Tuple[int, int]:
+        """Sync with the given NDJSON files; returns (files decoded, rows dropped)."""
+        files = list(files)
+        current = {p.name: p for p in files}
+        stale = {
+            name for name, entry in self.manifest.items()
+            if name not in current or [current[name].stat().st_size, current[name].stat().st_mtime] != entry["stat"]
+        }
+        to_read = [p for p in files if p.name in stale or p.name not in self.manifest]
+
+        columns = {col: np.asarray(values) for col, values in self.columns.items()}
+        dropped = 0
+        if stale:
+            stale_ids = [self.manifest[name]["id"] for name in stale]
+            keep = ~np.isin(columns["file_id"], stale_ids)
+            dropped = int((~keep).sum())
+            columns = {col: values[keep] for col, values in columns.items()}
+            for name in stale:
+                del self.manifest[name]
+
+        new_rows: Dict[str, list] = {col: [] for col in COLUMN_DTYPES}
+        next_id = max((entry["id"] for entry in self.manifest.values()), default=-1) + 1
+        for path in to_read:
+            file_id, next_id = next_id, next_id + 1
+            with open(path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    deal = json.loads(line)
+                    for col, field in TEXT_COLUMNS.items():
+                        new_rows[col].append(self._encode(col, deal.get(field) or ("US" if col == "region" else None)))
+                    try:
+                        new_rows["discount"].append(float(deal.get("discount")))
+                    except (TypeError, ValueError):
+                        new_rows["discount"].append(np.nan)
+                    period = deal.get("valid_period") or {}
+                    new_rows["starts"].append(_to_date(period.get("starts")))
+                    new_rows["ends"].append(_to_date(period.get("ends")))
+                    new_rows["seen_at"].append(_to_seconds(deal.get("seen_at")))
+                    new_rows["file_id"].append(file_id)
+            stat = path.stat()
+            self.manifest[path.name] = {"id": file_id, "stat": [stat.st_size, stat.st_mtime]}
+
+        self.columns = {
+            col: np.concatenate([columns[col], np.array(new_rows[col], dtype=dtype)])
+            for col, dtype in COLUMN_DTYPES.items()
+        }
+        return len(to_read), dropped
+
+    # --- queries ---
+
+    def code(self, col: str, value: str) -> int | None:
+        return self._codes[col].get(value)
+
+    def rows(self, mask_or_index: np.ndarray) -> List[Dict[str, Any]]:
+        """Decode the selected rows back into dicts."""
+        index = np.flatnonzero(mask_or_index) if mask_or_index.dtype == bool else mask_or_index
+        decoded = []
+        for i in index:
+            row = {col: (self.dictionaries[col][code] if (code := int(self.columns[col][i])) != MISSING else None)
+                   for col in TEXT_COLUMNS}
+            row["discount"] = float(self.columns["discount"][i])
+            row["starts"] = str(self.columns["starts"][i])
+            row["ends"] = str(self.columns["ends"][i])
+            row["seen_at"] = str(self.columns["seen_at"][i])
+            decoded.append(row)
+        return decoded
+
+    def sku_history(self, sku: str) -> List[Dict[str, Any]]:
+        """Every sighting of a SKU, oldest period first."""
+        code = self.code("sku", sku)
+        if code is None:
+            return []
+        index = np.flatnonzero(self.columns["sku"] == code)
+        index = index[np.argsort(self.columns["starts"][index], kind="stable")]
+        return self.rows(index)
+
+    def region_mask(self, region: str = "US") -> np.ndarray:
+        """Rows of a region."""
+        region_code = self.code("region", region)
+        if region_code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.columns["region"] == region_code
+
+    def overlapping_mask(self, start: str, end: str, region: str = "US") -> np.ndarray:
+        """Rows of a region whose valid period overlaps [start, end] (inclusive)."""
+        return (self.region_mask(region)
+                & (self.columns["starts"] <= np.datetime64(end, "D"))
+                & (self.columns["ends"] >= np.datetime64(start, "D")))
+
+    def active_on(self, date: str, region: str = "US") -> List[Dict[str, Any]]:
+        """Deals with a SKU valid on a day (like GET /api/deals/today), one row per SKU and period."""
+        index = np.flatnonzero(self.overlapping_mask(date, date, region) & (self.columns["sku"] != MISSING))
+        # Keep the latest sighting of each (sku, starts, ends)
+        index = index[np.argsort(self.columns["seen_at"][index], kind="stable")[::-1]]
+        keys = np.stack([self.columns["sku"][index],
+                         self.columns["starts"][index].astype(np.int64),
+                         self.columns["ends"][index].astype(np.int64)], axis=1)
+        _, first = np.unique(keys, axis=0, return_index=True)
+        return self.rows(np.sort(index[first]))
+
+    def category_monthly_avg(self, start: str | None = None, end: str | None = None,
+                             region: str = "US") -> List[Dict[str, Any]]:
+        """Average discount per (category, sale type, month of period start)."""
+        mask = ~np.isnan(self.columns["discount"]) & ~np.isnat(self.columns["starts"])
+        if start or end:
+            mask &= self.overlapping_mask(start or "1970-01-01", end or "9999-12-31", region)
+        else:
+            mask &= self.region_mask(region)
+        category = self.columns["category"][mask].astype(np.int64)
+        sale_type = self.columns["sale_type"][mask].astype(np.int64)
+        month = self.columns["starts"][mask].astype("datetime64[M]").astype(np.int64)
+        discount = self.columns["discount"][mask].astype(np.float64)
+        if not len(discount):
+            return []
+
+        # One int64 key per (category, sale type, month); codes are shifted by 1 for MISSING
+        first_month, n_months = month.min(), int(month.max() - month.min()) + 1
+        n_types = len(self.dictionaries["sale_type"]) + 1
+        keys = ((category + 1) * n_types + (sale_type + 1)) * n_months + (month - first_month)
+        groups, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=discount)
+        groups = [
+            ((k // n_months) // n_types - 1, (k // n_months) % n_types - 1, k % n_months + first_month)
+            for k in groups.tolist()
+        ]
+        return [
+            {
+                "category": self.dictionaries["category"][c] if c != MISSING else None,
+                "sale_type": self.dictionaries["sale_type"][t] if t != MISSING else None,
+                "month": str(np.datetime64(int(m), "M")),
+                "avg_discount": round(float(total / n), 2),
+                "count": int(n),
+            }
+            for (c, t, m), total, n in zip(groups, sums, counts)
+        ]
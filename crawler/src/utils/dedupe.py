@@ -0,0 +1,64 @@
+"""
+Collapse tiles of one offer that a page lists more than once.
+
+Offer pages repeat items: a featured strip plus the grid, or several sizes
+sharing one SKU. All copies map to the same offer_period row
+(sku, starts, ends, region), so the converter and ingest merge them before
+building SQL or payloads instead of letting `INSERT OR IGNORE` / D1 drop them.
+
+The merged deal is the first copy in file order, with:
+  - image_url: the first non-null one (with its image_srcset),
+  - details:   the longest one (the first on ties),
+  - channel:   the first explicit one (not missing or "Unknown"),
+  - alt_skus:  the union of all copies' other SKUs, in order.
+Everything else (name, discount, seen_at, ...) stays the first copy's, so the
+result only depends on the order of the file.
+"""
+from typing import Any, Dict, List, Tuple
+
+from utils.aliases import AliasMap
+from utils.snapshot_state import offer_key
+
+UNKNOWN_CHANNEL = "Unknown"
+# What merge_deal reads from the kept copy
+MERGE_FIELDS = ("sku", "alt_skus", "image_url", "image_srcset", "details", "channel")
+
+
+def dedupe_key(deal: Dict[str, Any], alias_map: AliasMap | None = None) -> str:
+    sku = alias_map.canonical(deal["sku"]) if alias_map is not None else deal["sku"]
+    period = deal["valid_period"]
+    return offer_key(sku, period["starts"], period["ends"], deal.get("region", "US"))
+
+
+def merge_deal(kept: Dict[str, Any], other: Dict[str, Any]) -> None:
+    """Fold a later copy of the same offer into `kept`."""
+    if not kept.get("image_url") and other.get("image_url"):
+        kept["image_url"] = other["image_url"]
+        kept["image_srcset"] = other.get("image_srcset")
+    if len(other.get("details") or "") > len(kept.get("details") or ""):
+        kept["details"] = other["details"]
+    if kept.get("channel", UNKNOWN_CHANNEL) == UNKNOWN_CHANNEL and other.get("channel", UNKNOWN_CHANNEL) != UNKNOWN_CHANNEL:
+        kept["channel"] = other["channel"]
+    # Copies matched through an alias can be listed under another SKU of the group
+    alt_skus = dict.fromkeys([*kept.get("alt_skus", []), other["sku"], *other.get("alt_skus", [])])
+    kept["alt_skus"] = [sku for sku in alt_skus if sku != kept["sku"]]
+
+
+def dedupe_deals(deals: List[Dict[str, Any]], alias_map: AliasMap | None = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    One deal per (sku, starts, ends, region), in order of first appearance;
+    returns (deals, number of copies removed). Deals must be validated (sku and
+    period present). With an AliasMap the SKU groups of these deals are
+    registered first and copies are matched by canonical SKU.
+    """
+    if alias_map is not None:
+        for deal in deals:
+            alias_map.add_deal(deal)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for deal in deals:
+        key = dedupe_key(deal, alias_map)
+        if key in merged:
+            merge_deal(merged[key], deal)
+        else:
+            merged[key] = dict(deal)
+    return list(merged.values()), len(deals) - len(merged)
@@ -0,0 +1,89 @@
+"""
+Reading and writing raw HTML snapshots, plain or compressed.
+
+The raw archive may hold `.html`, `.html.gz` or `.html.zst` files (one
+compression frame per snapshot). `read_html` picks the decoder from the suffix
+and decompresses as a stream, so callers never see the difference.
+zstd needs the optional `zstandard` package; gzip is always available.
+"""
+import gzip
+import io
+from pathlib import Path
+
+COMPRESSED_SUFFIXES = {".gz": "gz", ".zst": "zst"}
+SNAPSHOT_SUFFIXES = (".html", ".html.gz", ".html.zst")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Reading/writing .zst snapshots needs the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+
+def compression_of(path: Path) -> str | None:
+    """'gz', 'zst' or None for a plain file."""
+    return COMPRESSED_SUFFIXES.get(Path(path).suffix)
+
+
+def snapshot_stem(path: Path) -> str:
+    """savings_051425_060825 for savings_051425_060825.html[.gz|.zst]"""
+    name = Path(path).name
+    for suffix in sorted(SNAPSHOT_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return Path(path).stem
+
+
+def open_html(path: Path, errors: str = "strict") -> io.TextIOBase:
+    """Open a snapshot for reading as text, decompressing on the fly."""
+    path = Path(path)
+    compression = compression_of(path)
+    if compression == "gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors=errors)
+    if compression == "zst":
+        raw = open(path, "rb")
+        reader = _zstandard().ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8", errors=errors)
+    return open(path, "r", encoding="utf-8", errors=errors)
+
+
+def read_html(path: Path, errors: str = "strict") -> str:
+    """Read a plain or compressed snapshot into a string."""
+    with open_html(path, errors) as f:
+        return f.read()
+
+
+def read_snapshot_bytes(path: Path) -> bytes:
+    """Read the exact (decompressed) bytes of a snapshot."""
+    path = Path(path)
+    compression = compression_of(path)
+    if compression == "gz":
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    if compression == "zst":
+        with open(path, "rb") as raw, _zstandard().ZstdDecompressor().stream_reader(raw) as reader:
+            return reader.read()
+    return path.read_bytes()
+
+
+def write_snapshot_bytes(path: Path, data: bytes, level: int | None = None) -> Path:
+    """Write snapshot bytes, compressed according to the suffix of `path` (one frame per file)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compression = compression_of(path)
+    if compression == "gz":
+        with gzip.open(path, "wb", compresslevel=9 if level is None else level) as f:
+            f.write(data)
+    elif compression == "zst":
+        compressor = _zstandard().ZstdCompressor(level=10 if level is None else level)
+        path.write_bytes(compressor.compress(data))
+    else:
+        path.write_bytes(data)
+    return path
+
+
+def write_html(path: Path, text: str, level: int | None = None) -> Path:
+    """Write a snapshot, compressed according to the suffix of `path`."""
+    return write_snapshot_bytes(path, text.encode("utf-8"), level)
@@ -0,0 +1,77 @@
+"""
+On-disk cache of HTTP GET responses, keyed by URL.
+
+Each response is a gzip-compressed body plus a small JSON header (url, status,
+content type, fetch time) under data/cache/<namespace>/<2 hex>/<sha256>.
+Both files are written atomically, so concurrent writers and an interrupted
+run never leave a half entry. Entries do not expire unless a lookup asks for a
+max age, e.g. an archived page never changes but a listing of captures does.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).parent.parent.parent / "data" / "cache"
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    content_type: str | None
+    fetched_at: float
+    body: bytes
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class HttpCache:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = self.root / key[:2] / key
+        return base.with_suffix(".json"), base.with_suffix(".gz")
+
+    def get(self, url: str, max_age_s: float | None = None) -> CachedResponse | None:
+        """The cached response for `url`, or None if missing (or older than max_age_s)."""
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text("utf-8"))
+            if meta["url"] != url or (max_age_s is not None and time.time() - meta["fetched_at"] > max_age_s):
+                raise LookupError(url)
+            body = gzip.decompress(body_path.read_bytes())
+        except (OSError, ValueError, KeyError, LookupError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return CachedResponse(url, meta["status"], meta.get("content_type"), meta["fetched_at"], body)
+
+    def put(self, url: str, status: int, content_type: str | None, body: bytes) -> CachedResponse:
+        """Store a response; the body is written before the header that makes it visible."""
+        meta_path, body_path = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        fetched_at = time.time()
+        _write_atomic(body_path, gzip.compress(body, compresslevel=6))
+        meta = {"url": url, "status": status, "content_type": content_type, "fetched_at": fetched_at}
+        _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        return CachedResponse(url, status, content_type, fetched_at, body)
@@ -0,0 +1,84 @@
+"""
+Product image URLs and their width variants.
+
+Tiles carry an `img` whose srcset lists the same picture at several widths
+("…?width=160 160w, …?width=320 320w, …"). The extractors keep all of them as
+`image_srcset`, a normalized srcset string (archive prefixes stripped, sorted
+by width, duplicates dropped), next to `image_url`, the full-size picture.
+The converter and ingest derive `thumbnail_url` from it, the smallest variant
+at least THUMBNAIL_WIDTH wide, which is what the deal cards display.
+
+Pages without a srcset (2024 layout, most archived pages) still get a
+thumbnail when the image lives on Costco's resizing CDN, which serves any
+?width= on request.
+"""
+import re
+from typing import Dict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+THUMBNAIL_WIDTH = 320
+# https://web.archive.org/web/20250514051439im_/https://… (the im_/if_/… flag is optional)
+ARCHIVE_PREFIX_RE = re.compile(r"^(?:https?:)?//web\.archive\.org/web/\d+[a-z_]*/")
+RESIZABLE_HOSTS = ("costco-static.com",)
+# "<url> <n>w" entries; URLs have no whitespace but may contain commas
+SRCSET_ENTRY_RE = re.compile(r"(?:^|,)\s*(\S+)\s+(\d+)w(?=\s*(?:,|$))")
+
+
+def normalize_image_url(url: str | None) -> str | None:
+    """Strip a Wayback Machine prefix and surrounding whitespace; empty -> None."""
+    if not url:
+        return None
+    url = ARCHIVE_PREFIX_RE.sub("", url.strip())
+    return url or None
+
+
+def parse_srcset(srcset: str | None) -> Dict[int, str]:
+    """Width -> URL for the `<url> <n>w` entries of a srcset (density entries like 2x are skipped)."""
+    variants: Dict[int, str] = {}
+    for m in SRCSET_ENTRY_RE.finditer(srcset or ""):
+        url = normalize_image_url(m.group(1))
+        if url:
+            variants.setdefault(int(m.group(2)), url)
+    return dict(sorted(variants.items()))
+
+
+def format_srcset(variants: Dict[int, str]) -> str | None:
+    if not variants:
+        return None
+    return ", ".join(f"{url} {width}w" for width, url in sorted(variants.items()))
+
+
+def normalize_srcset(srcset: str | None) -> str | None:
+    return format_srcset(parse_srcset(srcset))
+
+
+def with_width(url: str, width: int) -> str:
+    """The same CDN URL with ?width=<width> set."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "width"]
+    query.append(("width", str(width)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def thumbnail_url(image_url: str | None, srcset: str | None = None, width: int = THUMBNAIL_WIDTH) -> str | None:
+    """
+    The smallest srcset variant at least `width` wide (the widest one if all are
+    smaller); without variants, a resized CDN URL; else None (use image_url).
+    """
+    variants = parse_srcset(srcset)
+    if variants:
+        wide_enough = [w for w in variants if w >= width]
+        return variants[min(wide_enough) if wide_enough else max(variants)]
+    image_url = normalize_image_url(image_url)
+    if image_url and (urlsplit(image_url).hostname or "").endswith(RESIZABLE_HOSTS):
+        return with_width(image_url, width)
+    return None
+
+
+def full_image_url(src: str | None, srcset: str | None = None) -> str | None:
+    """The `src` of an image, or its widest srcset variant when it has none."""
+    src = normalize_image_url(src)
+    if src:
+        return src
+    variants = parse_srcset(srcset)
+    return variants[max(variants)] if variants else None
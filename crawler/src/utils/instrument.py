@@ -0,0 +1,185 @@
+"""
+Named stage timers and counters shared by the crawler scripts.
+
+Library code marks its stages and counts events unconditionally:
+
+    with instrument.stage("parse"):
+        soup = BeautifulSoup(html, "lxml")
+    instrument.count("tiles")
+
+Both are no-ops unless a script activated a trace for its run:
+
+    with instrument.session("convert_deals_to_sql", args):
+        ...
+
+which, when the run asked for it (--trace, --trace-file or --profile), writes
+a JSON trace (wall time, per-stage calls and seconds, counters) to
+data/traces/<script>_<timestamp>.json, and with --profile also a cProfile dump
+(.prof plus a text summary) and a tracemalloc report next to it. Stages may nest
+and their times are inclusive; stages of concurrent tasks or threads add up, so
+their sum can exceed the wall time.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+TRACE_DIR = Path(__file__).parent.parent.parent / "data" / "traces"
+PROFILE_TOP = 40
+
+_NULL = contextlib.nullcontext()
+
+
+class Trace:
+    def __init__(self, script: str):
+        self.script = script
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.meta: Dict[str, Any] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+                entry["calls"] += 1
+                entry["seconds"] += elapsed
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "script": self.script,
+                "started_at": self.started_at,
+                "wall_s": round(time.perf_counter() - self._started, 4),
+                "stages": {name: {"calls": int(e["calls"]), "seconds": round(e["seconds"], 4)}
+                           for name, e in self.stages.items()},
+                "counters": dict(self.counters),
+                **self.meta,
+            }
+
+    def summary(self) -> str:
+        data = self.to_dict()
+        stages = ", ".join(f"{name} {e['seconds']:.3f}s" for name, e in
+                           sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"]))
+        return f"[trace] {self.script}: {data['wall_s']:.3f}s wall" + (f" | {stages}" if stages else "")
+
+
+_active: Trace | None = None
+
+
+def stage(name: str):
+    """Time a block as stage `name` of the active trace (no-op without one)."""
+    trace = _active
+    return trace.stage(name) if trace is not None else _NULL
+
+
+def count(name: str, n: int = 1) -> None:
+    trace = _active
+    if trace is not None:
+        trace.count(name, n)
+
+
+def active() -> Trace | None:
+    return _active
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--trace', action='store_true',
+                       help=f'Time stages and write a JSON trace to {TRACE_DIR}/<script>_<timestamp>.json')
+    group.add_argument('--trace-file', metavar='FILE', help='Write the trace to FILE instead (implies --trace)')
+    group.add_argument('--profile', action='store_true',
+                       help='Also write cProfile and tracemalloc reports next to the trace')
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, "utf-8")
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def session(script: str, args: argparse.Namespace | None = None) -> Iterator[Trace | None]:
+    """Activate a trace for the whole run of a script and write it (and profiles) on exit.
+
+    With parsed arguments the run is only traced when they ask for it (see add_arguments).
+    """
+    global _active
+    profile = bool(getattr(args, "profile", False))
+    requested = args is None or profile or getattr(args, "trace", False) or getattr(args, "trace_file", None)
+    if not requested:
+        yield None
+        return
+    trace = Trace(script)
+    trace_file = Path(getattr(args, "trace_file", None) or
+                      TRACE_DIR / f"{script}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    profiler = None
+    if profile:
+        # Only --profile runs pay for importing the profilers
+        import cProfile
+        import tracemalloc
+        tracemalloc.start(25)
+        profiler = cProfile.Profile()
+        profiler.enable()
+    previous, _active = _active, trace
+    status = "ok"
+    try:
+        yield trace
+    except SystemExit as e:
+        status = "ok" if e.code in (None, 0) else f"exit {e.code}"
+        raise
+    except BaseException as e:
+        status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        _active = previous
+        trace.meta["status"] = status
+        if profiler is not None:
+            profiler.disable()
+            trace.meta["profile"] = _write_profiles(profiler, trace_file)
+        _write_atomic(trace_file, json.dumps(trace.to_dict(), indent=2))
+        print(trace.summary(), file=sys.stderr)
+        print(f"[trace] Wrote {trace_file}", file=sys.stderr)
+
+
+def _write_profiles(profiler: "cProfile.Profile", trace_file: Path) -> Dict[str, Any]:
+    """cProfile dump + text report and tracemalloc report; returns their paths and peak memory."""
+    import io
+    import pstats
+    import tracemalloc
+    stem = trace_file.with_suffix("")
+    prof_file = stem.with_suffix(".prof")
+    prof_file.parent.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(prof_file)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    cprofile_txt = Path(f"{stem}.cprofile.txt")
+    _write_atomic(cprofile_txt, text.getvalue())
+
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lines = [f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB", ""]
+    for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+        lines.append(str(stat))
+    tracemalloc_txt = Path(f"{stem}.tracemalloc.txt")
+    _write_atomic(tracemalloc_txt, "\n".join(lines) + "\n")
+    return {"cprofile": str(prof_file), "cprofile_report": str(cprofile_txt),
+            "tracemalloc_report": str(tracemalloc_txt), "peak_mb": round(peak / 1e6, 2)}
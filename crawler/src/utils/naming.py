@@ -0,0 +1,55 @@
+"""
+File naming helpers shared by the crawlers and the pipeline.
+
+Raw snapshots are named `<prefix>_MMDDYY_MMDDYY.html` (e.g. savings_051425_060825.html),
+which is what run_pipeline.sh uses to pick the extractor for a page.
+"""
+import datetime as dt
+import re
+
+VALID_DATES_RE = re.compile(r"(\d{1,2}/\d{1,2}/\d{2})")
+SCRIPT_OR_STYLE_RE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.S | re.I)
+TAG_RE = re.compile(r"<[^>]+>")
+VALID_BANNER_RE = re.compile(r"Valid\b[^<]{0,80}")
+
+
+def valid_period_from_text(valid_text: str | None) -> dict:
+    """
+    Parse a banner such as "Valid 5/14/25 - 6/8/25" into
+    {"starts": "YYYY-MM-DD", "ends": "YYYY-MM-DD"} (None values if it can't).
+    """
+    if not valid_text:
+        return {"starts": None, "ends": None}
+    dates = VALID_DATES_RE.findall(valid_text)
+    if len(dates) != 2:
+        return {"starts": None, "ends": None}
+    try:
+        start_date = dt.datetime.strptime(dates[0], "%m/%d/%y").strftime("%Y-%m-%d")
+        end_date = dt.datetime.strptime(dates[1], "%m/%d/%y").strftime("%Y-%m-%d")
+        return {"starts": start_date, "ends": end_date}
+    except ValueError:
+        return {"starts": None, "ends": None}
+
+
+def valid_period_from_html(html_text: str) -> dict:
+    """
+    The valid period of a raw page without parsing it: the first text containing
+    "Valid", like the extractors' extract_valid_period.
+    """
+    text = TAG_RE.sub("\n", SCRIPT_OR_STYLE_RE.sub("", html_text))
+    m = VALID_BANNER_RE.search(text)
+    return valid_period_from_text(m.group(0) if m else None)
+
+
+def raw_html_filename(prefix: str, valid_period: dict, suffix: str = ".html") -> str:
+    """
+    Build `<prefix>_MMDDYY_MMDDYY.html` for a valid period. When the period is
+    unknown, fall back to `<prefix>_unknown_<UTC timestamp>.html` so captures never clash.
+    """
+    starts, ends = valid_period.get("starts"), valid_period.get("ends")
+    if starts and ends:
+        start = dt.datetime.strptime(starts, "%Y-%m-%d").strftime("%m%d%y")
+        end = dt.datetime.strptime(ends, "%Y-%m-%d").strftime("%m%d%y")
+        return f"{prefix}_{start}_{end}{suffix}"
+    stamp = dt.datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    return f"{prefix}_unknown_{stamp}{suffix}"
@@ -0,0 +1,187 @@
+"""
+Offset index sidecars for NDJSON deal files.
+
+<file>.ndjson.idx records the byte offset of every line and which lines carry
+each SKU (alt_skus included; deals without SKU are listed under ""), so a tool
+that needs deal N or all deals of one SKU can decode just those lines:
+
+    with IndexedNdjson("data/processed/savings_20250514-20250608.ndjson") as deals:
+        deals.line(41)
+        deals.by_sku("1720981")
+
+Writers that go through `write_ndjson` or `NdjsonWriter` produce the sidecar
+for free while serializing; `build_index` creates one for an existing file. The
+sidecar stores the file's size and mtime and is rebuilt when they no longer match.
+"""
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+MISSING_SKU = ""
+
+
+def index_path(ndjson_file: Path) -> Path:
+    ndjson_file = Path(ndjson_file)
+    return ndjson_file.with_name(ndjson_file.name + INDEX_SUFFIX)
+
+
+def _add_skus(skus: Dict[str, List[int]], record: Dict[str, Any], line: int) -> None:
+    keys = [record.get("sku") or MISSING_SKU, *record.get("alt_skus", [])]
+    for key in dict.fromkeys(keys):
+        skus.setdefault(key, []).append(line)
+
+
+def _save_index(ndjson_file: Path, offsets: List[int], skus: Dict[str, List[int]]) -> Path:
+    stat = os.stat(ndjson_file)
+    path = index_path(ndjson_file)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                   "offsets": offsets, "skus": skus}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
+
+
+class NdjsonWriter:
+    """Writes records one per line and, on close, the .idx sidecar of what was written."""
+
+    def __init__(self, ndjson_file: Path, ensure_ascii: bool = True, index: bool = True):
+        self.path = Path(ndjson_file)
+        self.ensure_ascii = ensure_ascii
+        self.index = index
+        self.offsets, self.skus = [0], {}
+        self._file = open(self.path, "wb")
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = (json.dumps(record, ensure_ascii=self.ensure_ascii) + "\n").encode("utf-8")
+        self._file.write(line)
+        _add_skus(self.skus, record, len(self))
+        self.offsets.append(self.offsets[-1] + len(line))
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        if self.index:
+            _save_index(self.path, self.offsets, self.skus)
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], ndjson_file: Path, ensure_ascii: bool = True,
+                 index: bool = True) -> int:
+    """Write records one per line (and the .idx sidecar); returns the number of lines."""
+    with NdjsonWriter(ndjson_file, ensure_ascii, index) as writer:
+        for record in records:
+            writer.write(record)
+    return len(writer)
+
+
+def build_index(ndjson_file: Path) -> Path:
+    """Index an existing NDJSON file (one full decode); returns the sidecar path."""
+    offsets, skus, n = [0], {}, 0
+    with open(ndjson_file, "rb") as f:
+        for line in f:
+            offsets.append(offsets[-1] + len(line))
+            if line.strip():
+                _add_skus(skus, json.loads(line), n)
+            n += 1
+    return _save_index(Path(ndjson_file), offsets, skus)
+
+
+def load_index(ndjson_file: Path) -> Dict[str, Any] | None:
+    """The sidecar of a file, or None if it is missing or stale."""
+    path = index_path(ndjson_file)
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        index = json.load(f)
+    stat = os.stat(ndjson_file)
+    if (index.get("version") != INDEX_VERSION or index.get("size") != stat.st_size
+            or index.get("mtime_ns") != stat.st_mtime_ns):
+        return None
+    return index
+
+
+class IndexedNdjson:
+    """Random access to the lines of an NDJSON file through its sidecar and mmap."""
+
+    def __init__(self, ndjson_file: Path, build: bool = True):
+        self.path = Path(ndjson_file)
+        index = load_index(self.path)
+        if index is None:
+            if not build:
+                raise FileNotFoundError(f"No up-to-date index for {self.path}")
+            build_index(self.path)
+            index = load_index(self.path)
+        self.offsets: List[int] = index["offsets"]
+        self.skus: Dict[str, List[int]] = index["skus"]
+        self._file = open(self.path, "rb")
+        # mmap refuses empty files
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __enter__(self) -> "IndexedNdjson":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def raw(self, n: int) -> bytes:
+        if not 0 <= n < len(self):
+            raise IndexError(f"{self.path.name} has {len(self)} lines, no line {n}")
+        return self._map[self.offsets[n]:self.offsets[n + 1]]
+
+    def line(self, n: int) -> Dict[str, Any]:
+        """Decode line `n` (0-based, like fill_missing_skus' line= in its log)."""
+        return json.loads(self.raw(n))
+
+    def lines(self, numbers: Iterable[int]) -> Iterator[Dict[str, Any]]:
+        for n in numbers:
+            yield self.line(n)
+
+    def sku_lines(self, sku: str) -> List[int]:
+        return self.skus.get(sku, [])
+
+    def by_sku(self, sku: str) -> List[Dict[str, Any]]:
+        """Every deal listing `sku` (as sku or alt SKU); "" selects the deals without SKU."""
+        return list(self.lines(self.sku_lines(sku)))
+
+
+def rewrite_lines(source: IndexedNdjson, replacements: Dict[int, Dict[str, Any]], ndjson_file: Path,
+                  ensure_ascii: bool = True) -> Path:
+    """
+    Copy `source` to `ndjson_file` with some lines replaced; untouched lines are
+    copied as raw bytes and the new sidecar is derived from the source's.
+    """
+    offsets = [0]
+    skus = {key: [n for n in lines if n not in replacements] for key, lines in source.skus.items()}
+    with open(ndjson_file, "wb") as f:
+        for n in range(len(source)):
+            if n in replacements:
+                raw = (json.dumps(replacements[n], ensure_ascii=ensure_ascii) + "\n").encode("utf-8")
+                _add_skus(skus, replacements[n], n)
+            else:
+                raw = source.raw(n)
+            f.write(raw)
+            offsets.append(offsets[-1] + len(raw))
+    skus = {key: sorted(lines) for key, lines in skus.items() if lines}
+    return _save_index(Path(ndjson_file), offsets, skus)
@@ -0,0 +1,98 @@
+"""
+Parse the tiles of large offer pages in worker processes.
+
+BeautifulSoup spends most of an extraction building and walking one big tree,
+all on one core. For pages with many tiles the extractors instead:
+
+  1. count the tile marker in the raw text to decide whether it is worth it,
+  2. locate the tiles with lxml (C, no Python objects per node) and serialize
+     each one back to an HTML fragment; what is left of the page is kept too,
+  3. hand chunks of fragments to worker processes, which parse each chunk with
+     BeautifulSoup and run the extractor's own parse_tile on its tiles,
+  4. merge the chunk results back in page order.
+
+The valid period is read from the page without its tiles (both layouts print it
+in the header), falling back to the whole page when it is not found there.
+Workers are spawned rather than forked, so the watcher and live pipeline can
+call this from their threads.
+"""
+import datetime as dt
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, Iterator, List, Tuple
+
+import lxml.html
+from bs4 import BeautifulSoup
+
+from utils import instrument
+
+PARALLEL_MIN_TILES = 400
+CHUNK_SIZE = 100
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def worth_parallel(html_text: str, marker: str, workers: int, min_tiles: int = PARALLEL_MIN_TILES) -> bool:
+    """Cheap pre-check: enough occurrences of the tile marker and more than one worker."""
+    return workers > 1 and html_text.count(marker) >= min_tiles
+
+
+def locate_tiles(html_text: str, xpath: str) -> Tuple[List[str], str]:
+    """(tile fragments in page order, the page without its tiles)."""
+    root = lxml.html.document_fromstring(html_text)
+    tiles = root.xpath(xpath)
+    fragments = [lxml.html.tostring(tile, encoding="unicode", with_tail=False) for tile in tiles]
+    for tile in tiles:
+        tile.drop_tree()
+    return fragments, lxml.html.tostring(root, encoding="unicode")
+
+
+def _parse_chunk(find_tiles: Callable, parse_tile: Callable, fragments: List[str], valid_period: dict,
+                 seen_at: str) -> List[dict | None]:
+    soup = BeautifulSoup("".join(fragments), "lxml")
+    return [parse_tile(tile, valid_period, seen_at) for tile in find_tiles(soup)]
+
+
+def parse_fragments(fragments: List[str], find_tiles: Callable, parse_tile: Callable, valid_period: dict,
+                    seen_at: str, workers: int, chunk_size: int = CHUNK_SIZE) -> Iterator[dict | None]:
+    """parse_tile's result for every fragment, in page order."""
+    chunks = [fragments[i:i + chunk_size] for i in range(0, len(fragments), chunk_size)]
+    workers = max(1, min(workers, len(chunks)))
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for results in pool.map(_parse_chunk, repeat(find_tiles), repeat(parse_tile), chunks,
+                                 repeat(valid_period), repeat(seen_at)):
+            yield from results
+
+
+def extract_deals(html_text: str, xpath: str, find_tiles: Callable, parse_tile: Callable,
+                  extract_valid_period: Callable, valid_period: dict | None = None, workers: int | None = None,
+                  chunk_size: int = CHUNK_SIZE, seen_at: str | None = None) -> Tuple[List[dict], dict]:
+    """
+    The parallel counterpart of an extractor's extract_deals, taking page source
+    instead of a soup. Returns (deals, valid_period).
+    """
+    seen_at = seen_at or dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    with instrument.stage("locate"):
+        fragments, rest = locate_tiles(html_text, xpath)
+    if valid_period is None:
+        with instrument.stage("parse"):
+            valid_period = extract_valid_period(BeautifulSoup(rest, "lxml"))
+            if not valid_period.get("starts"):
+                valid_period = extract_valid_period(BeautifulSoup(html_text, "lxml"))
+
+    deals = []
+    with instrument.stage("tile_chunks"):
+        for deal in parse_fragments(fragments, find_tiles, parse_tile, valid_period, seen_at,
+                                    workers or default_workers(), chunk_size):
+            instrument.count("tiles")
+            if deal:
+                instrument.count("deals")
+                if not deal["sku"]:
+                    instrument.count("deals_without_sku")
+                deals.append(deal)
+    return deals, valid_period
@@ -0,0 +1,115 @@
+"""
+Population of the product_fts full-text index (backend migration 0004).
+
+Text is normalized before indexing so that e.g. "Member's Mark" matches
+"members mark", "Crème" matches "creme" and "12ct" matches "12 ct". The backend
+applies the same normalization to search queries (backend/src/db/fts.ts).
+
+The index is maintained incrementally: a local state file remembers a hash of
+the indexed text per SKU, and only products whose text changed get a
+DELETE + INSERT. As with SnapshotState, decisions are staged until `save()`.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List
+
+from utils.snapshot_state import STATE_DIR
+
+APOSTROPHES_RE = re.compile(r"['’`]")
+NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+DIGIT_ALPHA_RE = re.compile(r"(?<=\d)(?=[a-z])|(?<=[a-z])(?=\d)")
+
+
+def normalize_search_text(text: str | None) -> str:
+    """Lowercase ASCII tokens separated by single spaces."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = APOSTROPHES_RE.sub("", text).replace("&", " and ")
+    text = NON_ALNUM_RE.sub(" ", text)
+    text = DIGIT_ALPHA_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def fts_row(deal: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "name": normalize_search_text(deal.get("name")),
+        "category": normalize_search_text(deal.get("category")),
+        "details": normalize_search_text(deal.get("details")),
+    }
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class SearchIndexState:
+    """Remembers what is indexed per SKU so only new or changed products are re-indexed.
+
+    Each SKU keeps the digest of its indexed row and the seen_at of the deal it came
+    from; the same sighting processed again (a file converted twice) is re-indexed,
+    like SnapshotState re-emits it.
+    """
+
+    def __init__(self, path: Path = STATE_DIR / "fts_index_state.json", reindex_all: bool = False):
+        self.path = Path(path)
+        self.reindex_all = reindex_all
+        self._lock = threading.Lock()
+        self._state: Dict[str, list] = {}
+        self._pending: Dict[str, list] = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                # Older state files hold just the digest
+                self._state = {sku: v if isinstance(v, list) else [v, None] for sku, v in json.load(f).items()}
+
+    def changed_rows(self, deals: List[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+        """SKU -> normalized row for every product whose indexed text would change."""
+        rows = {}
+        with self._lock:
+            for deal in deals:
+                row = fts_row(deal)
+                digest = hashlib.sha1(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+                sku, seen_at = deal["sku"], deal.get("seen_at")
+                pending = self._pending.get(sku)
+                indexed = pending or (None if self.reindex_all else self._state.get(sku))
+                if (indexed is None or indexed[0] != digest
+                        or (pending is None and seen_at is not None and indexed[1] == seen_at)):
+                    rows[sku] = row
+                    self._pending[sku] = [digest, seen_at]
+        return rows
+
+    def save(self) -> None:
+        with self._lock:
+            self._state.update(self._pending)
+            self._pending.clear()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._state, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+
+
+def make_fts_sql(rows: Dict[str, Dict[str, str]]) -> str:
+    """DELETE + INSERT statements re-indexing the given SKUs (rowid = product.id).
+
+    SKUs without a product row are skipped rather than indexed under a new rowid.
+    """
+    if not rows:
+        return ""
+    skus = ", ".join(_quote(sku) for sku in rows)
+    values = ", ".join(
+        f"({_quote(sku)}, {_quote(row['name'])}, {_quote(row['category'])}, {_quote(row['details'])})"
+        for sku, row in rows.items()
+    )
+    return (
+        f"DELETE FROM product_fts WHERE rowid IN (SELECT id FROM product WHERE sku IN ({skus}));\n"
+        f"INSERT INTO product_fts (rowid, name, category, details) "
+        f"SELECT product.id, v.column2, v.column3, v.column4 FROM (VALUES {values}) AS v "
+        f"JOIN product ON product.sku = v.column1;"
+    )
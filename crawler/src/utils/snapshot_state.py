@@ -0,0 +1,101 @@
+"""
+Last-seen offer state used to emit an offer_snapshot only when an offer changes.
+
+The state maps `sku|starts|ends|region` to the discount range, a short hash of
+the details text and the seen_at of the last emitted snapshot. A snapshot is
+emitted when the discount or details differ from that state, or when the
+heartbeat interval has passed since the last emitted snapshot. A sighting with
+the seen_at of the stored snapshot is that same snapshot being processed again
+(e.g. a file converted twice before its SQL is uploaded) and is emitted again,
+so re-running on the same input gives the same output.
+
+Decisions are staged by `should_emit` and only persisted by `save()`, so a run
+that fails before its output is written/ingested does not suppress snapshots
+on the next run. Each output target (SQL files, local API, D1 API) keeps its
+own state file because each one receives its own snapshots.
+"""
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict
+
+STATE_DIR = Path(__file__).parent.parent.parent / "data" / "state"
+DEFAULT_HEARTBEAT_HOURS = 24.0
+
+
+def offer_key(sku: str, starts: str, ends: str, region: str = "US") -> str:
+    return f"{sku}|{starts}|{ends}|{region}"
+
+
+def details_hash(details: str | None) -> str:
+    return hashlib.sha1((details or "").encode("utf-8")).hexdigest()[:12]
+
+
+def parse_seen_at(seen_at: str | None) -> dt.datetime | None:
+    if not seen_at:
+        return None
+    try:
+        parsed = dt.datetime.fromisoformat(seen_at.replace("Z", "+00:00").replace(" ", "T"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt.timezone.utc)
+
+
+class SnapshotState:
+    """Change detector for offer snapshots, persisted as a compact JSON file."""
+
+    def __init__(self, path: Path, heartbeat_hours: float | None = DEFAULT_HEARTBEAT_HOURS, fresh: bool = False):
+        self.path = Path(path)
+        self.heartbeat = dt.timedelta(hours=heartbeat_hours) if heartbeat_hours else None
+        self._lock = threading.Lock()
+        self._state: Dict[str, list] = {}
+        self._pending: Dict[str, list] = {}
+        self.emitted = 0
+        self.suppressed = 0
+        if self.path.exists() and not fresh:
+            with open(self.path, "r") as f:
+                self._state = json.load(f)
+
+    def check(self, key: str, discount_low: Any, discount_high: Any, details: str | None,
+              seen_at: str | None) -> bool:
+        """Return True if a snapshot should be emitted for this sighting, and stage it."""
+        entry = [float(discount_low), float(discount_high), details_hash(details), seen_at]
+        with self._lock:
+            pending = self._pending.get(key)
+            last = pending or self._state.get(key)
+            emit = (last is None or last[:3] != entry[:3] or self._heartbeat_due(last[3], seen_at)
+                    or (pending is None and seen_at is not None and last[3] == seen_at))
+            if emit:
+                self._pending[key] = entry
+                self.emitted += 1
+            else:
+                self.suppressed += 1
+            return emit
+
+    def should_emit(self, deal: Dict[str, Any]) -> bool:
+        """`check` for a deal in NDJSON form."""
+        key = offer_key(deal["sku"], deal["valid_period"]["starts"], deal["valid_period"]["ends"],
+                        deal.get("region", "US"))
+        return self.check(key, deal["discount"], deal["discount"], deal.get("details"), deal.get("seen_at"))
+
+    def _heartbeat_due(self, last_seen_at: str | None, seen_at: str | None) -> bool:
+        if self.heartbeat is None:
+            return False
+        last, now = parse_seen_at(last_seen_at), parse_seen_at(seen_at)
+        if last is None or now is None:
+            return True
+        return now - last >= self.heartbeat
+
+    def save(self) -> None:
+        """Persist the staged snapshots (atomically replaces the state file)."""
+        with self._lock:
+            self._state.update(self._pending)
+            self._pending.clear()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._state, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
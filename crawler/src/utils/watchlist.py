@@ -0,0 +1,192 @@
+"""
+Saved keyword/SKU watches matched against batches of deals.
+
+A watchlist is an NDJSON file (or a JSON array) of entries such as
+
+    {"id": "alice-fryer", "user": "alice", "keywords": ["air fryer", "ninja"], "skus": ["1234567"]}
+
+A keyword matches a deal when its words appear, consecutively and as whole
+words, in the deal's name and details. Both sides are normalized like the
+search index (utils/search_index.py), so "Crème Brûlée" matches "creme
+brulee" and "12ct" matches "12 ct". A SKU matches the deal's sku or any of its
+alt_skus.
+
+All keywords of all entries are compiled into one Aho-Corasick automaton
+over word tokens (each distinct keyword once, however many entries share it)
+and the SKUs into a dict, so matching a batch is one pass over the deals:
+one automaton walk per deal, independent of the number of watches.
+
+Matches are written per batch to data/alerts/<batch>.alerts.ndjson, one line
+per matched entry: {"id", "user", "deals": [{sku, name, ..., "matched"}]}.
+"""
+import json
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from utils.ndjson_index import write_ndjson
+from utils.search_index import normalize_search_text
+
+ALERTS_DIR = Path(__file__).parent.parent.parent / "data" / "alerts"
+
+
+@dataclass
+class WatchEntry:
+    id: str
+    user: str | None = None
+    keywords: List[str] = field(default_factory=list)
+    skus: List[str] = field(default_factory=list)
+
+
+def load_watchlist(path: Path) -> List[WatchEntry]:
+    """Entries of an NDJSON file or a JSON array; an entry without an id gets its position.
+
+    Matches are reported per id, so ids must be unique: a repeated id (or an explicit
+    id equal to the position of an entry without one) raises ValueError.
+    """
+    text = Path(path).read_text("utf-8")
+    if text.lstrip().startswith("["):
+        rows = json.loads(text)
+    else:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    entries = []
+    positions: Dict[str, int] = {}
+    for i, row in enumerate(rows):
+        entry_id = str(row.get("id", i))
+        if entry_id in positions:
+            raise ValueError(f"{path}: entries {positions[entry_id]} and {i} have the same id {entry_id!r} "
+                             "(an entry without an id gets its position)")
+        positions[entry_id] = i
+        entries.append(WatchEntry(id=entry_id, user=row.get("user"), keywords=list(row.get("keywords", [])),
+                                  skus=[str(s) for s in row.get("skus", [])]))
+    return entries
+
+
+class TokenAutomaton:
+    """Aho-Corasick over word tokens: finds every added token sequence in one walk."""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+
+    def add(self, tokens: Iterable[str], value: int) -> None:
+        state = 0
+        for token in tokens:
+            nxt = self.goto[state].get(token)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][token] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(value)
+
+    def build(self) -> None:
+        """Compute the failure links (breadth-first) and merge each state's outputs with its fallback's."""
+        todo = deque(self.goto[0].values())
+        while todo:
+            state = todo.popleft()
+            for token, nxt in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(token, 0)
+                if self.out[self.fail[nxt]]:
+                    self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+                todo.append(nxt)
+
+    def find(self, tokens: Iterable[str]) -> set:
+        """Values of every added sequence occurring in tokens."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        state = 0
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+def deal_text(deal: Dict[str, Any]) -> str:
+    """What keywords are matched against: the normalized name and details."""
+    return normalize_search_text(f"{deal.get('name') or ''} {deal.get('details') or ''}")
+
+
+class Watchlist:
+    def __init__(self, entries: List[WatchEntry]):
+        self.entries = entries
+        self.automaton = TokenAutomaton()
+        # keyword index -> (normalized keyword, entries watching it)
+        self.keywords: List[tuple[str, List[int]]] = []
+        self.skus: Dict[str, List[int]] = {}
+        keyword_index: Dict[str, int] = {}
+        for e, entry in enumerate(entries):
+            for keyword in entry.keywords:
+                normalized = normalize_search_text(keyword)
+                if not normalized:
+                    continue
+                if normalized not in keyword_index:
+                    keyword_index[normalized] = len(self.keywords)
+                    self.keywords.append((normalized, []))
+                    self.automaton.add(normalized.split(), keyword_index[normalized])
+                watchers = self.keywords[keyword_index[normalized]][1]
+                if not watchers or watchers[-1] != e:
+                    watchers.append(e)
+            for sku in entry.skus:
+                watchers = self.skus.setdefault(sku, [])
+                if not watchers or watchers[-1] != e:
+                    watchers.append(e)
+        self.automaton.build()
+
+    @classmethod
+    def load(cls, path: Path) -> "Watchlist":
+        return cls(load_watchlist(path))
+
+    def match_deal(self, deal: Dict[str, Any]) -> Dict[int, List[str]]:
+        """Entry index -> what matched (keywords, "sku <sku>") for one deal."""
+        hits: Dict[int, List[str]] = {}
+        for k in sorted(self.automaton.find(deal_text(deal).split())):
+            keyword, watchers = self.keywords[k]
+            for e in watchers:
+                hits.setdefault(e, []).append(keyword)
+        for sku in [deal.get("sku"), *(deal.get("alt_skus") or [])]:
+            for e in self.skus.get(sku, ()):
+                hits.setdefault(e, []).append(f"sku {sku}")
+        return hits
+
+    def match(self, deals: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Matches of a batch grouped by watch entry id (in watchlist order), deals in batch order.
+
+        Entry ids are assumed unique, as load_watchlist enforces.
+        """
+        grouped: Dict[int, List[Dict[str, Any]]] = {}
+        for deal in deals:
+            for e, matched in self.match_deal(deal).items():
+                grouped.setdefault(e, []).append({
+                    "sku": deal.get("sku"),
+                    "name": deal.get("name"),
+                    "discount": deal.get("discount"),
+                    "discount_type": deal.get("discount_type"),
+                    "valid_period": deal.get("valid_period"),
+                    "channel": deal.get("channel"),
+                    "matched": matched,
+                })
+        return {self.entries[e].id: grouped[e] for e in sorted(grouped)}
+
+
+def alerts_file(batch_file: Path, alerts_dir: Path = ALERTS_DIR) -> Path:
+    """data/alerts/<batch stem>.alerts.ndjson for a deals NDJSON file or raw snapshot."""
+    return Path(alerts_dir) / f"{Path(batch_file).name.split('.')[0]}.alerts.ndjson"
+
+
+def write_alerts(watchlist: Watchlist, matches: Dict[str, List[Dict[str, Any]]], path: Path) -> int:
+    """Write one {id, user, deals} line per matched entry; returns the number of entries."""
+    users = {entry.id: entry.user for entry in watchlist.entries}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    rows = ({"id": entry_id, "user": users.get(entry_id), "deals": deals} for entry_id, deals in matches.items())
+    return write_ndjson(rows, path, ensure_ascii=False, index=False)
@@ -0,0 +1,59 @@
+import functools
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The crawler scripts import each other as `utils.*`, `crawlers.*`, `processors.*` from src/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def fixture_server():
+    """Base URL of a local HTTP server serving tests/fixtures/."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(FIXTURES_DIR)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """Records every POSTed JSON payload and answers like the ingest API."""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.payloads.append(payload)
+        status, body = self.server.reply
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def ingest_server():
+    """A local stand-in for POST /api/ingest; `.url`, `.payloads`, and `.reply = (status, body)`."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), IngestHandler)
+    server.payloads = []
+    server.reply = (200, {"status": "success", "details": {}})
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/ingest"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
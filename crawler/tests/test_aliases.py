@@ -0,0 +1,52 @@
+from utils.aliases import AliasMap, parse_item_skus
+
+
+def test_first_sku_of_a_new_group_is_canonical():
+    aliases = AliasMap()
+    assert aliases.add(["1720981", "1720886"]) == "1720981"
+    assert aliases.canonical("1720886") == "1720981"
+
+
+def test_existing_group_keeps_its_canonical_sku():
+    aliases = AliasMap({"2000002": "1000001"})
+    # A new tile lists a new SKU first and the established product second
+    assert aliases.add(["3000003", "1000001"]) == "1000001"
+    assert aliases.aliases() == {"2000002": "1000001", "3000003": "1000001"}
+
+
+def test_existing_group_is_found_through_an_alias():
+    aliases = AliasMap({"2000002": "1000001"})
+    assert aliases.add(["3000003", "2000002"]) == "1000001"
+    assert aliases.canonical("3000003") == "1000001"
+
+
+def test_merging_two_groups_keeps_the_first_listed_one():
+    aliases = AliasMap({"2000002": "1000001", "4000004": "3000003"})
+    assert aliases.add(["5000005", "3000003", "1000001"]) == "3000003"
+    assert {aliases.canonical(sku) for sku in ["1000001", "2000002", "4000004", "5000005"]} == {"3000003"}
+
+
+def test_canonicalize_files_deals_under_the_existing_product(tmp_path):
+    path = tmp_path / "alias_map.json"
+    aliases = AliasMap({"2000002": "1000001"}, path)
+    aliases.save()
+
+    deal = {"sku": "3000003", "alt_skus": ["1000001"], "name": "Bounty Paper Towels"}
+    pairs = AliasMap.load(path).canonicalize([deal])
+    assert (deal["sku"], deal["alt_skus"]) == ("1000001", ["3000003"])
+    assert pairs == [("1000001", "2000002"), ("1000001", "3000003")]
+
+
+def test_parse_item_skus():
+    assert parse_item_skus("1720981, 1720886, 1720981") == ["1720981", "1720886"]
+
+
+def test_save_keeps_groups_saved_by_another_process(tmp_path):
+    path = tmp_path / "alias_map.json"
+    ingest, convert = AliasMap.load(path), AliasMap.load(path)
+    ingest.add(["1000001", "2000002"])
+    convert.add(["3000003", "4000004"])
+    ingest.save()
+    convert.save()
+
+    assert AliasMap.load(path).aliases() == {"2000002": "1000001", "4000004": "3000003"}
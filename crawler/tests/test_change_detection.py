@@ -0,0 +1,90 @@
+import json
+
+from processors import convert_deals_to_sql
+from utils.search_index import SearchIndexState
+from utils.snapshot_state import SnapshotState
+
+KEY = "1234567|2025-05-14|2025-06-08|US"
+DEAL = {"sku": "1234567", "name": "Kirkland Signature Paper Towels", "details": "12 rolls. Item 1234567",
+        "category": "Household", "discount": 5.0, "discount_type": "dollar", "seen_at": "2025-05-14T08:00:00Z",
+        "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"}, "channel": "Warehouse-Only"}
+
+
+def snapshots(tmp_path, heartbeat_hours=24.0):
+    return SnapshotState(tmp_path / "snapshots.json", heartbeat_hours)
+
+
+def sighting(state, seen_at, discount=5.0, details="Item 1234567"):
+    return state.check(KEY, discount, discount, details, seen_at)
+
+
+def test_snapshot_emitted_only_on_change(tmp_path):
+    state = snapshots(tmp_path)
+    assert sighting(state, "2025-05-14T08:00:00Z")
+    state.save()
+    state = snapshots(tmp_path)
+    assert not sighting(state, "2025-05-14T20:00:00Z")
+    assert sighting(state, "2025-05-14T21:00:00Z", discount=6.0)
+    assert sighting(SnapshotState(tmp_path / "other.json"), "2025-05-16T08:00:00Z", details="Item 1234567, Limit 2")
+
+
+def test_snapshot_heartbeat(tmp_path):
+    state = snapshots(tmp_path, heartbeat_hours=12)
+    sighting(state, "2025-05-14T08:00:00Z")
+    state.save()
+    state = snapshots(tmp_path, heartbeat_hours=12)
+    assert not sighting(state, "2025-05-14T19:59:00Z")
+    assert sighting(state, "2025-05-14T20:00:00Z")
+
+
+def test_snapshot_same_sighting_is_emitted_again(tmp_path):
+    state = snapshots(tmp_path)
+    sighting(state, "2025-05-14T08:00:00Z")
+    state.save()
+    state = snapshots(tmp_path)
+    # The same sighting processed again, but a duplicate within the run is still suppressed
+    assert sighting(state, "2025-05-14T08:00:00Z")
+    assert not sighting(state, "2025-05-14T08:00:00Z")
+
+
+def test_snapshot_unsaved_decisions_are_not_kept(tmp_path):
+    sighting(snapshots(tmp_path), "2025-05-14T08:00:00Z")
+    assert sighting(snapshots(tmp_path), "2025-05-15T08:00:00Z")
+
+
+def test_search_index_changed_rows(tmp_path):
+    path = tmp_path / "fts.json"
+    index = SearchIndexState(path)
+    assert list(index.changed_rows([DEAL, DEAL])) == ["1234567"]
+    index.save()
+
+    later = {**DEAL, "seen_at": "2025-05-15T08:00:00Z"}
+    assert SearchIndexState(path).changed_rows([later]) == {}
+    assert list(SearchIndexState(path).changed_rows([{**later, "name": "Bounty Paper Towels"}])) == ["1234567"]
+    assert list(SearchIndexState(path).changed_rows([DEAL])) == ["1234567"]
+    assert list(SearchIndexState(path, reindex_all=True).changed_rows([later])) == ["1234567"]
+
+
+def test_search_index_reads_digest_only_state(tmp_path):
+    path = tmp_path / "fts.json"
+    index = SearchIndexState(path)
+    index.changed_rows([DEAL])
+    index.save()
+    path.write_text(json.dumps({sku: entry[0] for sku, entry in json.loads(path.read_text()).items()}))
+    assert SearchIndexState(path).changed_rows([DEAL]) == {}
+
+
+def test_convert_twice_gives_the_same_sql(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert_deals_to_sql, "__file__", str(tmp_path / "src" / "processors" / "convert.py"))
+    deals_file = tmp_path / "savings_d.ndjson"
+    deals_file.write_text(json.dumps(DEAL) + "\n", "utf-8")
+    state = tmp_path / "state"
+    sql_file = tmp_path / "data" / "sqls" / "savings_d.sql"
+    argv = ["--file", str(deals_file), "--state-file", str(state / "snapshots.json"),
+            "--fts-state-file", str(state / "fts.json"), "--alias-file", str(state / "aliases.json")]
+
+    convert_deals_to_sql.main(argv)
+    first = sql_file.read_text("utf-8")
+    convert_deals_to_sql.main(argv)
+    assert "offer_snapshot" in first and "product_fts" in first
+    assert sql_file.read_text("utf-8") == first
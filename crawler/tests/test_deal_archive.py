@@ -0,0 +1,25 @@
+import json
+
+from utils.deal_archive import DealArchive
+
+PERIOD = {"starts": "2025-05-14", "ends": "2025-06-08"}
+
+
+def write_deals(path, deals):
+    path.write_text("".join(json.dumps(deal) + "\n" for deal in deals), "utf-8")
+    return path
+
+
+def test_category_monthly_avg_filters_region_without_a_range(tmp_path):
+    deals = write_deals(tmp_path / "savings.ndjson", [
+        {"sku": "1000001", "category": "Home", "discount": 5.0, "discount_type": "dollar", "valid_period": PERIOD},
+        {"sku": "2000002", "category": "Home", "discount": 50.0, "discount_type": "dollar", "valid_period": PERIOD,
+         "region": "BA"},
+    ])
+    archive = DealArchive.empty()
+    archive.update([deals])
+
+    for start in (None, "2025-01-01"):
+        assert [(r["avg_discount"], r["count"]) for r in archive.category_monthly_avg(start, region="US")] == [(5.0, 1)]
+    assert [r["avg_discount"] for r in archive.category_monthly_avg(region="BA")] == [50.0]
+    assert archive.category_monthly_avg(region="NW") == []
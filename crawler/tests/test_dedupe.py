@@ -0,0 +1,60 @@
+import copy
+
+from processors import convert_deals_to_sql, ingest_deals
+from utils.aliases import AliasMap
+from utils.dedupe import dedupe_deals
+
+PERIOD = {"starts": "2025-05-14", "ends": "2025-06-08"}
+
+
+def deal(sku, alt_skus=(), **fields):
+    return {"sku": sku, "alt_skus": list(alt_skus), "name": f"Product {sku}", "details": f"Item {sku}",
+            "discount": 4.0, "discount_type": "dollar", "valid_period": PERIOD, "channel": "Warehouse-Only",
+            "seen_at": "2025-05-14T08:00:00Z", **fields}
+
+
+# The featured strip and the grid list the same offer, the grid copy with an image and an alt SKU
+DEALS = [
+    deal("1111161", channel="Unknown"),
+    deal("1700001"),
+    deal("1111161", ["1111162"], image_url="https://example.com/plates.jpg", details="186 ct. Item 1111161, 1111162"),
+]
+
+
+def test_dedupe_merges_copies():
+    merged, removed = dedupe_deals(copy.deepcopy(DEALS))
+    assert removed == 1
+    assert [d["sku"] for d in merged] == ["1111161", "1700001"]
+    assert merged[0]["image_url"] == "https://example.com/plates.jpg"
+    assert merged[0]["details"] == "186 ct. Item 1111161, 1111162"
+    assert merged[0]["channel"] == "Warehouse-Only"
+    assert merged[0]["alt_skus"] == ["1111162"]
+
+
+def test_copies_under_another_sku_of_the_group():
+    alias_map = AliasMap({"1111162": "1111161"})
+    deals = [deal("1111161"), deal("1111162")]
+    assert dedupe_deals(copy.deepcopy(deals))[1] == 0
+    assert dedupe_deals(deals, alias_map)[1] == 1
+
+
+def test_build_sql_merges_duplicates(tmp_path):
+    sql = convert_deals_to_sql.build_sql(copy.deepcopy(DEALS), alias_map=AliasMap(path=tmp_path / "aliases.json"))
+    offer_periods = sql.split("INSERT OR IGNORE INTO offer_period")[1].split(";")[0]
+    assert offer_periods.count("'2025-05-14'") == 2
+
+    sql = convert_deals_to_sql.build_sql(copy.deepcopy(DEALS), keep_duplicates=True)
+    offer_periods = sql.split("INSERT OR IGNORE INTO offer_period")[1].split(";")[0]
+    assert offer_periods.count("'2025-05-14'") == 3
+
+
+def test_ingest_deals_merges_duplicates(ingest_server, tmp_path):
+    ingest_deals.ingest_deals(copy.deepcopy(DEALS), ingest_server.url, False,
+                              alias_map=AliasMap(path=tmp_path / "aliases.json"))
+    [payload] = ingest_server.payloads
+    assert [(d["product"]["sku"], d["product"]["alt_skus"]) for d in payload] == [
+        ("1111161", ["1111162"]), ("1700001", []),
+    ]
+
+    ingest_deals.ingest_deals(copy.deepcopy(DEALS), ingest_server.url, False, keep_duplicates=True)
+    assert len(ingest_server.payloads[-1]) == 3
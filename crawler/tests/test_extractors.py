@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from crawlers import extract_costco_offers_local_v2024 as v2024
+from crawlers import extract_costco_offers_local_v2025 as v2025
+
+FIXTURE = Path(__file__).parent / "fixtures" / "online-offers.html"
+# A pack count after the item list must not be read as another SKU
+ITEMS = "Item 1234567, 7654321 1000 ct"
+
+V2024_TILE = f"""
+<li class="eco-coupons">
+  <a href="https://www.costco.com/kirkland-tissue.product.100100100.html">
+    <div class="eco-header">Warehouse-Only</div>
+    <table class="eco-price"><tr><td><span class="eco-dollarSign">$</span><span class="eco-dollar">5</span></td></tr></table>
+    <div class="eco-sl1">Kirkland Signature Bath Tissue</div>
+    <div class="eco-items">{ITEMS}</div>
+  </a>
+</li>
+"""
+
+
+def test_v2025_item_list_stops_at_count():
+    html = FIXTURE.read_text("utf-8").replace("Item 1700001, 1700002, Limit 1.", ITEMS)
+    deals, _ = v2025.extract_page(html, workers=1)
+    fryer = next(d for d in deals if d["name"] == "Ninja Air Fryer")
+    assert (fryer["sku"], fryer["alt_skus"]) == ("1234567", ["7654321"])
+
+
+def test_v2024_item_list_stops_at_count():
+    tile = BeautifulSoup(V2024_TILE, "lxml").find("li")
+    deal = v2024.parse_tile(tile, {"starts": None, "ends": None}, "2024-01-03T08:00:00Z")
+    assert (deal["sku"], deal["alt_skus"]) == ("1234567", ["7654321"])
+
+
+def test_item_list_separators():
+    for text, skus in [("Item 1720981, 1720886, Limit 2.", "1720981, 1720886"),
+                       ("186 ct. Item 1111161, Limit 2.", "1111161"),
+                       ("Item 1111161,1111162", "1111161,1111162"),
+                       ("Item 1500003 48 oz", "1500003")]:
+        assert v2025.ITEM_RE.search(text).group(1) == skus
+        assert v2024.ITEM_RE.search(text).group(1) == skus
@@ -0,0 +1,36 @@
+from utils import http_cache
+from utils.http_cache import HttpCache
+
+URL = "http://127.0.0.1/cdx/search/cdx?url=www.costco.com/online-offers.html"
+
+
+def test_miss_then_hit(tmp_path):
+    cache = HttpCache(tmp_path)
+    assert cache.get(URL) is None
+    cache.put(URL, 200, "application/json", b'[["timestamp", "original"]]')
+
+    cached = HttpCache(tmp_path).get(URL)
+    assert (cached.status, cached.content_type, cached.text) == (200, "application/json", '[["timestamp", "original"]]')
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_max_age(tmp_path, monkeypatch):
+    cache = HttpCache(tmp_path)
+    monkeypatch.setattr(http_cache.time, "time", lambda: 1_000_000.0)
+    cache.put(URL, 200, "application/json", b"[]")
+
+    monkeypatch.setattr(http_cache.time, "time", lambda: 1_000_000.0 + 3600)
+    assert cache.get(URL, max_age_s=7200) is not None
+    assert cache.get(URL, max_age_s=1800) is None
+    # Without a max age an entry never expires
+    assert cache.get(URL) is not None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_are_keyed_by_url(tmp_path):
+    cache = HttpCache(tmp_path)
+    cache.put(URL, 200, None, b"a")
+    cache.put(URL + "&from=2024", 200, None, b"b")
+    assert cache.get(URL).body == b"a"
+    assert cache.get(URL + "&from=2024").body == b"b"
+    assert cache.get(URL + "&from=2025") is None
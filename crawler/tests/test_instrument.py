@@ -0,0 +1,32 @@
+import argparse
+
+from utils import instrument
+
+
+def parse(*argv):
+    parser = argparse.ArgumentParser()
+    instrument.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def run(args):
+    with instrument.session("script", args) as trace:
+        with instrument.stage("parse"):
+            instrument.count("tiles", 3)
+    return trace
+
+
+def test_tracing_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrument, "TRACE_DIR", tmp_path)
+    assert run(parse()) is None
+    assert list(tmp_path.iterdir()) == []
+
+    trace = run(parse("--trace"))
+    assert trace.counters == {"tiles": 3}
+    assert [p.name.split("_")[0] for p in tmp_path.iterdir()] == ["script"]
+
+
+def test_trace_file(tmp_path):
+    trace_file = tmp_path / "trace.json"
+    run(parse("--trace-file", str(trace_file)))
+    assert trace_file.exists()
@@ -0,0 +1,51 @@
+"""Stage caching of run_pipeline.run_dag."""
+from processors import run_pipeline
+from processors.run_pipeline import Artifact, PipelineCache, Stage, run_dag
+
+
+def make_stages(calls, target=None):
+    def extract(inputs):
+        calls.append("extract")
+        return Artifact("ndjson", inputs["source"].path)
+
+    def ingest(inputs):
+        calls.append("ingest")
+        return Artifact("receipt")
+
+    return [
+        Stage("extract", [], ["html"], "ndjson", extract),
+        Stage("ingest", ["extract"], ["ndjson"], "receipt", ingest, target=target),
+    ]
+
+
+def run(tmp_path, calls, target=None):
+    source = tmp_path / "savings.html"
+    cache = PipelineCache(tmp_path / "cache.json")
+    results = run_dag(make_stages(calls, target), Artifact("html", source), cache, source.name, set())
+    cache.save()
+    return {r.name: r.status for r in results}
+
+
+def test_shared_module_change_invalidates_stages(tmp_path, monkeypatch):
+    utils = tmp_path / "utils"
+    utils.mkdir()
+    (utils / "helpers.py").write_text("VALUE = 1\n")
+    monkeypatch.setattr(run_pipeline, "SRC_DIR", tmp_path)
+    monkeypatch.setattr(run_pipeline, "SHARED_SOURCE_DIRS", [utils])
+    (tmp_path / "savings.html").write_text("<html></html>")
+    calls = []
+
+    assert run(tmp_path, calls) == {"extract": "ran", "ingest": "ran"}
+    assert run(tmp_path, calls) == {"extract": "cached", "ingest": "cached"}
+    (utils / "helpers.py").write_text("VALUE = 2\n")
+    assert run(tmp_path, calls) == {"extract": "ran", "ingest": "ran"}
+
+
+def test_receipts_are_cached_per_target(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_pipeline, "SHARED_SOURCE_DIRS", [])
+    (tmp_path / "savings.html").write_text("<html></html>")
+    calls = []
+
+    run(tmp_path, calls, target="http://localhost:8787/api/ingest")
+    assert run(tmp_path, calls, target="http://localhost:8787/api/ingest")["ingest"] == "cached"
+    assert run(tmp_path, calls, target="d1:account/fresh-db")["ingest"] == "ran"
@@ -0,0 +1,38 @@
+import json
+import sqlite3
+from pathlib import Path
+
+from processors import convert_deals_to_sql
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent.parent / "backend" / "migrations"
+DEAL = {"sku": "1234567", "name": "Member's Mark Paper Towels, 12ct", "details": "Item 1234567",
+        "category": "Home & Kitchen", "discount": 5.0, "discount_type": "dollar", "seen_at": "2025-05-14T08:00:00Z",
+        "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"}, "channel": "Warehouse-Only"}
+
+
+def migrate(db, *names):
+    for name in names:
+        db.executescript((MIGRATIONS_DIR / name).read_text("utf-8"))
+
+
+def test_fts_only_backfills_existing_products(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert_deals_to_sql, "__file__", str(tmp_path / "src" / "processors" / "convert.py"))
+    db = sqlite3.connect(":memory:")
+    migrate(db, "0001_schema.sql", "0003_add_images_and_channel.sql")
+    db.execute("INSERT INTO product (sku, name, category) VALUES (?, ?, ?)",
+               (DEAL["sku"], DEAL["name"], DEAL["category"]))
+    migrate(db, "0004_product_fts.sql", "0005_product_thumbnail.sql")
+    assert db.execute("SELECT count(*) FROM product_fts").fetchone() == (0,)
+
+    # The second deal has no product row and must not get an index row
+    deals_file = tmp_path / "savings_d.ndjson"
+    deals_file.write_text("".join(json.dumps(d) + "\n" for d in [DEAL, {**DEAL, "sku": "7654321"}]), "utf-8")
+    convert_deals_to_sql.main(["--file", str(deals_file), "--fts-only", "--alias-file", str(tmp_path / "aliases.json"),
+                               "--fts-state-file", str(tmp_path / "fts.json")])
+    sql = (tmp_path / "data" / "sqls" / "fts_savings_d.sql").read_text("utf-8")
+    assert "INSERT INTO product (" not in sql and "offer_snapshot" not in sql
+    db.executescript(sql)
+
+    assert db.execute("SELECT rowid, name, category FROM product_fts").fetchall() == [
+        (1, "members mark paper towels 12 ct", "home and kitchen")]
+    assert db.execute("SELECT rowid FROM product_fts WHERE product_fts MATCH 'members 12 ct'").fetchall() == [(1,)]
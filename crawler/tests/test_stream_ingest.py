@@ -0,0 +1,83 @@
+import asyncio
+import re
+import threading
+from pathlib import Path
+
+import pytest
+
+from crawlers import extract_costco_offers_local_v2025 as extractor
+from processors import stream_ingest
+from utils.aliases import AliasMap
+
+FIXTURE = Path(__file__).parent / "fixtures" / "online-offers.html"
+SEEN_AT = "2025-05-14T08:00:00Z"
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    """The fixture page with its first tile repeated at the end, like a featured strip, as a raw snapshot."""
+    html = FIXTURE.read_text("utf-8")
+    first_tile = re.search(r'<div data-testid="AdBuilder">.*?</a>\s*</div>', html, re.S).group(0)
+    html = html.replace("  </div>\n  <script>", f"{first_tile}\n  </div>\n  <script>")
+    path = tmp_path / "savings_051425_060825.html"
+    path.write_text(html, "utf-8")
+    # Keep the processed NDJSON out of data/processed
+    monkeypatch.setattr(extractor, "output_file_for", lambda stem, period: tmp_path / "processed" / f"{stem}.ndjson")
+    return path
+
+
+def run(snapshot, ingest_server, tmp_path, **kwargs):
+    return asyncio.run(stream_ingest.stream_ingest(
+        snapshot, ingest_server.url, {}, SEEN_AT, batch_size=1, concurrency=2,
+        alias_map=AliasMap(path=tmp_path / "aliases.json"), **kwargs))
+
+
+def test_streams_every_offer_once(snapshot, ingest_server, tmp_path):
+    metrics = run(snapshot, ingest_server, tmp_path)
+    assert metrics["errors"] == []
+    assert (metrics["deals"], metrics["valid"], metrics["duplicates"]) == (3, 3, 1)
+    # The repeated tile is folded into the first copy and that copy is upserted again
+    posted = [deal["product"]["sku"] for payload in ingest_server.payloads for deal in payload]
+    assert sorted(posted) == ["1111161", "1111161", "1700001"]
+    assert (tmp_path / "processed" / "savings_051425_060825.ndjson").read_text("utf-8").count("\n") == 3
+
+
+def test_keep_duplicates(snapshot, ingest_server, tmp_path):
+    metrics = run(snapshot, ingest_server, tmp_path, keep_duplicates=True)
+    assert metrics["duplicates"] == 0
+    assert metrics["ingested"] == 3
+
+
+def test_transform_error_does_not_hang_the_producer(snapshot, ingest_server, tmp_path, monkeypatch):
+    def broken(deal):
+        raise RuntimeError("bad deal")
+
+    monkeypatch.setattr(stream_ingest, "transform_deal", broken)
+    outcome = []
+
+    def target():
+        try:
+            run(snapshot, ingest_server, tmp_path, queue_size=1)
+        except RuntimeError as e:
+            outcome.append(str(e))
+
+    # The producer is still blocked on the full queue when transform fails
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+    assert not worker.is_alive(), "stream_ingest hung after transform failed"
+    assert outcome == ["bad deal"]
+    assert ingest_server.payloads == []
+
+
+def test_repeat_of_a_sent_offer_keeps_the_first_copys_fields(snapshot, ingest_server, tmp_path):
+    html = snapshot.read_text("utf-8")
+    # The repeat at the end of the page comes without its image
+    head, repeat = html.rsplit('<div data-testid="AdBuilder">', 1)
+    snapshot.write_text(head + '<div data-testid="AdBuilder">' + re.sub(r"<img .*?>", "", repeat, flags=re.S), "utf-8")
+
+    metrics = run(snapshot, ingest_server, tmp_path)
+    assert metrics["duplicates"] == 1
+    posted = [deal["product"] for payload in ingest_server.payloads for deal in payload]
+    images = [product["image_url"] for product in posted if product["sku"] == "1111161"]
+    assert images == ["https://bfasset.costco-static.com/dixie_1111161.png"] * 2
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from processors import convert_deals_to_sql, ingest_deals
+
+DEALS = [
+    {"sku": "1234567", "name": "Kirkland Signature Paper Towels", "details": "Item 1234567",
+     "discount": 5.0, "discount_type": "dollar", "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"},
+     "channel": "Warehouse-Only"},
+    {"sku": None, "name": "Bounty Paper Towels", "details": "",
+     "discount": 4.0, "discount_type": "dollar", "valid_period": {"starts": "2025-05-14", "ends": "2025-06-08"},
+     "channel": "Warehouse-Only"},
+]
+
+
+def read_ndjson(path):
+    return [json.loads(line) for line in path.read_text("utf-8").splitlines() if line.strip()]
+
+
+@pytest.mark.parametrize("module", [convert_deals_to_sql, ingest_deals])
+def test_write_ndjson(module, tmp_path):
+    out = tmp_path / "unavailable.ndjson"
+    module.write_ndjson(DEALS, str(out))
+    assert read_ndjson(out) == DEALS
+    assert (tmp_path / "unavailable.ndjson.idx").exists()
+
+
+def test_convert_writes_unavailable_deals(tmp_path, monkeypatch):
+    # convert() puts data/processed and data/sqls next to src/, so move src/ into tmp_path
+    monkeypatch.setattr(convert_deals_to_sql, "__file__", str(tmp_path / "src" / "processors" / "convert.py"))
+    deals_file = tmp_path / "savings_d.ndjson"
+    deals_file.write_text("".join(json.dumps(deal) + "\n" for deal in DEALS), "utf-8")
+    state = tmp_path / "state"
+    convert_deals_to_sql.main([
+        "--file", str(deals_file), "--state-file", str(state / "snapshots.json"),
+        "--fts-state-file", str(state / "fts.json"), "--alias-file", str(state / "aliases.json"),
+    ])
+
+    unavailable = read_ndjson(tmp_path / "data" / "processed" / "unavailable_savings_d.ndjson")
+    assert [deal["name"] for deal in unavailable] == ["Bounty Paper Towels"]
+    assert unavailable[0]["validation_error"] == "Missing SKU"
+    assert (tmp_path / "data" / "processed" / "unavailable_savings_d.ndjson.idx").exists()
+    sql = (tmp_path / "data" / "sqls" / "savings_d.sql").read_text("utf-8")
+    assert "'1234567'" in sql
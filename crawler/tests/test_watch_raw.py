@@ -0,0 +1,44 @@
+import threading
+
+from processors import watch_raw
+from processors.watch_raw import SettleTracker
+
+
+def test_settle_tracker(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(watch_raw.time, "time", lambda: clock[0])
+    snapshot = tmp_path / "savings_051425_060825.html"
+    snapshot.write_text("<html></html>")
+    tracker = SettleTracker(tmp_path, settle_s=2.0, done={})
+
+    assert tracker.scan() == []
+    assert tracker.settling() == [snapshot.name]
+    clock[0] += 2.0
+    assert tracker.scan() == [snapshot]
+    assert tracker.settling() == []
+
+
+def test_settling_while_scanning(tmp_path):
+    """The status thread reads the settling files while the watcher thread scans."""
+    for i in range(200):
+        (tmp_path / f"savings_{i:03d}.html").write_text("<html></html>")
+    tracker = SettleTracker(tmp_path, settle_s=0.0, done={})
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                tracker.settling()
+            except RuntimeError as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(50):
+            tracker.scan()
+    finally:
+        stop.set()
+        reader.join()
+    assert errors == []
@@ -0,0 +1,64 @@
+import json
+import random
+
+import pytest
+
+from utils.search_index import normalize_search_text
+from utils.watchlist import WatchEntry, Watchlist, deal_text, load_watchlist
+
+WORDS = ["ninja", "air", "fryer", "kirkland", "olive", "oil", "paper", "towels", "12", "ct", "creme", "brulee"]
+
+
+def write_watchlist(tmp_path, rows):
+    path = tmp_path / "watchlist.ndjson"
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), "utf-8")
+    return path
+
+
+def naive(entries, deals):
+    """Every keyword and SKU of every entry tested against every deal."""
+    grouped = {}
+    for deal in deals:
+        text = f" {deal_text(deal)} "
+        for entry in entries:
+            keywords = dict.fromkeys(normalize_search_text(k) for k in entry.keywords)
+            matched = [k for k in keywords if k and f" {k} " in text]
+            matched += [f"sku {sku}" for sku in [deal["sku"], *deal["alt_skus"]] if sku in entry.skus]
+            if matched:
+                grouped.setdefault(entry.id, []).append((deal["sku"], sorted(matched)))
+    return grouped
+
+
+def test_automaton_matches_naive():
+    rng = random.Random(7)
+    deals = [{"sku": str(1000 + i), "alt_skus": [str(2000 + i)] if i % 4 == 0 else [],
+              "name": " ".join(rng.choices(WORDS, k=5)), "details": f"Item {1000 + i}, {rng.choice(WORDS)}"}
+             for i in range(200)]
+    entries = [WatchEntry(id=f"w{e}", keywords=[" ".join(rng.choices(WORDS, k=rng.randint(1, 3)))
+                                                for _ in range(3)],
+                          skus=[str(rng.randrange(1000, 2200))])
+               for e in range(60)]
+    matches = Watchlist(entries).match(deals)
+    assert {entry_id: [(m["sku"], sorted(m["matched"])) for m in found] for entry_id, found in matches.items()} \
+        == naive(entries, deals)
+
+
+def test_overlapping_keywords():
+    watchlist = Watchlist([WatchEntry(id="a", keywords=["ninja"]), WatchEntry(id="b", keywords=["air fryer", "fryer"])])
+    matches = watchlist.match([{"sku": "1", "name": "Ninja Air Fryer", "details": ""}])
+    assert {entry_id: found[0]["matched"] for entry_id, found in matches.items()} \
+        == {"a": ["ninja"], "b": ["air fryer", "fryer"]}
+
+
+def test_duplicate_ids_are_rejected(tmp_path):
+    path = write_watchlist(tmp_path, [{"id": "a", "keywords": ["ninja"]}, {"id": "a", "keywords": ["fryer"]}])
+    with pytest.raises(ValueError, match="same id 'a'"):
+        load_watchlist(path)
+
+
+def test_position_ids_cannot_collide(tmp_path):
+    path = write_watchlist(tmp_path, [{"id": "1", "keywords": ["ninja"]}, {"keywords": ["fryer"]}])
+    with pytest.raises(ValueError, match="same id '1'"):
+        load_watchlist(path)
+    path = write_watchlist(tmp_path, [{"keywords": ["ninja"]}, {"id": "alice", "skus": [1234567]}])
+    assert [(e.id, e.skus) for e in load_watchlist(path)] == [("0", []), ("alice", ["1234567"])]
@@ -0,0 +1,88 @@
+import re
+import threading
+
+import pytest
+
+from crawlers import wayback_backfill
+from wayback_standin import StandinServer
+
+# (fixture file, banner): captured daily 2024-01-03 .. 2024-01-18, the last page has no banner
+FIXTURES = [
+    ("savings_010324_010924.html", "Valid 1/3/24 - 1/9/24"),
+    ("savings_011024_011624.html", "Valid 1/10/24 - 1/16/24"),
+    ("savings_011724_011824.html", None),
+]
+SAVED = [
+    "savings_010324_010924.html",
+    "savings_011024_011624.html",
+    "savings_unknown_20240117080000.html",
+    "savings_unknown_20240118080000.html",
+]
+
+
+@pytest.fixture
+def standin(tmp_path):
+    fixture_dir = tmp_path / "fixtures"
+    fixture_dir.mkdir()
+    for name, banner in FIXTURES:
+        heading = f"<h2>{banner}</h2>" if banner else "<h2>Member Savings</h2>"
+        tiles = '<div data-testid="AdBuilder"><span>Item 1234567</span></div>'
+        (fixture_dir / name).write_text(f"<html><body>{heading}{tiles}</body></html>", "utf-8")
+    server = StandinServer(fixture_dir, 0, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def backfill(server, out_dir, cache_dir, capsys, *extra):
+    """Run the backfill; returns (requests the stand-in saw, (cache hits, cache misses))."""
+    before = server.requests_served
+    wayback_backfill.main(["--from", "2024-01-01", "--to", "2024-01-31", "--archive-url", server.url,
+                           "--out-dir", str(out_dir), "--cache-dir", str(cache_dir), "--rate", "0",
+                           "--min-gap-days", "1", *extra])
+    hits, misses = re.search(r"Cache: (\d+) hits, (\d+) misses", capsys.readouterr().out).groups()
+    return server.requests_served - before, (int(hits), int(misses))
+
+
+@pytest.mark.parametrize("workers", ["1", "3"])
+def test_saves_one_file_per_period(standin, tmp_path, capsys, workers):
+    backfill(standin, tmp_path / "raw", tmp_path / "cache", capsys, "--workers", workers)
+    assert sorted(p.name for p in (tmp_path / "raw").iterdir()) == SAVED
+    assert "Valid 1/10/24 - 1/16/24" in (tmp_path / "raw" / "savings_011024_011624.html").read_text("utf-8")
+
+
+def test_rerun_is_served_from_cache(standin, tmp_path, capsys):
+    # 1 capture listing + the first capture of each period + both days without a banner
+    requests, cache = backfill(standin, tmp_path / "raw", tmp_path / "cache", capsys, "--workers", "1")
+    assert requests == 5
+    assert cache == (0, 5)
+
+    # Same cache, new output directory: every page again, none from the network
+    requests, cache = backfill(standin, tmp_path / "raw2", tmp_path / "cache", capsys, "--workers", "1")
+    assert requests == 0
+    assert cache == (5, 0)
+    assert sorted(p.name for p in (tmp_path / "raw2").iterdir()) == SAVED
+
+    # Same output directory: known periods are not even looked up, unknown ones are
+    requests, cache = backfill(standin, tmp_path / "raw", tmp_path / "cache", capsys, "--workers", "1")
+    assert requests == 0
+    assert cache == (3, 0)
+
+
+def test_capture_listing_expires(standin, tmp_path, capsys):
+    backfill(standin, tmp_path / "raw", tmp_path / "cache", capsys)
+    # Archived pages never change, but a listing older than --cdx-max-age-hours is fetched again
+    requests, cache = backfill(standin, tmp_path / "raw", tmp_path / "cache", capsys, "--cdx-max-age-hours", "0")
+    assert requests == 1
+    assert cache == (2, 1)
+
+
+def test_retry_after_is_capped(standin, tmp_path, capsys, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(wayback_backfill.time, "sleep", sleeps.append)
+    standin.reset(flaky=1)
+    standin.retry_after = 3600
+    backfill(standin, tmp_path / "raw", tmp_path / "cache", capsys, "--workers", "1")
+    assert sorted(p.name for p in (tmp_path / "raw").iterdir()) == SAVED
+    assert sleeps and max(sleeps) == wayback_backfill.MAX_RETRY_AFTER_S
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+wayback_standin.py
+------------------
+A local stand-in for the Wayback Machine that serves fixture snapshots, so
+wayback_backfill.py can be run and tested without touching archive.org.
+
+Every `<prefix>_MMDDYY_MMDDYY.html[.gz|.zst]` in the fixture directory is one
+archived page, captured once a day (at 08:00) throughout its valid period.
+The server answers the two endpoints the backfill uses:
+
+  /cdx/search/cdx?url=...&from=YYYYMMDD&to=YYYYMMDD&output=json
+  /web/<YYYYMMDDhhmmss>id_/<url>    (the fixture whose period has that day)
+
+--latency-ms delays every response and --flaky N answers the first request
+for every Nth URL with 503 (Retry-After: `retry_after`, 0 by default), to
+exercise concurrency and retries.
+
+Usage:
+  python tests/wayback_standin.py data/raw --port 8901 [--latency-ms 200] [--flaky 5]
+  python src/crawlers/wayback_backfill.py --from 2024-01-01 --archive-url http://127.0.0.1:8901 --out-dir /tmp/raw
+"""
+import argparse
+import datetime as dt
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from utils.html_io import SNAPSHOT_SUFFIXES, read_snapshot_bytes
+
+DEFAULT_PORT = 8901
+FIXTURE_NAME_RE = re.compile(r"_(\d{6})_(\d{6})\.html")
+SNAPSHOT_PATH_RE = re.compile(r"^/web/(\d{14})id_/(.+)$")
+CAPTURE_TIME = "080000"
+
+
+def load_fixtures(fixture_dir: Path) -> List[tuple[dt.date, dt.date, Path]]:
+    """(starts, ends, path) of every fixture snapshot named after its valid period."""
+    fixtures = []
+    for path in sorted(Path(fixture_dir).iterdir()):
+        m = FIXTURE_NAME_RE.search(path.name)
+        if m and path.name.endswith(SNAPSHOT_SUFFIXES):
+            starts, ends = (dt.datetime.strptime(d, "%m%d%y").date() for d in m.groups())
+            fixtures.append((starts, ends, path))
+    return fixtures
+
+
+def cdx_date(query: dict, key: str, default: dt.date) -> dt.date:
+    """A from/to CDX parameter (YYYYMMDD[hhmmss]) as a date."""
+    if key not in query:
+        return default
+    return dt.datetime.strptime(query[key][0][:8], "%Y%m%d").date()
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixture_dir: Path, port: int = DEFAULT_PORT, latency_ms: float = 0.0, flaky: int = 0,
+                 quiet: bool = False):
+        super().__init__(("127.0.0.1", port), StandinHandler)
+        self.fixtures = load_fixtures(fixture_dir)
+        self.latency_s = latency_ms / 1000
+        self.flaky = flaky
+        self.retry_after = 0
+        self.quiet = quiet
+        self.requests_served = 0
+        self._seen_urls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self, flaky: int = 0) -> None:
+        """Start over as a fresh server, e.g. between runs of a benchmark."""
+        with self._lock:
+            self.flaky = flaky
+            self._seen_urls.clear()
+
+    def should_fail(self, path: str) -> bool:
+        """Count the request; True for the first request of every `flaky`th distinct URL."""
+        with self._lock:
+            self.requests_served += 1
+            if path in self._seen_urls:
+                return False
+            self._seen_urls[path] = len(self._seen_urls) + 1
+            return bool(self.flaky) and self._seen_urls[path] % self.flaky == 0
+
+    def captures(self, start: dt.date, end: dt.date) -> List[str]:
+        days = sorted({starts + dt.timedelta(days=i)
+                       for starts, ends, _ in self.fixtures for i in range((ends - starts).days + 1)})
+        return [day.strftime("%Y%m%d") + CAPTURE_TIME for day in days if start <= day <= end]
+
+    def fixture_for(self, day: dt.date) -> Path | None:
+        return next((path for starts, ends, path in self.fixtures if starts <= day <= ends), None)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: StandinServer
+
+    def do_GET(self):
+        fail = self.server.should_fail(self.path)
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+        if fail:
+            return self.reply(503, b"try again", "text/plain", {"Retry-After": str(self.server.retry_after)})
+        url = urlsplit(self.path)
+        if url.path == "/cdx/search/cdx":
+            return self.cdx(parse_qs(url.query))
+        m = SNAPSHOT_PATH_RE.match(url.path)
+        if m:
+            path = self.server.fixture_for(dt.datetime.strptime(m.group(1)[:8], "%Y%m%d").date())
+            if path is not None:
+                return self.reply(200, read_snapshot_bytes(path), "text/html; charset=utf-8")
+        self.reply(404, b"not archived", "text/plain")
+
+    def cdx(self, query: dict) -> None:
+        original = query.get("url", [""])[0]
+        start, end = cdx_date(query, "from", dt.date.min), cdx_date(query, "to", dt.date.max)
+        rows = [["timestamp", "original"]] + [[ts, original] for ts in self.server.captures(start, end)]
+        self.reply(200, json.dumps(rows).encode("utf-8"), "application/json")
+
+    def reply(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description='Serve fixture snapshots like the Wayback Machine')
+    parser.add_argument('fixture_dir', type=Path, help='Directory of <prefix>_MMDDYY_MMDDYY.html snapshots')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port on 127.0.0.1 (default: {DEFAULT_PORT})')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay every response (default: 0)')
+    parser.add_argument('--flaky', type=int, default=0, help='Answer the first request for every Nth URL with 503 (default: never)')
+    args = parser.parse_args(argv)
+
+    server = StandinServer(args.fixture_dir, args.port, args.latency_ms, args.flaky)
+    print(f"Serving {len(server.fixtures)} fixture snapshots from {args.fixture_dir} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()